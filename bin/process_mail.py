@@ -1,5 +1,5 @@
 #!/usr/bin/env python
 """Process a mail box using the settings in config.cfg."""
 import sys
-from powl.main import main
+from powl.app import main
 main(*sys.argv[1:])
@@ -2,6 +2,25 @@
 import time
 from powl import actiontype
 from powl import exception
+from powl import parser
+from powl import result
+
+_ERRMSG_UNKNOWN_ACTION_TYPE = "action type ({0}) is unknown"
+
+
+def _try_call(method, *args):
+    """
+    Call method and return a successful powl.result.Result, or an
+    ERROR_ACTION_FAILED error holding the exception it raised.
+    """
+    try:
+        method(*args)
+    except Exception as err:
+        message = exception.get_message(err) or str(err)
+        return result.failure(result.ERROR_ACTION_FAILED, message,
+                              exception=err)
+    return result.success(None)
+
 
 class ActionManager:
     """
@@ -47,12 +66,92 @@ class ActionManager:
         try:
             action = self._action_type_to_action_map[action_type]
         except KeyError as err:
-            message = "action type ({0}) is unknown".format(action_type)
+            message = _ERRMSG_UNKNOWN_ACTION_TYPE.format(action_type)
             exception.add_message(err, message)
             raise
         else:
             action.do(action_data, action_date)
 
+    def try_do_action(self, action_type, action_data, action_date):
+        """
+        Do the specified action like do_action, but return a failure
+        instead of raising an exception.
+
+        Parameters
+        ----------
+        action_type : powl.actiontype
+            The type of action to do.
+        action_data : str
+            Formatted string containing action data.
+        action_date : time.struct_time
+            Date associated with the action.
+
+        Returns
+        -------
+        powl.result.Result
+            None on success, or an ERROR_UNKNOWN_ACTION error or the error
+            returned by the action.
+        """
+        parsed = self.try_parse_action(action_type, action_data)
+        if not parsed.ok:
+            return parsed
+        return self.try_perform_action(action_type, parsed.value,
+                                       action_data, action_date)
+
+    def try_parse_action(self, action_type, action_data):
+        """
+        Parse the data of the specified action without performing it.
+
+        Parameters
+        ----------
+        action_type : powl.actiontype
+            The type of the action.
+        action_data : str
+            Formatted string containing action data.
+
+        Returns
+        -------
+        powl.result.Result
+            The data parsed by the action, or an ERROR_UNKNOWN_ACTION error
+            or the error returned by the action.
+        """
+        action = self._action_type_to_action_map.get(action_type)
+        if action is None:
+            return result.failure(
+                result.ERROR_UNKNOWN_ACTION,
+                _ERRMSG_UNKNOWN_ACTION_TYPE.format(action_type))
+        return action.try_parse(action_data)
+
+    def try_perform_action(self, action_type, data, action_data,
+                           action_date):
+        """
+        Perform the specified action with data returned by
+        try_parse_action.
+
+        Parameters
+        ----------
+        action_type : powl.actiontype
+            The type of the action.
+        data : object
+            Data parsed by try_parse_action.
+        action_data : str
+            Formatted string the data was parsed from.
+        action_date : time.struct_time
+            Date associated with the action.
+
+        Returns
+        -------
+        powl.result.Result
+            None on success, or an ERROR_UNKNOWN_ACTION error or the error
+            returned by the action.
+        """
+        action = self._action_type_to_action_map.get(action_type)
+        if action is None:
+            return result.failure(
+                result.ERROR_UNKNOWN_ACTION,
+                _ERRMSG_UNKNOWN_ACTION_TYPE.format(action_type))
+        return action.try_perform(data, action_data, action_date)
+
 
 class Action(object):
     """
@@ -72,6 +171,123 @@ class Action(object):
         """
         pass
 
+    def try_do(self, string, date):
+        """
+        Perform an action like do, but return a failure instead of raising
+        an exception.
+
+        Parameters
+        ----------
+        string : str
+            A string containing data for the action.
+        date : time.struct_time
+            Date associated with the action.
+
+        Returns
+        -------
+        powl.result.Result
+            None on success, or an ERROR_ACTION_FAILED error holding the
+            exception raised by do.
+        """
+        parsed = self.try_parse(string)
+        if not parsed.ok:
+            return parsed
+        return self.try_perform(parsed.value, string, date)
+
+    def try_parse(self, string):
+        """
+        Parse the data of the action without performing it.
+
+        Parameters
+        ----------
+        string : str
+            A string containing data for the action.
+
+        Returns
+        -------
+        powl.result.Result
+            The parsed data, which is the string itself by default, or the
+            parse error.
+        """
+        return result.success(string)
+
+    def try_perform(self, data, string, date):
+        """
+        Perform the action with data returned by try_parse, returning a
+        failure instead of raising an exception.
+
+        Parameters
+        ----------
+        data : object
+            Data returned by try_parse.
+        string : str
+            The string the data was parsed from.
+        date : time.struct_time
+            Date associated with the action.
+
+        Returns
+        -------
+        powl.result.Result
+            None on success, or an ERROR_ACTION_FAILED error holding the
+            exception raised.
+        """
+        return _try_call(self.do, string, date)
+
+
+class ActionParser(parser.Parser):
+    """
+    Parses an action item into its action type and the data parsed by its
+    action, so the whole parse can be cached by powl.parser.CachingParser.
+    """
+
+    def __init__(self, item_parser, action_manager):
+        """
+        Parameters
+        ----------
+        item_parser : powl.parser.ActionItemParser
+            Splits an item into its action type and data string.
+        action_manager : powl.action.ActionManager
+            Parses the data string with the action of the type.
+        """
+        self._item_parser = item_parser
+        self._action_manager = action_manager
+
+    def parse(self, item):
+        """
+        Returns
+        -------
+        tuple of powl.actiontype, str and object
+            The action type, the data string and the data parsed from it.
+
+        Raises
+        ------
+        KeyError, ValueError
+            If the item or its data is invalid.
+        """
+        parsed = self.try_parse(item)
+        if not parsed.ok:
+            err = parsed.error.to_exception()
+            raise err
+        return parsed.value
+
+    def try_parse(self, item):
+        """
+        Returns
+        -------
+        powl.result.Result
+            The action type, the data string and the data parsed from it,
+            or the error of the item parser or of the action.
+        """
+        parsed = self._item_parser.try_parse(item)
+        if not parsed.ok:
+            return parsed
+        action_type, action_data = parsed.value
+        parsed = self._action_manager.try_parse_action(action_type,
+                                                       action_data)
+        if not parsed.ok:
+            return parsed
+        return result.success((action_type, action_data, parsed.value))
+
 
 class BodyCompositionAction(Action):
     """
@@ -104,8 +320,12 @@ class BodyCompositionAction(Action):
         date : time.struct_time
             Date associated with the action.
         """
-        data = self._parser.parse(string)
+        self._output(self._parser.parse(string), string, date)
 
+    def _output(self, data, string, date):
+        """
+        Output parsed body composition data to file.
+        """
         output = "{0}, {1}, {2}".format(
             time.strftime(self._OUTPUT_DATE_FORMAT, date),
             data.mass,
@@ -117,6 +337,19 @@ class BodyCompositionAction(Action):
             string,
             self._file.filename)
 
+    def try_parse(self, string):
+        """
+        Parse the string with the data parser of this action.
+        """
+        return self._parser.try_parse(string)
+
+    def try_perform(self, data, string, date):
+        """
+        Output body composition to file, returning the error instead of
+        raising it.
+        """
+        return _try_call(self._output, data, string, date)
+
 
 class NoteAction(Action):
     """
@@ -184,8 +417,12 @@ class TransactionAction(Action):
         date : time.struct_time
             Date of the transaction.
         """
-        data = self._parser.parse(string)
+        self._output(self._parser.parse(string), string, date)
 
+    def _output(self, data, string, date):
+        """
+        Convert and output parsed transaction data.
+        """
         financial_data, financial_file = self._converter.convert(
             date,
             data.debit,
@@ -199,3 +436,16 @@ class TransactionAction(Action):
             string,
             financial_file.filename)
 
+    def try_parse(self, string):
+        """
+        Parse the string with the data parser of this action.
+        """
+        return self._parser.try_parse(string)
+
+    def try_perform(self, data, string, date):
+        """
+        Convert and output a transaction, returning the error instead of
+        raising it.
+        """
+        return _try_call(self._output, data, string, date)
+
@@ -1,4 +1,44 @@
 """Provides classes to store data for actions."""
+import array
+import collections
+
+# Immutable copies of the data, which can be shared between callers.
+FrozenBodyCompositionData = collections.namedtuple(
+    "FrozenBodyCompositionData", ["mass", "fat_percentage"])
+FrozenTransactionData = collections.namedtuple(
+    "FrozenTransactionData", ["debit", "credit", "amount", "memo"])
+
+
+class BodyCompositionColumns(object):
+    """
+    Data of many body composition actions stored by column, so a batch is
+    held without an object per action.
+
+    Attributes
+    ----------
+    indexes : array.array of int
+        Index in the parsed input of each row.
+    masses : array.array of float
+        Mass in pounds of each row.
+    fat_percentages : array.array of float
+        Body fat percentage of each row.
+    """
+
+    def __init__(self):
+        self.indexes = array.array("l")
+        self.masses = array.array("d")
+        self.fat_percentages = array.array("d")
+
+    def __len__(self):
+        return len(self.indexes)
+
+    def append(self, index, mass, fat_percentage):
+        """
+        Add a row.
+        """
+        self.indexes.append(index)
+        self.masses.append(mass)
+        self.fat_percentages.append(fat_percentage)
 
 
 class BodyCompositionData(object):
@@ -17,6 +57,55 @@ class BodyCompositionData(object):
         self.mass = mass
         self.fat_percentage = fat_percentage
 
+    def freeze(self):
+        """
+        Returns
+        -------
+        powl.actiondata.FrozenBodyCompositionData
+            Immutable copy of the data.
+        """
+        return FrozenBodyCompositionData(self.mass, self.fat_percentage)
+
+
+class TransactionColumns(object):
+    """
+    Data of many accounting actions stored by column, so a batch is held
+    without an object per action.
+
+    Attributes
+    ----------
+    indexes : array.array of int
+        Index in the parsed input of each row.
+    debits : list of str
+        Debit account of each row.
+    credits : list of str
+        Credit account of each row.
+    amounts : array.array of float
+        Dollar amount of each row.
+    memos : list of str
+        Transaction description of each row.
+    """
+
+    def __init__(self):
+        self.indexes = array.array("l")
+        self.debits = []
+        self.credits = []
+        self.amounts = array.array("d")
+        self.memos = []
+
+    def __len__(self):
+        return len(self.indexes)
+
+    def append(self, index, debit, credit, amount, memo):
+        """
+        Add a row.
+        """
+        self.indexes.append(index)
+        self.debits.append(debit)
+        self.credits.append(credit)
+        self.amounts.append(amount)
+        self.memos.append(memo)
+
 
 class TransactionData(object):
     """
@@ -40,3 +129,13 @@ class TransactionData(object):
         self.amount = amount
         self.memo = memo
 
+    def freeze(self):
+        """
+        Returns
+        -------
+        powl.actiondata.FrozenTransactionData
+            Immutable copy of the data.
+        """
+        return FrozenTransactionData(self.debit, self.credit, self.amount,
+                                     self.memo)
+
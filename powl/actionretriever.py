@@ -1,6 +1,12 @@
 """Send and receive emails."""
 import email
+import hashlib
+import mmap
+import os
+import re
+import time
 from powl import exception
+from powl import mail
 
 
 class ActionItemRetriever(object):
@@ -8,6 +14,20 @@ class ActionItemRetriever(object):
     Provides methods for retrieving a list of action items.
     """
 
+    def acknowledge(self, action_items):
+        """
+        Mark action items as processed, so they are not retrieved again.
+        Action items that were retrieved but not given may be retrieved
+        again.
+
+        Parameters
+        ----------
+        action_items : list of (str, time.struct_time)
+            Action items returned by get_action_items or
+            iter_action_items.
+        """
+        pass
+
     def get_action_items(self):
         """
         Get and return a list of action items.
@@ -18,6 +38,50 @@ class ActionItemRetriever(object):
         """
         pass
 
+    def iter_action_items(self):
+        """
+        Get action items one at a time, so each can be processed before the
+        rest are retrieved.
+
+        Returns
+        -------
+        iterator of (str, time.struct_time)
+        """
+        return iter(self.get_action_items())
+
+    def mark_performed(self, action_item):
+        """
+        Record that an action item was performed, as soon as it is, so it is
+        not performed again even if acknowledge is never reached.
+
+        Parameters
+        ----------
+        action_item : (str, time.struct_time)
+            Action item returned by get_action_items or iter_action_items.
+        """
+        pass
+
+    def wait(self, timeout, poll_interval=None):
+        """
+        Block until new action items may be available or until timeout
+        seconds have passed.
+
+        Parameters
+        ----------
+        timeout : float
+            Maximum number of seconds to wait.
+        poll_interval : float
+            Seconds to wait instead when new action items are not pushed
+            and must be polled for, default timeout.
+
+        Returns
+        -------
+        bool
+            Whether new action items may be available.
+        """
+        time.sleep(min(timeout, poll_interval or timeout))
+        return True
+
 
 class MailRetriever(ActionItemRetriever):
     """
@@ -26,7 +90,7 @@ class MailRetriever(ActionItemRetriever):
 
     _MESSAGE_PART = '(RFC822)'
 
-    def __init__(self, mail, server, user, password):
+    def __init__(self, mail, server, user, password, index=None):
         """
         Parameters
         ----------
@@ -38,32 +102,247 @@ class MailRetriever(ActionItemRetriever):
             Email address.
         password : str
             Email password.
+        index : powl.messageindex.ProcessedMessageIndex
+            Keys of the messages already performed, which are skipped and
+            acknowledged again. Default is no deduplication.
         """
         self._mail = mail
         self._server = server
         self._user = user
         self._password = password
+        self._index = index
+        self._logged_in = False
+        # Map of id of a retrieved action item to it and its message.
+        self._pending = {}
+        # Messages skipped as already performed but not yet acknowledged.
+        self._duplicates = []
+
+    def _close(self):
+        """
+        Close the mail session after a failure, so the broken connection is
+        not left open, and log in again on the next call.
+        """
+        self._logged_in = False
+        try:
+            self._mail.close()
+        except Exception:
+            # The connection is already broken.
+            pass
 
     def _convert_message_to_action_item(self, message):
         """
-        Return an ActionItem from a Message.
+        Return an action item from a powl.mail.MailMessage.
+        """
+        return message.body, message.date
+
+    def _get_message_key(self, message):
+        """
+        Return the Message-ID of a powl.mail.MailMessage, or a hash of its
+        date and body if it has none.
+        """
+        if message.message_id:
+            return message.message_id.strip()
+        content = "{0}\n{1}".format(message.date, message.body)
+        digest = hashlib.sha1(content.encode("utf-8")).hexdigest()
+        return "sha1:" + digest
+
+    def _login(self):
+        """
+        Connect and log in to the mail server unless already logged in.
         """
-        action_item = ActionItem()
-        action_item.action = message.body
-        action_item.date = message.date
-        return action_item
+        if not self._logged_in:
+            self._mail.connect(self._server)
+            self._mail.login(self._user, self._password)
+            self._logged_in = True
+
+    def acknowledge(self, action_items):
+        """
+        Acknowledge the messages of the given action items on the mail
+        server in one batch.
+        """
+        messages = [self._pending[id(i)][1] for i in action_items
+                    if id(i) in self._pending]
+        messages.extend(self._duplicates)
+        self._pending = {}
+        self._duplicates = []
+        if messages:
+            self._login()
+            self._mail.acknowledge(messages)
 
     def get_action_items(self):
         """
         Return a list of action items retrieved from a mail box.
         """
-        self._mail.connect(self._server)
-        self._mail.login(self._user, self._password)
-        messages = self._mail.get_messages()
+        return list(self.iter_action_items())
+
+    def iter_action_items(self):
+        """
+        Yield action items from a mail box as each message is retrieved.
+
+        The mail session is kept open between calls, and is closed after a
+        failure and reopened on the next call. Messages found in the index
+        are skipped.
+        """
+        self._login()
+        try:
+            for message in self._mail.iter_messages():
+                if (self._index is not None and
+                        self._get_message_key(message) in self._index):
+                    message.release()
+                    self._duplicates.append(message)
+                    continue
+                action_item = self._convert_message_to_action_item(message)
+                # Only the UID is needed to acknowledge the message later.
+                message.release()
+                self._pending[id(action_item)] = (action_item, message)
+                yield action_item
+        except Exception:
+            self._close()
+            raise
+
+    def mark_performed(self, action_item):
+        """
+        Add the key of the message of an action item to the index.
+        """
+        if self._index is None or id(action_item) not in self._pending:
+            return
+        message = self._pending[id(action_item)][1]
+        self._index.add(self._get_message_key(message))
+
+    def wait(self, timeout, poll_interval=None):
+        """
+        Wait on the open mail session for new mail.
+        """
+        self._login()
+        try:
+            return self._mail.idle(timeout, poll_interval)
+        except Exception:
+            self._close()
+            raise
 
-        action_items = []
-        for message in messages:
-            action_item = self._convert_message_to_action_item(message)
-            action_items.append(action_item)
-        return action_items
 
+class MaildirRetriever(ActionItemRetriever):
+    """
+    Provides methods for retrieving action items from a local Maildir.
+    """
+
+    # Delivery time in seconds and microseconds at the start of the name.
+    _DELIVERY_TIME = re.compile(r"^(\d+)(?:\.M(\d+))?")
+    _SUBDIRS = ("cur", "new")
+
+    def __init__(self, path):
+        """
+        Parameters
+        ----------
+        path : str
+            Path of the Maildir, which holds the cur and new folders.
+        """
+        self._path = path
+
+    def _get_delivery_key(self, entry):
+        """
+        Return a sort key of a message file by delivery time, read from its
+        name or else from its modification time.
+        """
+        match = self._DELIVERY_TIME.match(entry.name)
+        if match:
+            seconds = int(match.group(1))
+            microseconds = int(match.group(2) or 0)
+        else:
+            mtime = entry.stat().st_mtime
+            seconds = int(mtime)
+            microseconds = int((mtime - seconds) * 1000000)
+        return seconds, microseconds, entry.name
+
+    def get_action_items(self):
+        """
+        Return a list of action items read from the Maildir.
+        """
+        return list(self.iter_action_items())
+
+    def iter_action_items(self):
+        """
+        Yield action items one message file at a time, in delivery order
+        across the cur and new folders.
+        """
+        entries = []
+        for subdir in self._SUBDIRS:
+            folder = os.path.join(self._path, subdir)
+            if not os.path.isdir(folder):
+                continue
+            entries.extend(entry for entry in os.scandir(folder)
+                           if entry.is_file() and
+                           not entry.name.startswith("."))
+        entries.sort(key=self._get_delivery_key)
+        for entry in entries:
+            with open(entry.path, "rb") as infile:
+                message = mail.MailMessage.from_bytes(infile.read())
+            yield message.body, message.date
+
+
+class MboxRetriever(ActionItemRetriever):
+    """
+    Provides methods for retrieving action items from a local mbox file.
+    """
+
+    # Lines of a message starting with "From " are escaped by a ">".
+    _ESCAPED_FROM = re.compile(br"^>(>*From )", re.MULTILINE)
+    _FROM_LINE = b"From "
+    # A "From " line only starts a message after a blank line, since
+    # writers that do not escape them leave other "From " lines in bodies.
+    _SEPARATOR = re.compile(br"\n\r?\n(From )")
+
+    def __init__(self, path):
+        """
+        Parameters
+        ----------
+        path : str
+            Path of the mbox file.
+        """
+        self._path = path
+
+    def _iter_messages(self, data):
+        """
+        Yield the raw bytes of each message of an mbox, without its "From "
+        line and with escaped "From " lines restored.
+
+        Separators are searched for on the mapped file, so only the
+        messages themselves are copied out of it.
+        """
+        if data[:len(self._FROM_LINE)] == self._FROM_LINE:
+            start = 0
+        else:
+            match = self._SEPARATOR.search(data)
+            start = match.start(1) if match else -1
+        while start >= 0:
+            # Skip the "From " line.
+            body_start = data.find(b"\n", start) + 1
+            if not body_start:
+                return
+            match = self._SEPARATOR.search(data, body_start)
+            # The blank line before the next "From " line is not part of
+            # the message.
+            end = match.start() + 1 if match else len(data)
+            yield self._ESCAPED_FROM.sub(br"\1", data[body_start:end])
+            start = match.start(1) if match else -1
+
+    def get_action_items(self):
+        """
+        Return a list of action items read from the mbox file.
+        """
+        return list(self.iter_action_items())
+
+    def iter_action_items(self):
+        """
+        Yield action items one message at a time from the mapped mbox file.
+        """
+        with open(self._path, "rb") as infile:
+            if os.fstat(infile.fileno()).st_size == 0:
+                return
+            data = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for raw in self._iter_messages(data):
+                    message = mail.MailMessage.from_bytes(raw)
+                    yield message.body, message.date
+            finally:
+                data.close()
@@ -1,20 +1,20 @@
 """Defines action types and an action map for shorthand keys."""
+from powl import prefixtrie
 
 # Action types.
 BODY_COMPOSITION = "bodycomposition"
 NOTE = "note"
 TRANSACTION = "transaction"
 
-# Maps keys to actions. Multiple keys can map to one action.
-ACTION_MAP = {
-    "b": BODY_COMPOSITION,
-    "body": BODY_COMPOSITION,
-    "bodycomposition": BODY_COMPOSITION,
-
-    "n": NOTE,
-    "note": NOTE,
+ACTION_TYPES = (BODY_COMPOSITION, NOTE, TRANSACTION)
 
-    "a": TRANSACTION,
-    "transaction": TRANSACTION
+# Maps keys to actions. Multiple keys can map to one action. Prefixes of an
+# action type, such as "b" or "body", need no entry.
+ACTION_MAP = {
+    "a": TRANSACTION
 }
 
+# Resolves an action type, an alias or an unambiguous prefix of either.
+ACTION_TRIE = prefixtrie.PrefixTrie(
+    dict(ACTION_MAP, **dict((t, t) for t in ACTION_TYPES)))
+
@@ -1,60 +1,283 @@
 #!/usr/bin/env python
 """Main script for running powl."""
+import collections
 import injector
+import logging
+import queue
 import sys
+import threading
+import time
+import traceback
 from powl import action
+from powl import actionretriever
+from powl import exception
 from powl import log
 from powl import parser
-from powl import retriever
+
+class ParserCache(object):
+    """
+    Wraps the parser of the app in a powl.parser.CachingParser if a cache
+    size is given.
+    """
+
+    def __init__(self, max_size=None):
+        """
+        Parameters
+        ----------
+        max_size : int
+            Maximum number of cached results, or None to not cache.
+        """
+        self._max_size = max_size
+
+    def wrap(self, item_parser):
+        """
+        Return item_parser, cached if there is a cache size.
+        """
+        if self._max_size is None:
+            return item_parser
+        return parser.CachingParser(item_parser, self._max_size)
+
+
+class ParserCacheModule(injector.Module):
+    """
+    Caches the fully parsed action type and data of each action item, so a
+    repeated item is neither split nor parsed by its action again.
+    """
+
+    def __init__(self, max_size=1024):
+        """
+        Parameters
+        ----------
+        max_size : int
+            Maximum number of cached results.
+        """
+        self._max_size = max_size
+
+    def configure(self, binder):
+        binder.bind(ParserCache, to=ParserCache(self._max_size))
+
 
 class App:
     """
     Contains the main logic for this app.
     """
 
-    def __init__(self, injector):
+    # Marks the end of the retrieved action items in the queue.
+    _END_OF_ITEMS = None
+    # Error categories counted besides the powl.result error codes.
+    _ERROR_ACKNOWLEDGE = "acknowledge"
+    _ERROR_MARK_PERFORMED = "mark performed"
+    _ERROR_RETRIEVAL = "retrieval"
+    _ERROR_UNEXPECTED = "unexpected"
+    # IMAP servers may drop an IDLE after 30 minutes so re-issue it earlier.
+    _IDLE_TIMEOUT = 25 * 60
+    # Wait between runs when new action items cannot be pushed.
+    _POLL_INTERVAL = 60
+    _QUEUE_SIZE = 100
+    _RETRY_DELAY = 60
+
+    def __init__(self, injector, queue_size=_QUEUE_SIZE):
         """
         Parameters
         ----------
         injector : injector.Injector
             Container used to resolve objects to run the app.
+        queue_size : int
+            Maximum number of retrieved action items waiting to be performed.
         """
+        self._queue_size = queue_size
         self._action_manager = injector.get(action.ActionManager)
         self._log = injector.get(log.Log)
-        self._parser = injector.get(parser.ActionItemParser)
-        self._retriever = injector.get(retriever.ActionItemRetriever)
+        self._parser = injector.get(ParserCache).wrap(action.ActionParser(
+            injector.get(parser.ActionItemParser), self._action_manager))
+        self._retriever = injector.get(actionretriever.ActionItemRetriever)
+        self._error_counts = collections.Counter()
+        # Errors are counted from both the retrieval and the main thread.
+        self._error_lock = threading.Lock()
 
-    def run(self):
+    def _acknowledge(self, items):
         """
-        Retrieve a list of input actions and perform them.
+        Acknowledge the action items that were performed, logging any
+        failure. The retriever is called even with no items, since it may
+        have skipped items to acknowledge.
         """
         try:
-            items = self._retriever.get_action_items()
+            self._retriever.acknowledge(items)
         except Exception as err:
-            message = exception.get_message(err)
-            traceback = traceback.format_exc()
-            log_.error(message)
-            log_.debug(traceback)
-        else:
-            for item, date in items:
-                try:
-                    log_message = "action ({0}) on {1}".format(
-                        item, time.strftime("%Y-%m-%d", date))
-                    self._log.info(log_message)
-                    action_key, action_data = self._parser.parse(item)
-                    self._action_manager.do_action(action_key, action_data,
-                                                   date)
-                except Exception as err:
-                    message = exception.get_message(err)
-                    traceback = traceback.format_exc()
-                    log_.error(message)
-                    log_.debug(traceback)
+            self._log_error(err, self._ERROR_ACKNOWLEDGE)
+
+    def _count_error(self, code):
+        """
+        Count an error of a category for the summary of the run.
+        """
+        with self._error_lock:
+            self._error_counts[code] += 1
+
+    def _do_action_item(self, item, date):
+        """
+        Parse and perform one action item, logging and counting any
+        failure.
+
+        Invalid action items are reported as powl.result errors rather than
+        exceptions, since they may outnumber valid ones.
+
+        Returns
+        -------
+        bool
+            Whether the action was performed.
+        """
+        try:
+            log_message = "action ({0}) on {1}".format(
+                item, time.strftime("%Y-%m-%d", date))
+            self._log.info(log_message)
+            done = self._parser.try_parse(item)
+            if done.ok:
+                action_type, action_data, data = done.value
+                done = self._action_manager.try_perform_action(
+                    action_type, data, action_data, date)
+        except Exception as err:
+            self._log_error(err, self._ERROR_UNEXPECTED)
+            return False
+        if not done.ok:
+            self._log_failure(done.error)
+            return False
+        return True
+
+    def _log_error(self, err, code=None):
+        """
+        Log the message embedded in an exception, count it under code if
+        given, and log its traceback if debug messages are written.
+        """
+        if code is not None:
+            self._count_error(code)
+        self._log.error(exception.get_message(err))
+        if self._log.is_enabled_for(logging.DEBUG):
+            self._log.debug(traceback.format_exc())
+
+    def _log_failure(self, error):
+        """
+        Log and count a powl.result.Error, and log the traceback of its
+        exception if it has one and debug messages are written.
+        """
+        self._count_error(error.code)
+        self._log.error(error.message)
+        if (error.exception is not None and
+                self._log.is_enabled_for(logging.DEBUG)):
+            err = error.exception
+            self._log.debug("".join(traceback.format_exception(
+                type(err), err, err.__traceback__)))
+
+    def _log_summary(self, performed_count):
+        """
+        Log the number of performed action items and of errors by category.
+        """
+        with self._error_lock:
+            counts = sorted(self._error_counts.items())
+        self._log.info("performed %d action items, %d errors%s",
+                       performed_count,
+                       sum(count for _, count in counts),
+                       "".join(", {0}: {1}".format(code, count)
+                               for code, count in counts))
+
+    def _mark_performed(self, item):
+        """
+        Record a performed action item with the retriever, logging any
+        failure.
+        """
+        try:
+            self._retriever.mark_performed(item)
+        except Exception as err:
+            self._log_error(err, self._ERROR_MARK_PERFORMED)
+
+    def _retrieve(self, items):
+        """
+        Put retrieved action items on the queue followed by the end marker.
+        """
+        try:
+            for item in self._retriever.iter_action_items():
+                items.put(item)
+        except Exception as err:
+            self._log_error(err, self._ERROR_RETRIEVAL)
+        finally:
+            items.put(self._END_OF_ITEMS)
+
+    def run(self):
+        """
+        Retrieve input actions and perform each as soon as it is retrieved.
+
+        Retrieval runs in its own thread and feeds a bounded queue that this
+        thread drains, so network waits overlap with parsing and file
+        writes, and retrieval blocks once queue_size items are waiting.
+        Actions are performed one at a time in retrieval order, since they
+        append to shared output files. Each performed action item is
+        marked with the retriever right away, and the performed ones are
+        acknowledged in one batch at the end, so failed ones are retrieved
+        again. Retrieval runs ahead of the performed actions, so only
+        acknowledge may advance a retrieval checkpoint, and never past a
+        failed action item. The run ends by logging a summary of the errors
+        by category.
+        """
+        with self._error_lock:
+            self._error_counts.clear()
+        items = queue.Queue(self._queue_size)
+        retriever_thread = threading.Thread(target=self._retrieve,
+                                            args=(items,))
+        retriever_thread.daemon = True
+        retriever_thread.start()
+
+        performed = []
+        while True:
+            item = items.get()
+            if item is self._END_OF_ITEMS:
+                break
+            if self._do_action_item(*item):
+                self._mark_performed(item)
+                performed.append(item)
+        retriever_thread.join()
+        self._acknowledge(performed)
+        self._log_summary(len(performed))
+
+    @property
+    def error_counts(self):
+        """
+        Number of errors of the last run by category, such as a powl.result
+        error code.
+        """
+        with self._error_lock:
+            return dict(self._error_counts)
+
+    def run_forever(self, idle_timeout=_IDLE_TIMEOUT,
+                    poll_interval=_POLL_INTERVAL):
+        """
+        Run, then wait for the retriever to report new action items and run
+        again until interrupted.
+
+        Parameters
+        ----------
+        idle_timeout : float
+            Maximum number of seconds to wait before running again.
+        poll_interval : float
+            Number of seconds to wait before running again when the
+            retriever cannot report new action items, such as with a mail
+            server without IDLE.
+        """
+        while True:
+            self.run()
+            try:
+                self._retriever.wait(idle_timeout, poll_interval)
+            except Exception as err:
+                self._log_error(err)
+                time.sleep(self._RETRY_DELAY)
 
 def main(*args):
-    injector = injector.Injector()
-    app = App(injector)
-    app.run()
+    modules = []
+    if "--parse-cache" in args:
+        modules.append(ParserCacheModule())
+    app = App(injector.Injector(modules))
+    if "--idle" in args:
+        app.run_forever()
+    else:
+        app.run()
 
 if __name__ == '__main__':
     main(*sys.argv[1:])
-
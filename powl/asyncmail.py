@@ -0,0 +1,461 @@
+"""Provides asyncio methods for retrieving messages from many mailboxes."""
+import asyncio
+import imaplib
+import re
+import socket
+import ssl
+from powl import exception
+from powl import mail
+
+_ERRMSG_COMMAND_FAILED = "{0} failed: {1}"
+_ERRMSG_CONNECT_UNKNOWN = "unknown connect error to {0}"
+_ERRMSG_EMPTY_USER = "empty email address"
+_ERRMSG_EMPTY_PASSWORD = "empty email password"
+_ERRMSG_EMPTY_SERVER = "empty server address"
+_ERRMSG_INVALID_BATCH_SIZE = "batch size ({0}) must be at least 1"
+_ERRMSG_INVALID_CREDENTIALS = "invalid email credentials"
+_ERRMSG_INVALID_MAILBOX = "{0} is an invalid mailbox folder"
+_ERRMSG_NOT_CONNECTED = "not connected to mail server"
+_ERRMSG_NOT_LOGGED_IN = "not logged in to mail server"
+_ERRMSG_SERVER_NOT_FOUND = "{0} not found"
+_ERRMSG_TIMEOUT = "{0} has timed out"
+
+_LITERAL = re.compile(br"\{(\d+)\}\r\n$")
+_SEARCH_RESPONSE = re.compile(br"^\* SEARCH\b(.*)$", re.IGNORECASE)
+_UIDVALIDITY_RESPONSE = re.compile(br"\[UIDVALIDITY (\d+)\]", re.IGNORECASE)
+_UNTAGGED_FETCH = re.compile(br"^\* (\d+) FETCH ", re.IGNORECASE)
+
+
+class _AsyncImapConnection(object):
+    """
+    A minimal IMAP4rev1 client over asyncio streams.
+
+    The timeout applies to each read and write rather than to a whole
+    command, so a FETCH of many messages that keeps arriving does not time
+    out however long it takes in total.
+    """
+
+    _TAG = "P{0}"
+
+    def __init__(self, reader, writer, timeout):
+        """
+        Parameters
+        ----------
+        reader : asyncio.StreamReader
+        writer : asyncio.StreamWriter
+        timeout : float
+            Timeout in seconds for each read and write.
+        """
+        self._reader = reader
+        self._writer = writer
+        self._timeout = timeout
+        self._tag_count = 0
+
+    async def _wait(self, awaitable):
+        """
+        Await a single read or write, raising asyncio.TimeoutError if it
+        takes longer than the timeout.
+        """
+        return await asyncio.wait_for(awaitable, self._timeout)
+
+    async def _read_response(self):
+        """
+        Read one response, which spans several lines if it has literals.
+
+        Returns
+        -------
+        list of bytes or tuple of bytes, bytes
+            Parts of the response in the form given by imaplib, where each
+            literal is returned as a (prefix, data) tuple.
+        """
+        parts = []
+        while True:
+            line = await self._wait(self._reader.readline())
+            if not line:
+                raise imaplib.IMAP4.abort(_ERRMSG_NOT_CONNECTED)
+            match = _LITERAL.search(line)
+            if not match:
+                parts.append(line.rstrip(b"\r\n"))
+                return parts
+            literal = await self._wait(
+                self._reader.readexactly(int(match.group(1))))
+            parts.append((line.rstrip(b"\r\n"), literal))
+
+    async def close(self):
+        """
+        Close the stream.
+        """
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except (ConnectionError, ssl.SSLError):
+            pass
+
+    async def command(self, name, *args):
+        """
+        Send a command and read its responses.
+
+        Returns
+        -------
+        status : str
+            "OK", "NO" or "BAD".
+        untagged : list of list
+            Untagged responses, each as returned by _read_response.
+        completion : bytes
+            The tagged completion line.
+        """
+        self._tag_count += 1
+        tag = self._TAG.format(self._tag_count).encode("ascii")
+        line = " ".join((name,) + args).encode("utf-8")
+        self._writer.write(tag + b" " + line + b"\r\n")
+        await self._wait(self._writer.drain())
+
+        untagged = []
+        while True:
+            parts = await self._read_response()
+            first = parts[0][0] if isinstance(parts[0], tuple) else parts[0]
+            if first.startswith(tag + b" "):
+                status = first.split(b" ", 2)[1].decode("ascii").upper()
+                return status, untagged, first
+            untagged.append(parts)
+
+    async def read_greeting(self):
+        """
+        Read the greeting sent by the server on connect.
+        """
+        return await self._read_response()
+
+
+class AsyncImapMail(object):
+    """
+    Implements the connect, login, get_messages and acknowledge contract
+    of powl.mail.Mail with asyncio, so one event loop can drive many
+    mailboxes at once. Every method is a coroutine.
+    """
+
+    _FLAG_SEEN = "(\\Seen)"
+    _FULL_RESPONSE = "BODY[]"
+    # PEEK leaves the message unseen until it is acknowledged.
+    _MESSAGE_PART = "(BODY.PEEK[])"
+
+    def __init__(self, mailbox="inbox", timeout=5, charset=None,
+                 criteria="(Unseen)", batch_size=500, port=993, use_ssl=True):
+        """
+        Parameters
+        ----------
+        mailbox : str
+            Default is "inbox".
+        timeout : int
+            Timeout in seconds for each network read or write. The
+            connection is closed after a timeout.
+        charset : str
+            Charset used for the search used to retrieve mail ids.
+        criteria : str
+            Criteria used for the search used to retrieve mail ids.
+        batch_size : int
+            Maximum number of messages requested by a single FETCH.
+        port : int
+            Port of the IMAP server.
+        use_ssl : bool
+            Whether to connect with SSL.
+
+        Raises
+        ------
+        ValueError
+            If batch_size is less than 1.
+        """
+        if batch_size < 1:
+            errmsg = _ERRMSG_INVALID_BATCH_SIZE.format(batch_size)
+            err = exception.create(ValueError, errmsg)
+            raise err
+
+        self._mailbox = mailbox
+        self._timeout = timeout
+        self._charset = charset
+        self._criteria = criteria
+        self._batch_size = batch_size
+        self._port = port
+        self._use_ssl = use_ssl
+
+        self._connection = None
+        self._logged_in = False
+        self._uidvalidity = None
+
+    def _assert_connected(self):
+        """
+        Raise exception if not connected to IMAP server.
+        """
+        if not self._connection:
+            errmsg = _ERRMSG_NOT_CONNECTED
+            err = exception.create(ValueError, errmsg)
+            raise err
+
+    def _assert_logged_in(self):
+        """
+        Raise exception if not logged in to IMAP server.
+        """
+        if not self._logged_in:
+            errmsg = _ERRMSG_NOT_LOGGED_IN
+            err = exception.create(ValueError, errmsg)
+            raise err
+
+    def _assert_not_empty(self, value, errmsg):
+        """
+        Raise exception if value is empty.
+        """
+        if not value:
+            err = exception.create(ValueError, errmsg)
+            raise err
+
+    async def _abort(self):
+        """
+        Close the connection without logging out, after a failure left it
+        in an unknown state.
+        """
+        connection = self._connection
+        self._connection = None
+        self._logged_in = False
+        await connection.close()
+
+    async def _command(self, name, *args):
+        """
+        Send a command, raising imaplib.IMAP4.error unless it completes OK.
+
+        The connection is closed if a read or write times out, since the
+        rest of the response may still arrive and be read as the response
+        of the next command.
+        """
+        try:
+            status, untagged, completion = await self._connection.command(
+                name, *args)
+        except asyncio.TimeoutError:
+            await self._abort()
+            raise
+        if status != "OK":
+            # Raised like imaplib does, so callers add their own message.
+            raise imaplib.IMAP4.error(_ERRMSG_COMMAND_FAILED.format(
+                name, completion.decode("utf-8", "replace")))
+        return untagged
+
+    async def _get_message_ids(self):
+        """
+        Return a list of email message UIDs.
+        """
+        if self._charset:
+            args = ("CHARSET", self._charset, self._criteria)
+        else:
+            args = (self._criteria,)
+        untagged = await self._command("UID SEARCH", *args)
+
+        message_ids = []
+        for parts in untagged:
+            match = _SEARCH_RESPONSE.match(parts[0])
+            if match:
+                message_ids.extend(match.group(1).split())
+        return message_ids
+
+    async def _get_messages_batch(self, message_ids):
+        """
+        Return the powl.mail.MailMessage of one batch of the given ids, in
+        the order of the given ids.
+        """
+        message_set = mail.format_message_set(message_ids)
+        untagged = await self._command("UID FETCH", message_set,
+                                       self._MESSAGE_PART)
+
+        # Strip "* " and "FETCH " so the response reads as imaplib's does.
+        response = []
+        for parts in untagged:
+            if isinstance(parts[0], tuple):
+                prefix, literal = parts[0]
+            else:
+                prefix, literal = parts[0], None
+            if not _UNTAGGED_FETCH.match(prefix):
+                continue
+            prefix = _UNTAGGED_FETCH.sub(br"\1 ", prefix, 1)
+            first = (prefix, literal) if literal is not None else prefix
+            response.extend([first] + parts[1:])
+        fetched = mail.parse_fetch_response(response)
+
+        messages = []
+        for message_id in message_ids:
+            raw = fetched.get(int(message_id), {}).get(self._FULL_RESPONSE)
+            if raw is None:
+                continue
+            messages.append(mail.MailMessage.from_bytes(
+                mail.to_bytes(raw), int(message_id)))
+        return messages
+
+    async def _select_mailbox(self):
+        """
+        Select a mailbox folder.
+        """
+        try:
+            untagged = await self._command("SELECT",
+                                           mail.quote(self._mailbox))
+        except imaplib.IMAP4.error as err:
+            errmsg = _ERRMSG_INVALID_MAILBOX.format(self._mailbox)
+            exception.add_message(err, errmsg)
+            raise
+
+        for parts in untagged:
+            match = _UIDVALIDITY_RESPONSE.search(parts[0])
+            if match:
+                self._uidvalidity = int(match.group(1))
+
+    async def acknowledge(self, messages):
+        """
+        Flag the given messages as seen, so they are not retrieved again.
+        Every batch_size messages are flagged by one UID STORE.
+
+        Parameters
+        ----------
+        messages : list of powl.mail.MailMessage
+            Messages returned by get_messages.
+        """
+        self._assert_connected()
+        self._assert_logged_in()
+
+        message_ids = [m.id for m in messages if m.id is not None]
+        for start in range(0, len(message_ids), self._batch_size):
+            batch = message_ids[start:start + self._batch_size]
+            await self._command("UID STORE", mail.format_message_set(batch),
+                                "+FLAGS", self._FLAG_SEEN)
+
+    async def close(self):
+        """
+        Log out and close the connection.
+        """
+        if not self._connection:
+            return
+        try:
+            await self._connection.command("LOGOUT")
+        except (imaplib.IMAP4.error, asyncio.TimeoutError, OSError):
+            pass
+        await self._connection.close()
+        self._connection = None
+        self._logged_in = False
+
+    async def connect(self, server):
+        """
+        Establishes a connection to the mail server.
+
+        Parameters
+        ----------
+        server : str
+            URL or ip address of the mail server.
+        """
+        self._assert_not_empty(server, _ERRMSG_EMPTY_SERVER)
+
+        ssl_context = ssl.create_default_context() if self._use_ssl else None
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(server, self._port, ssl=ssl_context),
+                self._timeout)
+            self._connection = _AsyncImapConnection(reader, writer,
+                                                    self._timeout)
+            await self._connection.read_greeting()
+        except asyncio.TimeoutError as err:
+            if self._connection:
+                await self._abort()
+            errmsg = _ERRMSG_TIMEOUT.format(server)
+            exception.add_message(err, errmsg)
+            raise
+        except IOError as err:
+            if err.errno in (socket.EAI_NONAME, socket.errno.ENETUNREACH):
+                errmsg = _ERRMSG_SERVER_NOT_FOUND.format(server)
+            else:
+                errmsg = _ERRMSG_CONNECT_UNKNOWN.format(server)
+            exception.add_message(err, errmsg)
+            raise
+
+    async def get_messages(self):
+        """
+        Retrieves all mail messages matching the criteria. They are left
+        unseen until they are acknowledged.
+
+        Returns
+        -------
+        list of powl.mail.MailMessage
+        """
+        self._assert_connected()
+        self._assert_logged_in()
+
+        message_ids = await self._get_message_ids()
+        messages = []
+        for start in range(0, len(message_ids), self._batch_size):
+            batch = message_ids[start:start + self._batch_size]
+            messages.extend(await self._get_messages_batch(batch))
+        return messages
+
+    async def login(self, user, password):
+        """
+        Log in to the mail server with the given username and password.
+
+        Paramaters
+        ----------
+        user : str
+            User email address.
+        password : str
+            Password for email address.
+        """
+        self._assert_connected()
+        self._assert_not_empty(user, _ERRMSG_EMPTY_USER)
+        self._assert_not_empty(password, _ERRMSG_EMPTY_PASSWORD)
+
+        try:
+            await self._command("LOGIN", mail.quote(user),
+                                mail.quote(password))
+        except imaplib.IMAP4.error as err:
+            exception.add_message(err, _ERRMSG_INVALID_CREDENTIALS)
+            raise
+
+        await self._select_mailbox()
+        self._logged_in = True
+
+
+async def _acknowledge_all(async_mail, messages):
+    """
+    Acknowledge all of the messages and return them.
+    """
+    await async_mail.acknowledge(messages)
+    return messages
+
+
+async def get_all_messages(accounts, concurrency=10, process=None):
+    """
+    Retrieve the messages of many mailboxes concurrently.
+
+    Parameters
+    ----------
+    accounts : list of tuple of powl.asyncmail.AsyncImapMail, str, str, str
+        The mail object, server, user and password of each mailbox.
+    concurrency : int
+        Maximum number of mailboxes retrieved at the same time.
+    process : coroutine function
+        Called with the mail object and messages of each mailbox before it
+        is logged out, to process and acknowledge the messages. Its result
+        is the result of the account. By default all of the messages are
+        acknowledged and returned.
+
+    Returns
+    -------
+    list of object or Exception
+        The result of process for each account, in the order of accounts,
+        or the exception that stopped their retrieval.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    process = process or _acknowledge_all
+
+    async def retrieve(async_mail, server, user, password):
+        async with semaphore:
+            try:
+                await async_mail.connect(server)
+                await async_mail.login(user, password)
+                messages = await async_mail.get_messages()
+                return await process(async_mail, messages)
+            finally:
+                await async_mail.close()
+
+    return await asyncio.gather(*[retrieve(*account) for account in accounts],
+                                return_exceptions=True)
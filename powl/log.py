@@ -26,6 +26,7 @@ class Log(object):
             Optional log level of the handlers based on logging.<Levels>.
         """
         self._logger = logging.getLogger(__name__)
+        self._level = level
 
         formatter = logging.Formatter(
             self._MESSAGE_FORMAT,
@@ -105,6 +106,22 @@ class Log(object):
         """
         self._logger.info(message, *args, **kwargs)
 
+    def is_enabled_for(self, level):
+        """
+        Return if messages of a level are written, so costly messages such
+        as tracebacks are only built when needed.
+
+        Parameters
+        ----------
+        level : int
+            Log level based on logging.<Levels>.
+
+        Returns
+        -------
+        bool
+        """
+        return level >= self._level
+
     def warning(self, message, *args, **kwargs):
         """
         Log a warning message.
@@ -1,191 +1,1880 @@
 """Provides methods for retrieving messages from mailboxes."""
+import binascii
+import datetime
 import email
+import email.feedparser
 import imaplib
+import io
+import re
+import select
 import socket
+import ssl
+import time
+import zlib
 from powl import exception
 
+_ERRMSG_COMMAND_FAILED = "{0} failed: {1}"
 _ERRMSG_CONNECT_UNKNOWN = "unknown connect error to {0}"
 _ERRMSG_EMPTY_USER = "empty email address"
 _ERRMSG_EMPTY_PASSWORD = "empty email password"
 _ERRMSG_EMPTY_SERVER = "empty server address"
+_ERRMSG_INVALID_ACKNOWLEDGE_MODE = "acknowledge mode ({0}) is unknown"
+_ERRMSG_INVALID_BATCH_BOUNDS = "batch size bounds ({0}, {1}) are invalid"
+_ERRMSG_INVALID_BATCH_SIZE = "batch size ({0}) must be at least 1"
+_ERRMSG_INVALID_BYTE_LIMIT = "byte limit ({0}) must be at least 1"
+_ERRMSG_INVALID_CHECKPOINT = "checkpoint ({0}) is invalid"
 _ERRMSG_INVALID_CREDENTIALS = "invalid email credentials"
+_ERRMSG_INVALID_FETCH_MODE = "fetch mode ({0}) is unknown"
 _ERRMSG_INVALID_MAILBOX = "{0} is an invalid mailbox folder"
+_ERRMSG_INVALID_MAX_SIZE = "max size ({0}) must be at least 1"
+_ERRMSG_INVALID_MOVE_MAILBOX = "acknowledge mailbox is empty"
+_ERRMSG_INVALID_OVERSIZE_MODE = "oversize mode ({0}) is unknown"
+_ERRMSG_NON_ASCII_SEARCH = "search value ({0}) is not ASCII"
 _ERRMSG_NOT_CONNECTED = "not connected to mail server"
 _ERRMSG_NOT_LOGGED_IN = "not logged in to mail server"
 _ERRMSG_SERVER_NOT_FOUND = "{0} not found"
 _ERRMSG_TIMEOUT = "{0} has timed out"
 
+# Acknowledge modes of ImapMail.
+ACKNOWLEDGE_DELETE = "delete"
+ACKNOWLEDGE_MOVE = "move"
+ACKNOWLEDGE_SEEN = "seen"
+
+# Fetch modes of ImapMail.
+FETCH_FULL = "full"
+FETCH_PARTIAL = "partial"
+
+# Oversize modes of ImapMail.
+OVERSIZE_SKIP = "skip"
+OVERSIZE_TRUNCATE = "truncate"
+
+# Bytes outside the base64 alphabet, such as whitespace, are skipped.
+_BASE64_IGNORED = re.compile(br"[^A-Za-z0-9+/=]")
+_FETCH_TOKEN = re.compile(
+    r'\s*(?:(?P<open>\()|(?P<close>\))|"(?P<string>(?:[^"\\]|\\.)*)"'
+    r'|\{(?P<literal>\d+)\}|(?P<atom>[^\s()"\[{]+(?:\[[^\]]*\])?(?:<\d+>)?))')
+_QUOTED_ESCAPE = re.compile(r'\\(.)')
+# IMAP dates use English month names whatever the locale.
+_SEARCH_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug",
+                  "Sep", "Oct", "Nov", "Dec")
+
+
+def _decode_base64(data):
+    """
+    Return the bytes of base64 data whose length is a multiple of 4, or no
+    bytes if it is malformed.
+    """
+    try:
+        return binascii.a2b_base64(data)
+    except binascii.Error:
+        return b""
+
+
+def _extract_text_plain(lines):
+    """
+    Read the headers and the first text/plain part of a raw message.
+
+    The lines are consumed one at a time and reading stops at the end of
+    the first text/plain part that is not an attachment, so no other part
+    is parsed or held in memory.
+
+    Parameters
+    ----------
+    lines : iterator of bytes
+        Lines of the raw message.
+
+    Returns
+    -------
+    headers : email.message.Message
+        The top level headers only.
+    text : str or None
+        The decoded text, or None if there is no text/plain part.
+    """
+    headers = _parse_header_lines(lines)
+    text, boundary = _find_text_plain(headers, lines, ())
+    return headers, text
+
+
+def _find_text_plain(headers, lines, boundaries):
+    """
+    Read a part with the given headers and return its first text/plain
+    text, or None, and the boundary line that ended it, or None at the end
+    of the lines.
+    """
+    if headers.get_content_maintype() == "multipart":
+        boundary = headers.get_boundary()
+        if not boundary:
+            return None, _skip_to_boundary(lines, boundaries)
+        delimiter = b"--" + boundary.encode("ascii", "replace")
+        inner = (delimiter,) + tuple(boundaries)
+
+        # Skip the preamble.
+        ended = _skip_to_boundary(lines, inner)
+        while ended == delimiter:
+            part_headers = _parse_header_lines(lines)
+            text, ended = _find_text_plain(part_headers, lines, inner)
+            if text is not None:
+                return text, ended
+        if ended == delimiter + b"--":
+            # Skip the epilogue.
+            ended = _skip_to_boundary(lines, boundaries)
+        return None, ended
+
+    disposition = headers.get_content_disposition()
+    if (headers.get_content_type() != "text/plain" or
+            disposition == "attachment"):
+        return None, _skip_to_boundary(lines, boundaries)
+    return _read_text(headers, lines, boundaries)
+
+
+def _find_text_plain_part(structure, section=""):
+    """
+    Find the first text/plain part of a parsed BODYSTRUCTURE that is not an
+    attachment.
+
+    Parameters
+    ----------
+    structure : list
+        BODYSTRUCTURE as returned by parse_fetch_response.
+    section : str
+        Section number of the given structure.
+
+    Returns
+    -------
+    tuple of str, str, str or None
+        Section number, transfer encoding and charset of the part, or None
+        if the message has no such part.
+    """
+    if not isinstance(structure, list) or not structure:
+        return None
+
+    if isinstance(structure[0], list):
+        # Multipart: the child parts lead, then the multipart subtype.
+        prefix = section + "." if section else ""
+        for index, part in enumerate(structure, 1):
+            if not isinstance(part, list):
+                break
+            found = _find_text_plain_part(part, prefix + str(index))
+            if found:
+                return found
+        return None
+
+    if len(structure) < 6:
+        return None
+    media_type = _to_str(structure[0] or "").lower()
+    media_subtype = _to_str(structure[1] or "").lower()
+    if media_type != "text" or media_subtype != "plain":
+        return None
+    # A text part has its line count then MD5 before its disposition.
+    disposition = structure[9] if len(structure) > 9 else None
+    if (isinstance(disposition, list) and disposition and
+            _to_str(disposition[0] or "").lower() == "attachment"):
+        return None
+
+    charset = None
+    params = structure[2] or []
+    for name, value in zip(params[0::2], params[1::2]):
+        if _to_str(name).lower() == "charset":
+            charset = _to_str(value)
+    encoding = _to_str(structure[5] or "7bit")
+    return section or "1", encoding, charset
+
+
+def format_message_set(message_ids):
+    """
+    Return an IMAP message set with consecutive ids collapsed into ranges.
+
+    Parameters
+    ----------
+    message_ids : list of int or str
+
+    Returns
+    -------
+    str
+        For example [1, 2, 3, 5] becomes "1:3,5".
+    """
+    ranges = []
+    for message_id in sorted(set(int(i) for i in message_ids)):
+        if ranges and ranges[-1][1] == message_id - 1:
+            ranges[-1][1] = message_id
+        else:
+            ranges.append([message_id, message_id])
+
+    parts = []
+    for start, stop in ranges:
+        if start == stop:
+            parts.append(str(start))
+        else:
+            parts.append("{0}:{1}".format(start, stop))
+    return ",".join(parts)
+
+
+def _format_search_date(date):
+    """
+    Return a datetime.date or time.struct_time as an IMAP date such as
+    "1-Sep-2015".
+    """
+    if isinstance(date, time.struct_time):
+        date = datetime.date(*date[:3])
+    return "{0}-{1}-{2}".format(date.day, _SEARCH_MONTHS[date.month - 1],
+                                date.year)
+
+
+def _match_boundary(line, boundaries):
+    """
+    Return the boundary delimiter or close delimiter that line is, or None.
+    """
+    if not line.startswith(b"--"):
+        return None
+    line = line.rstrip()
+    for boundary in boundaries:
+        if line == boundary or line == boundary + b"--":
+            return line
+    return None
+
+
+def parse_fetch_response(response):
+    """
+    Demultiplex the response of a multi-message UID FETCH.
+
+    Responses without a UID item are not replies to the UID FETCH but
+    unsolicited updates, such as new flags, and are ignored.
+
+    Parameters
+    ----------
+    response : list
+        Response data of imaplib.IMAP4.uid("FETCH", ...).
+
+    Returns
+    -------
+    dict of int to dict
+        Map of message UID to a map of upper case item name to item value.
+        Parenthesized values are lists and NIL is None.
+    """
+    tokens = list(_tokenize_fetch_response(response))
+    fetched = {}
+    position = 0
+    while position + 1 < len(tokens):
+        kind, value = tokens[position]
+        if kind != "atom" or not value.isdigit():
+            position += 1
+            continue
+        items, position = _parse_fetch_value(tokens, position + 1)
+        if isinstance(items, list):
+            names = [_to_str(name).upper() for name in items[0::2]]
+            items = dict(zip(names, items[1::2]))
+            if "UID" in items:
+                fetched[int(items["UID"])] = items
+    return fetched
+
+
+def _parse_fetch_value(tokens, position):
+    """
+    Return the value starting at position and the position after it.
+    """
+    kind, value = tokens[position]
+    if kind == "open":
+        values = []
+        position += 1
+        while position < len(tokens) and tokens[position][0] != "close":
+            item, position = _parse_fetch_value(tokens, position)
+            values.append(item)
+        return values, position + 1
+    if kind == "atom" and value.upper() == "NIL":
+        return None, position + 1
+    return value, position + 1
+
+
+def _parse_header_lines(lines):
+    """
+    Return an email.message.Message of the header lines up to the first
+    blank line.
+    """
+    parser = email.feedparser.BytesFeedParser()
+    for line in lines:
+        if not line.strip(b"\r\n"):
+            break
+        parser.feed(line)
+    parser.feed(b"\r\n")
+    return parser.close()
+
+
+def _parse_status_response(response):
+    """
+    Parse the response of a STATUS command.
+
+    Parameters
+    ----------
+    response : list
+        Response data of imaplib.IMAP4.status.
+
+    Returns
+    -------
+    dict of str to int
+        Map of upper case status item name to its value.
+    """
+    tokens = list(_tokenize_fetch_response(response[:1]))
+    if len(tokens) < 2:
+        return {}
+    # The mailbox name is followed by the parenthesized status items.
+    items, position = _parse_fetch_value(tokens, 1)
+    if not isinstance(items, list):
+        return {}
+    names = [_to_str(name).upper() for name in items[0::2]]
+    return dict(zip(names, [int(value) for value in items[1::2]]))
+
+
+def quote(value):
+    """
+    Return value as an IMAP quoted string.
+    """
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+    return '"{0}"'.format(escaped)
+
+
+def to_bytes(value):
+    """
+    Return bytes from the str or bytes given by imaplib.
+    """
+    if isinstance(value, bytes):
+        return value
+    return value.encode("utf-8", "surrogateescape")
+
+
+def _to_str(value, charset=None):
+    """
+    Return a str from the str or bytes given by imaplib.
+    """
+    if isinstance(value, str):
+        return value
+    try:
+        return value.decode(charset or "ascii", "replace")
+    except LookupError:
+        return value.decode("ascii", "replace")
+
+
+def _read_text(headers, lines, boundaries):
+    """
+    Read and decode the text of a single part up to the boundary that ends
+    it, and return the text and the boundary line.
+
+    Base64 and quoted-printable are decoded line by line as they are read.
+    Like the email package, base64 is decoded leniently, so a malformed or
+    truncated part, such as one cut short by OVERSIZE_TRUNCATE, loses its
+    bad bytes rather than failing the message.
+    """
+    encoding = (headers.get("Content-Transfer-Encoding") or "").lower()
+    encoding = encoding.strip()
+    chunks = []
+    pending = b""
+    ended = None
+    for line in lines:
+        ended = _match_boundary(line, boundaries)
+        if ended:
+            break
+        if encoding == "base64":
+            pending += _BASE64_IGNORED.sub(b"", line)
+            usable = len(pending) - len(pending) % 4
+            chunks.append(_decode_base64(pending[:usable]))
+            pending = pending[usable:]
+        elif encoding == "quoted-printable":
+            chunks.append(binascii.a2b_qp(line))
+        else:
+            chunks.append(line)
+    if len(pending) % 4 == 1:
+        # A single character left over encodes no whole byte.
+        pending = pending[:-1]
+    if pending:
+        padding = b"=" * (-len(pending) % 4)
+        chunks.append(_decode_base64(pending + padding))
+
+    charset = headers.get_content_charset() or "utf-8"
+    return _to_str(b"".join(chunks), charset), ended
+
+
+def _skip_to_boundary(lines, boundaries):
+    """
+    Consume lines up to and including the next line that is one of the
+    boundaries, and return it, or None if there is none.
+    """
+    if not boundaries:
+        # Nothing else is read after the top level part.
+        return None
+    for line in lines:
+        ended = _match_boundary(line, boundaries)
+        if ended:
+            return ended
+    return None
+
+
+def _tokenize_fetch_response(response):
+    """
+    Yield the (kind, value) tokens of a FETCH response.
+
+    imaplib returns each literal as a (prefix, data) tuple and the rest of
+    the response as plain strings, so the literal data is yielded in place
+    of its {size} marker.
+    """
+    for part in response:
+        if isinstance(part, tuple):
+            text, literal = part
+        else:
+            text, literal = part, None
+        text = _to_str(text)
+
+        position = 0
+        while True:
+            match = _FETCH_TOKEN.match(text, position)
+            if not match:
+                break
+            position = match.end()
+            kind = match.lastgroup
+            if kind == "literal":
+                yield kind, literal
+            elif kind == "string":
+                yield kind, _QUOTED_ESCAPE.sub(r"\1", match.group(kind))
+            else:
+                yield kind, match.group(kind)
+
+
+class _DeflateStream(object):
+    """
+    Replaces the read, readline and send methods of an imaplib.IMAP4 with
+    ones that inflate and deflate the connection as in RFC 4978.
+    """
+
+    _READ_SIZE = 16384
+    # Raw deflate without zlib headers.
+    _WINDOW_BITS = -15
+
+    def __init__(self, imap, level=zlib.Z_DEFAULT_COMPRESSION):
+        """
+        Parameters
+        ----------
+        imap : imaplib.IMAP4
+            Connection that has just completed COMPRESS DEFLATE.
+        level : int
+            zlib compression level of sent data.
+        """
+        self._imap = imap
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED,
+                                            self._WINDOW_BITS)
+        self._decompressor = zlib.decompressobj(self._WINDOW_BITS)
+        self._buffer = bytearray()
+        self.bytes_received = 0
+        self.bytes_sent = 0
+
+    def _fill(self):
+        """
+        Receive and inflate data from the socket into the buffer.
+        """
+        data = self._imap.sock.recv(self._READ_SIZE)
+        if not data:
+            raise imaplib.IMAP4.abort(_ERRMSG_NOT_CONNECTED)
+        self.bytes_received += len(data)
+        self._buffer += self._decompressor.decompress(data)
+
+    def install(self):
+        """
+        Replace the methods of the connection.
+        """
+        self._imap.read = self.read
+        self._imap.readline = self.readline
+        self._imap.send = self.send
+
+    def pending(self):
+        """
+        Return if inflated data is waiting to be read.
+        """
+        return bool(self._buffer)
+
+    def read(self, size):
+        while len(self._buffer) < size:
+            self._fill()
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def readline(self):
+        while True:
+            end = self._buffer.find(b"\n")
+            if end >= 0:
+                return self.read(end + 1)
+            self._fill()
+
+    def send(self, data):
+        compressed = (self._compressor.compress(data) +
+                      self._compressor.flush(zlib.Z_SYNC_FLUSH))
+        self.bytes_sent += len(compressed)
+        self._imap.sock.sendall(compressed)
+
+
 class MailMessage(object):
     """
     Abstracts email.message.Message.
 
+    The body, date and Message-ID are extracted once when the object is
+    created, so release can drop the message itself while it waits to be
+    processed.
+
     Properties
     ----------
     body : str
+        Decoded text of the first text/plain part that is not an
+        attachment.
     date : time.struct_time
+    id : int
     message : email.message.Message
+        None after release.
+    message_id : str
+        Message-ID header, or None if there is none.
+    """
+
+    __slots__ = ("_body", "_date", "_id", "_message", "_message_id", "_raw")
+
+    def __init__(self, message, message_id=None, raw=None):
+        """
+        Parameters
+        ----------
+        message : email.message.Message
+            Parsed message, or None if raw is given.
+        message_id : int
+            UID of the message on the mail server.
+        raw : bytes
+            Raw RFC822 message, only parsed up to its first text/plain part.
+        """
+        self._message = message
+        self._id = message_id
+        self._raw = raw
+
+        if message is None:
+            headers, body = _extract_text_plain(io.BytesIO(raw))
+        else:
+            headers, body = message, self._find_body(message)
+        self._body = (body or "").strip()
+        self._date = email.utils.parsedate(headers["Date"])
+        self._message_id = headers["Message-ID"]
+
+    @classmethod
+    def from_bytes(cls, raw, message_id=None):
+        """
+        Return a MailMessage of a raw RFC822 message. Its body is extracted
+        without parsing the parts after the first text/plain part.
+        """
+        return cls(None, message_id, raw)
+
+    @staticmethod
+    def _find_body(message):
+        """
+        Return the decoded text of the first text/plain part of a parsed
+        message that is not an attachment, or None.
+        """
+        for part in message.walk():
+            if (part.get_content_type() == "text/plain" and
+                    part.get_content_disposition() != "attachment"):
+                payload = part.get_payload(decode=True) or b""
+                return _to_str(payload, part.get_content_charset() or "utf-8")
+        return None
+
+    @property
+    def body(self):
+        return self._body
+
+    @property
+    def date(self):
+        return self._date
+
+    @property
+    def id(self):
+        return self._id
+
+    @property
+    def message(self):
+        if self._message is None and self._raw is not None:
+            self._message = email.message_from_bytes(self._raw)
+        return self._message
+
+    @property
+    def message_id(self):
+        return self._message_id
+
+    def release(self):
+        """
+        Drop the raw and parsed message, keeping only the extracted fields.
+        """
+        self._message = None
+        self._raw = None
+
+
+class ImapCheckpoint(object):
+    """
+    Persists the UIDVALIDITY, the highest processed UID and the
+    HIGHESTMODSEQ of a mailbox.
+    """
+
+    def __init__(self, file_object):
+        """
+        Parameters
+        ----------
+        file_object : powl.filesystem.File
+            File storing the checkpoint.
+        """
+        self._file = file_object
+
+    def load(self):
+        """
+        Read the checkpoint.
+
+        Returns
+        -------
+        uidvalidity : int or None
+            UIDVALIDITY of the mailbox, or None if there is no checkpoint.
+        uid : int
+            Highest processed UID, or 0 if there is no checkpoint.
+        modseq : int or None
+            HIGHESTMODSEQ of the mailbox, or None if it was not recorded.
+
+        Raises
+        ------
+        ValueError
+            If the checkpoint is not two or three integers.
+        """
+        data = "".join(self._file.read()).strip()
+        if not data:
+            return None, 0, None
+
+        try:
+            values = [int(v) for v in data.split()]
+            if len(values) == 2:
+                values.append(None)
+            uidvalidity, uid, modseq = values
+        except ValueError as err:
+            errmsg = _ERRMSG_INVALID_CHECKPOINT.format(data)
+            exception.add_message(err, errmsg)
+            raise
+        return uidvalidity, uid, modseq
+
+    def save(self, uidvalidity, uid, modseq=None):
+        """
+        Overwrite the checkpoint.
+
+        Parameters
+        ----------
+        uidvalidity : int
+            UIDVALIDITY of the mailbox.
+        uid : int
+            Highest processed UID.
+        modseq : int
+            Optional HIGHESTMODSEQ of the mailbox.
+        """
+        values = [uidvalidity, uid]
+        if modseq is not None:
+            values.append(modseq)
+        self._file.write(" ".join(str(v) for v in values) + "\n")
+
+
+class ImapSearchFilter(object):
+    """
+    Compiles a structured filter into an IMAP SEARCH criteria, so the server
+    drops mail that is not an action item before anything is downloaded.
+
+    Attributes
+    ----------
+    senders : list of str
+        Addresses or domains allowed to send action items. Empty allows
+        every sender.
+    subject_prefix : str
+        Text the subject must contain. IMAP can only match substrings, so
+        the server cannot enforce that it is a prefix.
+    since : datetime.date or time.struct_time
+        Only mail sent on or after this date.
+    before : datetime.date or time.struct_time
+        Only mail sent before this date.
+    max_size : int
+        Only mail smaller than this number of bytes.
+    unseen : bool
+        Only unseen mail.
+    """
+
+    def __init__(self, senders=None, subject_prefix=None, since=None,
+                 before=None, max_size=None, unseen=True):
+        """
+        Raises
+        ------
+        ValueError
+            If max_size is less than 1.
+        """
+        if max_size is not None and max_size < 1:
+            errmsg = _ERRMSG_INVALID_MAX_SIZE.format(max_size)
+            err = exception.create(ValueError, errmsg)
+            raise err
+
+        self.senders = list(senders or [])
+        self.subject_prefix = subject_prefix
+        self.since = since
+        self.before = before
+        self.max_size = max_size
+        self.unseen = unseen
+
+    def _quote(self, value):
+        """
+        Return value as an IMAP quoted string.
+
+        Raises
+        ------
+        ValueError
+            If value is not ASCII.
+        """
+        if any(ord(c) > 127 for c in value):
+            errmsg = _ERRMSG_NON_ASCII_SEARCH.format(value)
+            err = exception.create(ValueError, errmsg)
+            raise err
+        return quote(value)
+
+    def compile(self):
+        """
+        Return the filter as the criteria of ImapMail.
+
+        Returns
+        -------
+        str
+            Parenthesized IMAP SEARCH keys, all of which must match.
+
+        Raises
+        ------
+        ValueError
+            If a sender or the subject prefix is not ASCII. imaplib sends
+            arguments as ASCII and cannot send them as literals within the
+            criteria, so they could not be searched for.
+        """
+        keys = []
+        if self.unseen:
+            # First so ImapMail can tell nothing unseen means no match.
+            keys.append("UNSEEN")
+        if self.senders:
+            senders = ["FROM " + self._quote(s) for s in self.senders]
+            # OR takes two keys so more senders are nested.
+            keys.append(" ".join(["OR"] * (len(senders) - 1) + senders))
+        if self.subject_prefix:
+            keys.append("SUBJECT " + self._quote(self.subject_prefix))
+        if self.since:
+            keys.append("SINCE " + _format_search_date(self.since))
+        if self.before:
+            keys.append("BEFORE " + _format_search_date(self.before))
+        if self.max_size:
+            keys.append("SMALLER {0}".format(self.max_size))
+        return "({0})".format(" ".join(keys) or "ALL")
+
+
+class AdaptiveBatchSize(object):
+    """
+    Adjusts the number of messages requested by a FETCH from its measured
+    round-trip time, with additive increase and multiplicative decrease.
+
+    Properties
+    ----------
+    latency : float
+        Seconds taken by the last measured FETCH.
+    size : int
+        Number of messages to request by the next FETCH.
+    throughput : float
+        Messages per second of the last measured FETCH.
+    """
+
+    def __init__(self, min_size=10, max_size=1000, initial_size=None,
+                 target_seconds=2.0, increase=10, decrease=0.5):
+        """
+        Parameters
+        ----------
+        min_size : int
+            Smallest batch size.
+        max_size : int
+            Largest batch size.
+        initial_size : int
+            Batch size of the first FETCH, default min_size.
+        target_seconds : float
+            Round-trip time of a FETCH above which the batch size shrinks.
+        increase : int
+            Number of messages added after a FETCH within target_seconds.
+        decrease : float
+            Factor the batch size is multiplied by after a slow FETCH.
+
+        Raises
+        ------
+        ValueError
+            If min_size is less than 1 or greater than max_size.
+        """
+        if min_size < 1 or min_size > max_size:
+            errmsg = _ERRMSG_INVALID_BATCH_BOUNDS.format(min_size, max_size)
+            err = exception.create(ValueError, errmsg)
+            raise err
+
+        self._min_size = min_size
+        self._max_size = max_size
+        self._target_seconds = target_seconds
+        self._increase = increase
+        self._decrease = decrease
+        self._size = self._clamp(initial_size or min_size)
+        self._latency = None
+        self._throughput = None
+
+    def _clamp(self, size):
+        return max(self._min_size, min(self._max_size, int(size)))
+
+    @property
+    def latency(self):
+        return self._latency
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def throughput(self):
+        return self._throughput
+
+    def update(self, count, seconds):
+        """
+        Record a FETCH and adjust the batch size.
+
+        Parameters
+        ----------
+        count : int
+            Number of messages requested.
+        seconds : float
+            Seconds the FETCH took.
+        """
+        self._latency = seconds
+        self._throughput = count / seconds if seconds > 0 else None
+        if seconds > self._target_seconds:
+            self._size = self._clamp(self._size * self._decrease)
+        elif count >= self._size:
+            # Only grow when the batch was full, as a short last batch says
+            # nothing about a larger one.
+            self._size = self._clamp(self._size + self._increase)
+
+
+class Mail(object):
     """
+    Provides methods for retrieving messages from mail servers.
+    """
+
+    def acknowledge(self, messages):
+        """
+        Mark the given messages as processed on the mail server, so they
+        are not retrieved again.
+
+        Parameters
+        ----------
+        messages : list of powl.mail.MailMessage
+            Messages returned by get_messages.
+        """
+        self.mark_seen(messages)
+
+    def close(self):
+        """
+        Drop the connection to the mail server, such as after an error left
+        it unusable. Does nothing by default.
+        """
+        pass
+
+    def connect(self, server):
+        """
+        Establishes a connection to the mail server.
+
+        Parameters
+        ----------
+        server : str
+            URL or ip address of the mail server.
+        """
+        raise NotImplementedError()
+
+    def get_messages(self):
+        """
+        Retrieves all unread mail messages.
+
+        Returns
+        -------
+        list of powl.mail.MailMessage
+        """
+        raise NotImplementedError()
+
+    def idle(self, timeout, poll_interval=None):
+        """
+        Block until the mail server reports new mail or until timeout seconds
+        have passed.
+
+        Parameters
+        ----------
+        timeout : float
+            Maximum number of seconds to wait.
+        poll_interval : float
+            Seconds to wait instead if the server cannot report new mail,
+            default timeout.
+
+        Returns
+        -------
+        bool
+            Whether the mailbox may have new messages.
+        """
+        raise NotImplementedError()
+
+    def iter_messages(self):
+        """
+        Retrieves unread mail messages one at a time, so each can be
+        processed before the rest are downloaded.
+
+        Returns
+        -------
+        iterator of powl.mail.MailMessage
+        """
+        return iter(self.get_messages())
+
+    def login(self, user, password):
+        """
+        Log in to the mail server with the given username and password.
+
+        Paramaters
+        ----------
+        user : str
+            User email address.
+        password : str
+            Password for email address.
+        """
+        raise NotImplementedError()
+
+    def mark_seen(self, messages):
+        """
+        Flag the given messages as seen on the mail server.
+
+        Parameters
+        ----------
+        messages : list of powl.mail.MailMessage
+            Messages returned by get_messages.
+        """
+        raise NotImplementedError()
+
+
+class ImapMail(Mail):
+    """
+    Implements Mail using imaplib.IMAP4_SSL.
+    """
+
+    _CACHE_MAILBOX = "{0}@{1}/{2}"
+    _CAPABILITY_COMPRESS = "COMPRESS=DEFLATE"
+    _CAPABILITY_CONDSTORE = "CONDSTORE"
+    _CAPABILITY_QRESYNC = "QRESYNC"
+    _CAPABILITY_IDLE = "IDLE"
+    _CAPABILITY_MOVE = "MOVE"
+    _CAPABILITY_UIDPLUS = "UIDPLUS"
+    _CHANGED_MODIFIER = "(CHANGEDSINCE {0})"
+    _CHANGED_PART = "(UID)"
+    _CHANGED_RESPONSE = "MODSEQ"
+    _CHANGED_SET = "1:*"
+    _COMMAND = "{0} {1}\r\n"
+    _COPY_COMMAND = "UID COPY {0} {1}"
+    _CONDSTORE_MAILBOX = "{0} (CONDSTORE)"
+    _EXPUNGE_COMMAND = "EXPUNGE"
+    _FLAG_DELETED = "(\\Deleted)"
+    _FLAG_SEEN = "(\\Seen)"
+    _FULL_RESPONSE = "BODY[]"
+    _HEADER_RESPONSE = "BODY[HEADER.FIELDS (DATE MESSAGE-ID)]"
+    _IDLE_COMMAND = "{0} IDLE\r\n"
+    _IDLE_DONE = "DONE\r\n"
+    _IDLE_NEW_MAIL = re.compile(r"^\*\s+\d+\s+(EXISTS|RECENT)\b",
+                                re.IGNORECASE)
+    _INCREMENTAL_CRITERIA = "UID {0}:* {1}"
+    # PEEK leaves the message unseen until it is acknowledged.
+    _MESSAGE_PART = "(BODY.PEEK[])"
+    _MOVE_COMMAND = "UID MOVE {0} {1}"
+    _SIZE_PART = "(RFC822.SIZE)"
+    _SIZE_RESPONSE = "RFC822.SIZE"
+    _STATUS_HIGHESTMODSEQ = "HIGHESTMODSEQ"
+    _STATUS_ITEMS = ("UIDNEXT", "UIDVALIDITY", "UNSEEN")
+    _STATUS_UIDNEXT = "UIDNEXT"
+    _STATUS_UIDVALIDITY = "UIDVALIDITY"
+    _STATUS_COMMAND = "STATUS {0} {1}"
+    _STATUS_RESPONSE = re.compile(r"^\*\s+STATUS\s+(.*)$", re.IGNORECASE)
+    _STATUS_UNSEEN = "UNSEEN"
+    _STORE_COMMAND = "UID STORE {0} +FLAGS.SILENT {1}"
+    _STRUCTURE_PART = ("(BODYSTRUCTURE "
+                       "BODY.PEEK[HEADER.FIELDS (DATE MESSAGE-ID)])")
+    _STRUCTURE_RESPONSE = "BODYSTRUCTURE"
+    _TAG = "POWL{0}"
+    _TEXT_PART = "(BODY.PEEK[{0}])"
+    _TEXT_RESPONSE = "BODY[{0}]"
+    _TRUNCATED_HEADER_RESPONSE = "BODY[HEADER]"
+    _TRUNCATED_PART = "(BODY.PEEK[HEADER] BODY.PEEK[TEXT]<0.{0}>)"
+    _TRUNCATED_TEXT_RESPONSE = "BODY[TEXT]<0>"
+    _UID_EXPUNGE_COMMAND = "UID EXPUNGE {0}"
+    # A leading key is always ANDed with the rest of the criteria.
+    _UNSEEN_CRITERIA = re.compile(r"^\(?\s*UNSEEN\b", re.IGNORECASE)
+
+    def __init__(self, mailbox="inbox", timeout=5, charset=None,
+                 criteria="(Unseen)", batch_size=500, fetch_mode=FETCH_FULL,
+                 checkpoint=None, window_bytes=None, max_message_bytes=None,
+                 oversize_mode=OVERSIZE_TRUNCATE, batch_sizer=None,
+                 acknowledge_mode=ACKNOWLEDGE_SEEN, acknowledge_mailbox=None,
+                 compress=True, cache=None, imap_class=imaplib.IMAP4_SSL,
+                 log=None):
+        """
+        Parameters
+        ----------
+        mailbox : str
+            Default is "inbox".
+        timeout : int
+            Timeout for connection to IMAP server.
+        charset : str
+            Charset used for IMAP4.search used to retrive mail ids.
+        criteria : str
+            Criteria used for IMAP4.search used to retrieve mail ids, such
+            as one compiled by powl.mail.ImapSearchFilter.
+        batch_size : int
+            Maximum number of messages requested by a single FETCH.
+        fetch_mode : str
+            FETCH_FULL downloads the whole RFC822 message. FETCH_PARTIAL
+            downloads only the BODYSTRUCTURE, the Date and Message-ID
+            headers and the first text/plain part. Both leave the message
+            unseen until it is acknowledged or mark_seen is called.
+        checkpoint : powl.mail.ImapCheckpoint
+            Optional checkpoint for incremental sync. Only UIDs above the
+            checkpointed UID are searched for, unless the UIDVALIDITY of the
+            mailbox has changed in which case the whole mailbox is searched.
+            The checkpoint is advanced by acknowledge, so messages that were
+            retrieved but not acknowledged are searched for again.
+        window_bytes : int
+            Optional byte budget of a single FETCH. If set, the RFC822.SIZE
+            of each batch is fetched first and the batch is downloaded in
+            windows of at most this many bytes, or of one message if it is
+            bigger.
+        max_message_bytes : int
+            Optional size above which a message is oversized. Only used
+            with window_bytes.
+        oversize_mode : str
+            OVERSIZE_TRUNCATE downloads the header and only the first
+            max_message_bytes of the text of an oversized message, and leaves
+            it unseen until mark_seen is called. OVERSIZE_SKIP does not
+            download it, logs a warning with its UID and size and counts it
+            in skipped_count.
+        batch_sizer : powl.mail.AdaptiveBatchSize
+            Optional, adjusts the batch size from the measured round-trip
+            time of each FETCH in place of batch_size. Windows cut short by
+            window_bytes do not grow it.
+        acknowledge_mode : str
+            What acknowledge does to the processed messages. ACKNOWLEDGE_SEEN
+            flags them as seen, ACKNOWLEDGE_DELETE flags them as deleted and
+            expunges them and ACKNOWLEDGE_MOVE moves them to
+            acknowledge_mailbox.
+        acknowledge_mailbox : str
+            Mailbox processed messages are moved to by ACKNOWLEDGE_MOVE.
+        compress : bool
+            Whether to compress the connection with COMPRESS=DEFLATE after
+            login if the server advertises it.
+        cache : powl.messagecache.RawMessageCache
+            Optional local cache of raw messages, which may be shared with
+            other mailboxes. Messages found in it by the user, server and
+            name of the mailbox, its UIDVALIDITY and their UID are not
+            fetched, and fetched whole messages are added to it.
+        imap_class : type
+            Class used to connect to the server, default imaplib.IMAP4_SSL.
+        log : powl.log.Log
+            Optional, used to log skipped oversized messages.
+
+        Notes
+        -----
+        get_messages first asks for the STATUS of the mailbox and returns
+        without selecting or searching it when the UIDNEXT is not above the
+        checkpointed UID, or when criteria starts with UNSEEN and nothing is
+        unseen. So a poll that finds nothing costs a single command. The
+        first poll after login reuses the STATUS login asks for to check
+        that the mailbox exists, so it costs none.
+
+        If the server advertises CONDSTORE or QRESYNC, the mailbox is selected
+        with CONDSTORE and its HIGHESTMODSEQ is also asked for by STATUS and
+        remembered, in the checkpoint if there is one. get_messages also
+        returns immediately when HIGHESTMODSEQ has not changed since the last
+        call.
+
+        Servers may answer STATUS with stale counts for the selected mailbox,
+        so once it is selected STATUS is no longer used. With CONDSTORE a
+        UID FETCH with CHANGEDSINCE tells whether anything changed since the
+        remembered HIGHESTMODSEQ, otherwise the mailbox is searched.
+
+        Raises
+        ------
+        ValueError
+            If batch_size is less than 1.
+            If fetch_mode is unknown.
+            If window_bytes or max_message_bytes is less than 1.
+            If oversize_mode is unknown.
+            If acknowledge_mode is unknown.
+            If acknowledge_mode is ACKNOWLEDGE_MOVE without
+            acknowledge_mailbox.
+        """
+        if batch_size < 1:
+            errmsg = _ERRMSG_INVALID_BATCH_SIZE.format(batch_size)
+            err = exception.create(ValueError, errmsg)
+            raise err
+
+        if fetch_mode not in (FETCH_FULL, FETCH_PARTIAL):
+            errmsg = _ERRMSG_INVALID_FETCH_MODE.format(fetch_mode)
+            err = exception.create(ValueError, errmsg)
+            raise err
+
+        for value in (window_bytes, max_message_bytes):
+            if value is not None and value < 1:
+                errmsg = _ERRMSG_INVALID_BYTE_LIMIT.format(value)
+                err = exception.create(ValueError, errmsg)
+                raise err
+
+        if oversize_mode not in (OVERSIZE_SKIP, OVERSIZE_TRUNCATE):
+            errmsg = _ERRMSG_INVALID_OVERSIZE_MODE.format(oversize_mode)
+            err = exception.create(ValueError, errmsg)
+            raise err
+
+        if acknowledge_mode not in (ACKNOWLEDGE_DELETE, ACKNOWLEDGE_MOVE,
+                                    ACKNOWLEDGE_SEEN):
+            errmsg = _ERRMSG_INVALID_ACKNOWLEDGE_MODE.format(acknowledge_mode)
+            err = exception.create(ValueError, errmsg)
+            raise err
+
+        if acknowledge_mode == ACKNOWLEDGE_MOVE and not acknowledge_mailbox:
+            errmsg = _ERRMSG_INVALID_MOVE_MAILBOX
+            err = exception.create(ValueError, errmsg)
+            raise err
+
+        self._mailbox = mailbox
+        self._timeout = timeout
+        self._charset = charset
+        self._criteria = criteria
+        self._batch_size = batch_size
+        self._fetch_mode = fetch_mode
+        self._checkpoint = checkpoint
+        self._window_bytes = window_bytes
+        self._max_message_bytes = max_message_bytes
+        self._oversize_mode = oversize_mode
+        self._batch_sizer = batch_sizer
+        self._acknowledge_mode = acknowledge_mode
+        self._acknowledge_mailbox = acknowledge_mailbox
+        self._compress = compress
+        self._cache = cache
+        self._imap_class = imap_class
+        self._log = log
+
+        self._server = None
+        self._user = None
+        self._password = None
+        self._imap = None
+        self._logged_in = False
+        self._capabilities = set()
+        self._login_status = None
+        self._uidvalidity = None
+        self._modseq = None
+        # Progress of the last iter_messages, saved to the checkpoint as its
+        # messages are acknowledged.
+        self._saved = (0, None)
+        self._retrieved_uid = 0
+        self._retrieved_modseq = None
+        self._unacknowledged = set()
+        self._selected = False
+        # Whether new mail was reported in the response to a command.
+        self._new_mail = False
+        self._tag_count = 0
+        self._deflate = None
+        self._skipped_count = 0
+        socket.setdefaulttimeout(self._timeout)
+
+    def _advance_checkpoint(self):
+        """
+        Save the highest UID up to which every retrieved message has been
+        acknowledged, and the HIGHESTMODSEQ once all of them have been.
+        """
+        if self._unacknowledged:
+            uid = min(self._unacknowledged) - 1
+            modseq = self._saved[1]
+        else:
+            uid = self._retrieved_uid
+            modseq = self._retrieved_modseq
+            self._modseq = modseq
+        uid = max(uid, self._saved[0])
+        if (uid, modseq) != self._saved:
+            self._saved = (uid, modseq)
+            self._save_checkpoint(uid, modseq)
+
+    def _assert_connected(self):
+        """
+        Raise exception if not connected to IMAP server.
+        """
+        if not self._imap:
+            errmsg = _ERRMSG_NOT_CONNECTED
+            err = exception.create(ValueError, errmsg)
+            raise err
+
+    def _assert_logged_in(self):
+        """
+        Raise exception if not logged in to IMAP server.
+        """
+        if not self._logged_in:
+            errmsg = _ERRMSG_NOT_LOGGED_IN
+            err = exception.create(ValueError, errmsg)
+            raise err
+
+    def _assert_not_empty(self, value, errmsg):
+        """
+        """
+        if not value:
+            err = exception.create(ValueError, errmsg)
+            raise err
+
+    def _compress_connection(self):
+        """
+        Start COMPRESS=DEFLATE if enabled and advertised by the server.
+        """
+        if (not self._compress or
+                self._CAPABILITY_COMPRESS not in self._capabilities):
+            return
+        result, response = self._imap.xatom("COMPRESS", "DEFLATE")
+        if result == "OK":
+            self._deflate = _DeflateStream(self._imap)
+            self._deflate.install()
+
+    def _create_partial_message(self, header, text_part, text):
+        """
+        Return a raw message made of the fetched header fields and the
+        fetched text/plain part.
+
+        The text is kept as the fetched bytes, since decoding it before it
+        is parsed would lose the non-ASCII bytes of an 8bit part.
+        """
+        header_lines = to_bytes(header or b"").rstrip(b"\r\n")
+        if header_lines:
+            header_lines += b"\r\n"
+        if not text_part:
+            return header_lines + b"\r\n"
+
+        section, encoding, charset = text_part
+        if charset:
+            content_type = 'text/plain; charset="{0}"'.format(charset)
+        else:
+            content_type = "text/plain"
+        part_header = "Content-Type: {0}\r\nContent-Transfer-Encoding: {1}\r\n"
+        header_lines += part_header.format(content_type,
+                                           encoding).encode("ascii")
+        return header_lines + b"\r\n" + to_bytes(text or b"")
+
+    def _delete(self, message_sets):
+        """
+        Flag the messages of the given sets as deleted and expunge them, so
+        they are neither left in the mailbox nor retrieved again.
+
+        With UIDPLUS only the given UIDs are expunged, otherwise a plain
+        EXPUNGE also removes any other message flagged as deleted.
+        """
+        self._pipeline([self._STORE_COMMAND.format(m, self._FLAG_DELETED)
+                        for m in message_sets])
+        if self._CAPABILITY_UIDPLUS in self._capabilities:
+            self._pipeline([self._UID_EXPUNGE_COMMAND.format(m)
+                            for m in message_sets])
+        else:
+            self._pipeline([self._EXPUNGE_COMMAND])
+
+    def _ensure_selected(self):
+        """
+        Select the mailbox unless it is already selected.
+        """
+        if not self._selected:
+            self._select_mailbox()
+
+    def _get_full_messages_batch(self, message_ids):
+        """
+        Return the powl.mail.MailMessage of one batch of the given ids
+        downloaded whole, adding them to the cache.
+        """
+        message_set = format_message_set(message_ids)
+        result, response = self._imap.uid("FETCH", message_set,
+                                          self._MESSAGE_PART)
+        fetched = parse_fetch_response(response)
+
+        messages = []
+        for message_id in message_ids:
+            raw = fetched.get(int(message_id), {}).get(self._FULL_RESPONSE)
+            if raw is None:
+                continue
+            raw = to_bytes(raw)
+            if self._is_cache_usable():
+                self._cache.put(self._get_cache_key(message_id), raw)
+            messages.append(MailMessage.from_bytes(raw, int(message_id)))
+        return messages
+
+    def _get_cache_key(self, message_id):
+        """
+        Return the key of a message in the cache.
+        """
+        mailbox = self._CACHE_MAILBOX.format(self._user, self._server,
+                                             self._mailbox)
+        return mailbox, self._uidvalidity, int(message_id)
+
+    def _get_message_ids(self, last_uid=0):
+        """
+        Return a list of email message UIDs above last_uid.
+        """
+        if last_uid:
+            criteria = self._INCREMENTAL_CRITERIA.format(last_uid + 1,
+                                                         self._criteria)
+        else:
+            criteria = self._criteria
+
+        if self._charset:
+            args = ("CHARSET", self._charset, criteria)
+        else:
+            args = (criteria,)
+        result, response = self._imap.uid("SEARCH", *args)
+
+        id_list_string = response[0]
+        id_list = id_list_string.split()
+        # "n:*" always matches the highest UID even if it is below n.
+        return [i for i in id_list if int(i) > last_uid]
+
+    def _get_messages_batch(self, message_ids):
+        """
+        Return the powl.mail.MailMessage of one batch of the given ids, in
+        the order of the given ids. Cached messages are not fetched.
+        """
+        messages = {}
+        missing = []
+        for message_id in message_ids:
+            raw = None
+            if self._is_cache_usable():
+                raw = self._cache.get(self._get_cache_key(message_id))
+            if raw is None:
+                missing.append(message_id)
+            else:
+                messages[int(message_id)] = MailMessage.from_bytes(
+                    raw, int(message_id))
+
+        if missing and self._fetch_mode == FETCH_PARTIAL:
+            fetched = self._get_partial_messages_batch(missing)
+        elif missing:
+            fetched = self._get_full_messages_batch(missing)
+        else:
+            fetched = []
+        for message in fetched:
+            messages[message.id] = message
+
+        return [messages[int(i)] for i in message_ids
+                if int(i) in messages]
+
+    def _get_partial_messages_batch(self, message_ids):
+        """
+        Return the powl.mail.MailMessage of one batch of the given ids built
+        from only their Date and Message-ID headers and first text/plain
+        part.
+
+        The structure of every message in the batch is fetched first, then
+        one FETCH is issued per distinct text/plain section number. BODY.PEEK
+        is used throughout so the messages are not flagged as seen.
+        """
+        message_set = format_message_set(message_ids)
+        result, response = self._imap.uid("FETCH", message_set,
+                                          self._STRUCTURE_PART)
+        structures = parse_fetch_response(response)
+
+        text_parts = {}
+        section_ids = {}
+        for message_id, items in structures.items():
+            structure = items.get(self._STRUCTURE_RESPONSE)
+            text_part = _find_text_plain_part(structure)
+            if text_part:
+                text_parts[message_id] = text_part
+                section_ids.setdefault(text_part[0], []).append(message_id)
+
+        texts = {}
+        for section, ids in sorted(section_ids.items()):
+            result, response = self._imap.uid(
+                "FETCH",
+                format_message_set(ids),
+                self._TEXT_PART.format(section))
+            text_response = self._TEXT_RESPONSE.format(section)
+            for message_id, items in parse_fetch_response(response).items():
+                texts[message_id] = items.get(text_response)
+
+        messages = []
+        for message_id in message_ids:
+            items = structures.get(int(message_id))
+            if items is None:
+                continue
+            raw = self._create_partial_message(
+                items.get(self._HEADER_RESPONSE),
+                text_parts.get(int(message_id)),
+                texts.get(int(message_id)))
+            messages.append(MailMessage.from_bytes(raw, int(message_id)))
+        return messages
+
+    def _get_selected_status(self, last_modseq):
+        """
+        Return the status items of the selected mailbox that can be known
+        without STATUS, which is HIGHESTMODSEQ if the server supports
+        CONDSTORE and last_modseq is known, or none.
+        """
+        if not self._has_condstore() or last_modseq is None:
+            return {}
+
+        result, response = self._imap.uid(
+            "FETCH", self._CHANGED_SET, self._CHANGED_PART,
+            self._CHANGED_MODIFIER.format(last_modseq))
+        if result != "OK":
+            return {}
+        modseq = last_modseq
+        for items in parse_fetch_response(response).values():
+            changed = items.get(self._CHANGED_RESPONSE) or []
+            if changed:
+                modseq = max(modseq, int(changed[0]))
+        return {self._STATUS_HIGHESTMODSEQ: modseq}
+
+    def _get_sizes(self, message_ids):
+        """
+        Return a map of UID to RFC822.SIZE for the given ids.
+        """
+        result, response = self._imap.uid("FETCH",
+                                          format_message_set(message_ids),
+                                          self._SIZE_PART)
+        sizes = {}
+        for message_id, items in parse_fetch_response(response).items():
+            sizes[message_id] = int(items.get(self._SIZE_RESPONSE) or 0)
+        return sizes
+
+    def _get_status(self, mailbox):
+        """
+        Return the STATUS items of a mailbox, including HIGHESTMODSEQ if the
+        server supports CONDSTORE.
+
+        Raises
+        ------
+        ValueError
+            If the mailbox does not exist.
+        """
+        result, response = self._imap.status(mailbox, self._status_names())
+        if result != "OK":
+            errmsg = _ERRMSG_INVALID_MAILBOX.format(mailbox)
+            err = exception.create(ValueError, errmsg)
+            raise err
+        return _parse_status_response(response)
 
-    def __init__(self, message):
+    def _get_statuses(self, mailboxes):
         """
-        Parameters
-        ----------
-        message : email.message.Message
+        Return the STATUS items of several mailboxes, asked for by
+        pipelined STATUS commands in a single round trip.
+
+        Raises
+        ------
+        ValueError
+            If a mailbox does not exist, after every response is read.
         """
-        self._message = message
+        names = self._status_names()
+        tags = [self._next_tag() for mailbox in mailboxes]
+        data = "".join(
+            self._COMMAND.format(tag, self._STATUS_COMMAND.format(
+                quote(mailbox), names))
+            for tag, mailbox in zip(tags, mailboxes))
+        self._imap.send(data.encode("utf-8"))
 
-    @property
-    def body(self):
-        body = ""
-        for part in self._message.walk():
-            if part.get_content_type() == 'text/plain':
-                body = part.get_payload()
-        return body.strip()
+        statuses = {}
+        missing = []
+        for tag, mailbox in zip(tags, mailboxes):
+            untagged = []
+            line = self._read_tagged_response(tag, untagged)
+            status = line[len(tag):].split(None, 1)
+            if not status or status[0].upper() != "OK":
+                missing.append(mailbox)
+                continue
+            # Each STATUS response arrives before its tagged completion.
+            response = []
+            for untagged_line in untagged:
+                match = self._STATUS_RESPONSE.match(untagged_line.strip())
+                if match:
+                    response = [match.group(1)]
+            statuses[mailbox] = _parse_status_response(response)
+        if missing:
+            errmsg = _ERRMSG_INVALID_MAILBOX.format(missing[0])
+            err = exception.create(ValueError, errmsg)
+            raise err
+        return statuses
 
-    @property
-    def date(self):
-        date_string = self._message["Date"]
-        date = email.utils.parsedate(date_string)
-        return date
+    def _get_truncated_messages_batch(self, message_ids):
+        """
+        Return the powl.mail.MailMessage of the given ids built from their
+        header and the first max_message_bytes of their text.
+        """
+        result, response = self._imap.uid(
+            "FETCH",
+            format_message_set(message_ids),
+            self._TRUNCATED_PART.format(self._max_message_bytes))
+        fetched = parse_fetch_response(response)
 
-    @property
-    def message(self):
-        return self._message
+        messages = []
+        for message_id in message_ids:
+            items = fetched.get(int(message_id))
+            if items is None:
+                continue
+            header = items.get(self._TRUNCATED_HEADER_RESPONSE) or b""
+            text = items.get(self._TRUNCATED_TEXT_RESPONSE) or b""
+            messages.append(MailMessage.from_bytes(
+                to_bytes(header) + to_bytes(text), int(message_id)))
+        return messages
 
+    def _get_window_messages(self, window, sizes):
+        """
+        Return the powl.mail.MailMessage of one window of ids, in the order
+        of the given ids, handling oversized messages by oversize_mode.
+        """
+        limit = self._max_message_bytes
+        if limit is None:
+            return self._get_messages_batch(window)
 
-class Mail(object):
-    """
-    Provides methods for retrieving messages from mail servers.
-    """
+        whole = [i for i in window if sizes.get(int(i), 0) <= limit]
+        oversized = [i for i in window if sizes.get(int(i), 0) > limit]
+        messages = self._get_messages_batch(whole) if whole else []
+        if oversized and self._oversize_mode == OVERSIZE_TRUNCATE:
+            messages += self._get_truncated_messages_batch(oversized)
+            order = dict((int(i), n) for n, i in enumerate(window))
+            messages.sort(key=lambda m: order[m.id])
+        elif oversized:
+            self._skip_messages(oversized, sizes)
+        return messages
 
-    def connect(self, server):
+    def _has_condstore(self):
         """
-        Establishes a connection to the mail server.
-
-        Parameters
-        ----------
-        server : str
-            URL or ip address of the mail server.
+        Return if the server supports CONDSTORE.
         """
-        raise NotImplementedError()
+        return bool(self._capabilities & set([self._CAPABILITY_CONDSTORE,
+                                              self._CAPABILITY_QRESYNC]))
 
-    def get_messages(self):
+    def _idle_until(self, deadline):
         """
-        Retrieves all unread mail messages.
+        Read untagged responses of an IDLE command until one reports new mail
+        or the deadline passes.
 
         Returns
         -------
-        list of powl.mail.MailMessage
+        bool
+            Whether new mail was reported.
         """
-        raise NotImplementedError()
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0 or not self._wait_readable(remaining):
+                return False
+            line = _to_str(self._imap.readline())
+            if not line:
+                # The server closed the connection.
+                raise imaplib.IMAP4.abort(_ERRMSG_NOT_CONNECTED)
+            if self._IDLE_NEW_MAIL.match(line):
+                return True
 
-    def login(self, user, password):
+    def _is_buffered(self):
         """
-        Log in to the mail server with the given username and password.
+        Return if the imaplib file object holds data it has read from the
+        socket but not returned yet, without blocking.
+        """
+        file_object = getattr(self._imap, "file", None)
+        if file_object is None:
+            return False
+        sock = self._imap.sock
+        timeout = sock.gettimeout()
+        sock.settimeout(0)
+        try:
+            # Only reads from the socket if the buffer is empty.
+            return bool(file_object.peek(1))
+        except (BlockingIOError, ssl.SSLWantReadError):
+            return False
+        finally:
+            sock.settimeout(timeout)
 
-        Paramaters
-        ----------
-        user : str
-            User email address.
-        password : str
-            Password for email address.
+    def _is_cache_usable(self):
         """
-        raise NotImplementedError()
+        Return if there is a cache and the UIDVALIDITY its keys need.
+        """
+        return self._cache is not None and self._uidvalidity is not None
 
+    def _take_new_mail(self):
+        """
+        Return if new mail was reported in the response to an earlier
+        command, by a pipelined command or in the untagged responses kept by
+        imaplib, and forget it.
+        """
+        new_mail = self._new_mail
+        self._new_mail = False
+        untagged_responses = getattr(self._imap, "untagged_responses", None)
+        if untagged_responses:
+            for name in ("EXISTS", "RECENT"):
+                if untagged_responses.pop(name, None):
+                    new_mail = True
+        return new_mail
 
-class ImapMail(Mail):
-    """
-    Implements Mail using imaplib.IMAP4_SSL.
-    """
+    def _is_unchanged(self, status, last_uid, last_modseq):
+        """
+        Return if the STATUS of the mailbox shows that a search would not
+        find any new message.
+        """
+        modseq = status.get(self._STATUS_HIGHESTMODSEQ)
+        if modseq is not None and modseq == last_modseq:
+            return True
 
-    _MESSAGE_PART = "(RFC822)"
+        uidnext = status.get(self._STATUS_UIDNEXT)
+        if last_uid and uidnext is not None and uidnext <= last_uid + 1:
+            # Only UIDs above the checkpoint are searched for.
+            return True
 
-    def __init__(self, mailbox="inbox", timeout=5, charset=None,
-                 criteria="(Unseen)"):
+        unseen = status.get(self._STATUS_UNSEEN)
+        return unseen == 0 and bool(self._UNSEEN_CRITERIA.match(
+            self._criteria.strip()))
+
+    def _iter_windows(self, message_ids):
         """
-        Parameters
-        ----------
-        mailbox : str
-            Default is "inbox".
-        timeout : int
-            Timeout for connection to IMAP server.
-        charset : str
-            Charset used for IMAP4.search used to retrive mail ids.
-        criteria : str
-            Criteria used for IMAP4.search used to retrieve mail ids.
+        Yield the ids to download with one FETCH each, with the map of UID
+        to size used to group them.
+
+        Without window_bytes the windows are batch_size ids. Otherwise the
+        sizes of each batch are fetched and the batch is split so that the
+        bytes downloaded per window stay within window_bytes.
         """
-        self._mailbox = mailbox
-        self._timeout = timeout
-        self._charset = charset
-        self._criteria = criteria
+        start = 0
+        while start < len(message_ids):
+            batch = message_ids[start:start + self.batch_size]
+            start += len(batch)
+            if not self._window_bytes:
+                yield batch, {}
+                continue
 
-        self._imap = None
-        self._logged_in = False
-        socket.setdefaulttimeout(self._timeout)
+            # Cached messages are not downloaded so they take no budget.
+            uncached = batch
+            if self._is_cache_usable():
+                uncached = [i for i in batch
+                            if self._get_cache_key(i) not in self._cache]
+            sizes = self._get_sizes(uncached) if uncached else {}
+            window = []
+            window_bytes = 0
+            for message_id in batch:
+                size = sizes.get(int(message_id), 0)
+                if (self._max_message_bytes is not None and
+                        size > self._max_message_bytes):
+                    if self._oversize_mode == OVERSIZE_SKIP:
+                        size = 0
+                    else:
+                        size = self._max_message_bytes
+                if window and window_bytes + size > self._window_bytes:
+                    yield window, sizes
+                    window = []
+                    window_bytes = 0
+                window.append(message_id)
+                window_bytes += size
+            if window:
+                yield window, sizes
 
-    def _assert_connected(self):
+    def _load_capabilities(self):
         """
-        Raise exception if not connected to IMAP server.
+        Ask the server for its capabilities, which may differ after login.
         """
-        if not self._imap:
-            errmsg = _ERRMSG_NOT_CONNECTED
-            err = exception.create(ValueError, errmsg)
-            raise err
+        result, response = self._imap.capability()
+        if result == "OK" and response and response[0]:
+            self._capabilities = set(_to_str(response[0]).upper().split())
 
-    def _assert_logged_in(self):
+    def _load_checkpoint(self):
         """
-        Raise exception if not logged in to IMAP server.
+        Return the checkpointed UID and HIGHESTMODSEQ if they are valid for
+        the selected mailbox, otherwise 0 and the HIGHESTMODSEQ remembered
+        in this session.
         """
-        if not self._logged_in:
-            errmsg = _ERRMSG_NOT_LOGGED_IN
-            err = exception.create(ValueError, errmsg)
-            raise err
+        if not self._checkpoint or self._uidvalidity is None:
+            return 0, self._modseq
+        uidvalidity, uid, modseq = self._checkpoint.load()
+        if uidvalidity != self._uidvalidity:
+            return 0, None
+        return uid, modseq
 
-    def _assert_not_empty(self, value, errmsg):
+    def _next_tag(self):
         """
+        Return a new tag for a command sent without imaplib.
         """
-        if not value:
-            err = exception.create(ValueError, errmsg)
+        self._tag_count += 1
+        return self._TAG.format(self._tag_count)
+
+    def _pipeline(self, commands):
+        """
+        Send commands at once and then read their tagged responses, so they
+        cost a single round trip.
+
+        Only commands whose results do not depend on each other may be
+        pipelined.
+
+        Raises
+        ------
+        imaplib.IMAP4.error
+            If a command did not complete OK, after every response is read.
+        """
+        tags = [self._next_tag() for command in commands]
+        data = "".join(self._COMMAND.format(tag, command)
+                       for tag, command in zip(tags, commands))
+        self._imap.send(data.encode("utf-8"))
+
+        failures = []
+        for tag, command in zip(tags, commands):
+            line = self._read_tagged_response(tag)
+            status = line[len(tag):].split(None, 1)
+            if not status or status[0].upper() != "OK":
+                failures.append(_ERRMSG_COMMAND_FAILED.format(
+                    command, line.strip()))
+        if failures:
+            err = exception.create(imaplib.IMAP4.error, "; ".join(failures))
             raise err
 
-    def _get_message_ids(self):
+    def _read_tagged_response(self, tag, untagged=None):
         """
-        Return a list of email message ids.
+        Read responses until the tagged completion of tag, appending the
+        lines before it to untagged if given.
         """
-        result, response = self._imap.search(self._charset, self._criteria)
-        id_list_string = response[0]
-        id_list = id_list_string.split()
-        return id_list
+        while True:
+            line = _to_str(self._imap.readline())
+            if not line:
+                raise imaplib.IMAP4.abort(_ERRMSG_NOT_CONNECTED)
+            if line.startswith(tag + " "):
+                return line
+            if self._IDLE_NEW_MAIL.match(line):
+                self._new_mail = True
+            if untagged is not None:
+                untagged.append(line)
 
-    def _get_messages(self, message_ids):
+    def _save_checkpoint(self, uid, modseq):
         """
-        Return all powl.mail.MailMessage fetched using the given id list.
+        Save the checkpoint if there is one.
         """
-        messages = []
-        for message_id in message_ids:
-            result, response = self._imap.fetch(message_id, self._MESSAGE_PART)
-            email_message_string = response[0][1]
-            email_message = email.message_from_string(email_message_string)
-            message = MailMessage(email_message)
-            messages.append(message)
-        return messages
+        if self._checkpoint and self._uidvalidity is not None:
+            self._checkpoint.save(self._uidvalidity, uid, modseq)
 
     def _select_mailbox(self):
         """
         Select a mailbox folder.
         """
-        result, response = self._imap.select(self._mailbox)
+        if self._has_condstore():
+            mailbox = self._CONDSTORE_MAILBOX.format(self._mailbox)
+        else:
+            mailbox = self._mailbox
+
+        result, response = self._imap.select(mailbox)
         if result == "NO":
             errmsg = _ERRMSG_INVALID_MAILBOX.format(self._mailbox)
             err = exception.create(ValueError, errmsg)
             raise err
 
-    # powl.actionretriever.Mail methods.
+        result, response = self._imap.response("UIDVALIDITY")
+        if response and response[0]:
+            self._uidvalidity = int(response[0])
+        self._selected = True
+
+    def _skip_messages(self, message_ids, sizes):
+        """
+        Count and log the oversized messages skipped by OVERSIZE_SKIP, which
+        are left on the server and not retrieved.
+        """
+        for message_id in message_ids:
+            self._skipped_count += 1
+            if self._log:
+                self._log.warning(
+                    "skipped oversized message UID %s of %d bytes in %s",
+                    int(message_id), sizes.get(int(message_id), 0),
+                    self._mailbox)
+
+    def _status_names(self):
+        """
+        Return the parenthesized STATUS items to ask for, including
+        HIGHESTMODSEQ if the server supports CONDSTORE.
+        """
+        names = self._STATUS_ITEMS
+        if self._has_condstore():
+            names += (self._STATUS_HIGHESTMODSEQ,)
+        return "({0})".format(" ".join(names))
+
+    def _wait_readable(self, timeout):
+        """
+        Return if the connection has data to read within timeout seconds.
+
+        A socket timeout would leave the imaplib file object unusable, so the
+        socket is polled with select instead.
+        """
+        if self._deflate and self._deflate.pending():
+            # Already inflated data waiting in the buffer.
+            return True
+        if not self._deflate and self._is_buffered():
+            # Already read from the socket by the imaplib file object.
+            return True
+        sock = self._imap.sock
+        pending = getattr(sock, "pending", None)
+        if pending and pending():
+            # Already decrypted data waiting in the SSL layer.
+            return True
+        readable, writable, errored = select.select([sock], [], [], timeout)
+        return bool(readable)
+
+    # powl.mail.Mail methods.
+    def acknowledge(self, messages):
+        """
+        Every batch_size messages are acknowledged by one UID STORE or UID
+        MOVE, and all of them are pipelined in a single round trip. Without
+        the MOVE capability, messages are copied and then flagged as
+        deleted once every copy has succeeded. Deleted messages are then
+        expunged.
+
+        The checkpoint is then advanced to the highest UID up to which every
+        retrieved message has been acknowledged.
+        """
+        self._assert_connected()
+        self._assert_logged_in()
+
+        message_ids = sorted(m.id for m in messages if m.id is not None)
+        if not message_ids:
+            return
+        self._ensure_selected()
+
+        message_sets = [
+            format_message_set(message_ids[start:start + self._batch_size])
+            for start in range(0, len(message_ids), self._batch_size)]
+        mailbox = quote(self._acknowledge_mailbox or "")
+
+        if self._acknowledge_mode == ACKNOWLEDGE_SEEN:
+            self._pipeline([self._STORE_COMMAND.format(m, self._FLAG_SEEN)
+                            for m in message_sets])
+        elif self._acknowledge_mode == ACKNOWLEDGE_DELETE:
+            self._delete(message_sets)
+        elif self._CAPABILITY_MOVE in self._capabilities:
+            self._pipeline([self._MOVE_COMMAND.format(m, mailbox)
+                            for m in message_sets])
+        else:
+            self._pipeline([self._COPY_COMMAND.format(m, mailbox)
+                            for m in message_sets])
+            self._delete(message_sets)
+
+        self._unacknowledged.difference_update(message_ids)
+        self._advance_checkpoint()
+
+    def close(self):
+        """
+        Log out and drop the connection, ignoring errors from a connection
+        that is already dead.
+        """
+        if self._imap:
+            try:
+                self._imap.logout()
+            except (imaplib.IMAP4.error, socket.error):
+                pass
+        self._imap = None
+        self._deflate = None
+        self._logged_in = False
+        self._selected = False
+
     def connect(self, server):
         self._assert_not_empty(server, _ERRMSG_EMPTY_SERVER)
 
         try:
-            self._imap = imaplib.IMAP4_SSL(server)
+            self._imap = self._imap_class(server)
         except socket.timeout as err:
             errmsg = _ERRMSG_TIMEOUT.format(server)
             exception.add_message(err, errmsg)
@@ -199,15 +1888,121 @@ class ImapMail(Mail):
                 errmsg = _ERRMSG_CONNECT_UNKNOWN.format(server)
             exception.add_message(err, errmsg)
             raise
+        self._server = server
 
     def get_messages(self):
+        return list(self.iter_messages())
+
+    def get_status(self, mailboxes=None):
+        """
+        Ask for the STATUS of several mailboxes over this connection without
+        selecting any of them. The STATUS commands of several mailboxes are
+        pipelined in a single round trip.
+
+        Parameters
+        ----------
+        mailboxes : list of str
+            Mailboxes to ask about, default the mailbox of this object.
+
+        Returns
+        -------
+        dict of str to dict of str to int
+            Map of mailbox to its UIDNEXT, UIDVALIDITY, UNSEEN and, if the
+            server supports CONDSTORE, HIGHESTMODSEQ.
+
+        Raises
+        ------
+        ValueError
+            If a mailbox does not exist.
+        """
         self._assert_connected()
         self._assert_logged_in()
 
-        message_ids = self._get_message_ids()
-        messages = self._get_messages(message_ids)
+        if mailboxes is None:
+            mailboxes = [self._mailbox]
+        if len(mailboxes) == 1:
+            return {mailboxes[0]: self._get_status(mailboxes[0])}
+        return self._get_statuses(mailboxes)
 
-        return messages
+    def idle(self, timeout, poll_interval=None):
+        self._assert_connected()
+        self._assert_logged_in()
+
+        if self._take_new_mail():
+            # Reported while the last poll ran, so it may not have seen it.
+            return True
+
+        if self._CAPABILITY_IDLE not in self._capabilities:
+            # Fall back to polling.
+            time.sleep(min(timeout, poll_interval or timeout))
+            return True
+
+        self._ensure_selected()
+
+        deadline = time.time() + timeout
+        tag = self._next_tag()
+        self._imap.send(self._IDLE_COMMAND.format(tag).encode("ascii"))
+
+        line = _to_str(self._imap.readline())
+        if not line.startswith("+"):
+            # IDLE was rejected, so this is its tagged response.
+            errmsg = line.strip()
+            err = exception.create(imaplib.IMAP4.error, errmsg)
+            raise err
+
+        new_mail = self._idle_until(deadline)
+        self._imap.send(self._IDLE_DONE.encode("ascii"))
+        self._read_tagged_response(tag)
+        return new_mail
+
+    def iter_messages(self):
+        """
+        Messages are requested batch_size at a time, or in windows of at
+        most window_bytes, with one FETCH per message set and the next batch
+        is only fetched once the previous one has been consumed, so at most
+        one batch is held in memory. The checkpoint only passes the returned
+        messages once they are acknowledged.
+        """
+        self._assert_connected()
+        self._assert_logged_in()
+
+        # Mail reported before this poll is found by it.
+        self._take_new_mail()
+        if not self._selected:
+            # The first poll after login reuses the STATUS of login.
+            status = self._login_status or self._get_status(self._mailbox)
+            self._uidvalidity = status.get(self._STATUS_UIDVALIDITY,
+                                           self._uidvalidity)
+        self._login_status = None
+        last_uid, last_modseq = self._load_checkpoint()
+        if self._selected:
+            status = self._get_selected_status(last_modseq)
+        self._saved = (last_uid, last_modseq)
+        self._retrieved_uid = last_uid
+        self._retrieved_modseq = last_modseq
+        self._unacknowledged = set()
+        if self._is_unchanged(status, last_uid, last_modseq):
+            return
+
+        modseq = status.get(self._STATUS_HIGHESTMODSEQ)
+        self._ensure_selected()
+        message_ids = self._get_message_ids(last_uid)
+        for window, sizes in self._iter_windows(message_ids):
+            started = time.time()
+            messages = self._get_window_messages(window, sizes)
+            if self._batch_sizer:
+                self._batch_sizer.update(len(window), time.time() - started)
+            for message in messages:
+                self._unacknowledged.add(message.id)
+                self._retrieved_uid = max(self._retrieved_uid, message.id)
+                yield message
+            # Ids of the window that returned no message, such as skipped
+            # ones, have nothing to acknowledge.
+            self._retrieved_uid = max([self._retrieved_uid] +
+                                      [int(i) for i in window])
+
+        self._retrieved_modseq = modseq
+        self._advance_checkpoint()
 
     def login(self, user, password):
         self._assert_connected()
@@ -223,6 +2018,249 @@ class ImapMail(Mail):
                 exception.add_message(err, errmsg)
             raise
 
-        self._select_mailbox()
+        self._user = user
+        self._password = password
+        self._load_capabilities()
+        self._compress_connection()
+        # Checks that the mailbox exists without selecting it. The status is
+        # kept for the first poll, which usually follows right away.
+        self._login_status = self._get_status(self._mailbox)
         self._logged_in = True
 
+    def mark_seen(self, messages):
+        self._assert_connected()
+        self._assert_logged_in()
+
+        self._ensure_selected()
+        message_ids = [m.id for m in messages if m.id is not None]
+        for start in range(0, len(message_ids), self._batch_size):
+            batch = message_ids[start:start + self._batch_size]
+            self._imap.uid("STORE", format_message_set(batch), "+FLAGS",
+                           self._FLAG_SEEN)
+
+    @property
+    def batch_size(self):
+        """
+        Number of messages requested by the next FETCH.
+        """
+        if self._batch_sizer:
+            return self._batch_sizer.size
+        return self._batch_size
+
+    @property
+    def skipped_count(self):
+        """
+        Number of oversized messages skipped by OVERSIZE_SKIP since this
+        was created.
+        """
+        return self._skipped_count
+
+    def is_alive(self):
+        """
+        Send a NOOP to check that the session is still usable.
+
+        Returns
+        -------
+        bool
+        """
+        if not self._imap or not self._logged_in:
+            return False
+        try:
+            result, response = self._imap.noop()
+        except (imaplib.IMAP4.abort, socket.error):
+            return False
+        return result == "OK"
+
+    def reconnect(self):
+        """
+        Open a new connection and log in with the last server and
+        credentials.
+        """
+        self._assert_not_empty(self._server, _ERRMSG_NOT_CONNECTED)
+        self._assert_not_empty(self._user, _ERRMSG_NOT_LOGGED_IN)
+        self.close()
+        self.connect(self._server)
+        self.login(self._user, self._password)
+
+
+class ImapSessionPool(object):
+    """
+    Keeps logged in powl.mail.ImapMail sessions keyed by server, user and
+    mailbox so a long running or scheduled process reuses them between
+    processing cycles.
+    """
+
+    def __init__(self, keepalive_interval=300, mail_factory=ImapMail):
+        """
+        Parameters
+        ----------
+        keepalive_interval : float
+            Seconds a session may be unused before it is checked with NOOP.
+        mail_factory : callable
+            Called with the mailbox to create a new powl.mail.ImapMail.
+        """
+        self._keepalive_interval = keepalive_interval
+        self._mail_factory = mail_factory
+        self._sessions = {}
+        self._last_used = {}
+
+    def _refresh(self, key):
+        """
+        NOOP the session of key if it has not been used recently, and
+        reconnect it if it is dead.
+        """
+        session = self._sessions[key]
+        unused = time.time() - self._last_used[key]
+        if unused >= self._keepalive_interval and not session.is_alive():
+            session.reconnect()
+        self._last_used[key] = time.time()
+
+    def close(self):
+        """
+        Log out of every session.
+        """
+        for session in self._sessions.values():
+            session.close()
+        self._sessions.clear()
+        self._last_used.clear()
+
+    def discard(self, server, user, mailbox="inbox"):
+        """
+        Close and forget the session of the given server, user and mailbox,
+        such as after an error left it unusable, so the next get opens a new
+        one.
+        """
+        key = (server, user, mailbox)
+        session = self._sessions.pop(key, None)
+        self._last_used.pop(key, None)
+        if session:
+            session.close()
+
+    def get(self, server, user, password, mailbox="inbox"):
+        """
+        Return a logged in session, creating it if there is none.
+
+        Parameters
+        ----------
+        server : str
+        user : str
+        password : str
+        mailbox : str
+
+        Returns
+        -------
+        powl.mail.ImapMail
+        """
+        key = (server, user, mailbox)
+        if key in self._sessions:
+            self._refresh(key)
+            return self._sessions[key]
+
+        session = self._mail_factory(mailbox)
+        session.connect(server)
+        session.login(user, password)
+        self._sessions[key] = session
+        self._last_used[key] = time.time()
+        return session
+
+    def keepalive(self):
+        """
+        NOOP every session that has not been used recently and reconnect the
+        dead ones.
+        """
+        for key in list(self._sessions):
+            self._refresh(key)
+
+
+class PooledImapMail(Mail):
+    """
+    Implements Mail over a session of a powl.mail.ImapSessionPool, and
+    reconnects once if the session turns out to be dead.
+    """
+
+    def __init__(self, pool, mailbox="inbox"):
+        """
+        Parameters
+        ----------
+        pool : powl.mail.ImapSessionPool
+            Pool holding the sessions.
+        mailbox : str
+            Default is "inbox".
+        """
+        self._pool = pool
+        self._mailbox = mailbox
+        self._server = None
+        self._user = None
+        self._session = None
+
+    def _call(self, method, *args):
+        """
+        Call a method of the session, reconnecting and retrying once if the
+        connection is dead.
+        """
+        if not self._session:
+            errmsg = _ERRMSG_NOT_LOGGED_IN
+            err = exception.create(ValueError, errmsg)
+            raise err
+
+        try:
+            return getattr(self._session, method)(*args)
+        except (imaplib.IMAP4.abort, socket.error):
+            self._session.reconnect()
+            return getattr(self._session, method)(*args)
+
+    # powl.mail.Mail methods.
+    def acknowledge(self, messages):
+        return self._call("acknowledge", messages)
+
+    def close(self):
+        """
+        Drop the session from the pool, so the next login opens a new one.
+        """
+        if self._session:
+            self._pool.discard(self._server, self._user, self._mailbox)
+        self._session = None
+
+    def connect(self, server):
+        self._server = server
+
+    def get_messages(self):
+        return self._call("get_messages")
+
+    def idle(self, timeout, poll_interval=None):
+        return self._call("idle", timeout, poll_interval)
+
+    def iter_messages(self):
+        """
+        Errors of the session surface while iterating, after _call has
+        returned, so the session is reconnected and the retrieval retried
+        once if the first message fails. A later failure is raised, since
+        messages were already yielded.
+        """
+        messages = self._call("iter_messages")
+        try:
+            first = next(messages)
+        except StopIteration:
+            return
+        except (imaplib.IMAP4.abort, socket.error):
+            self._session.reconnect()
+            messages = self._session.iter_messages()
+            try:
+                first = next(messages)
+            except StopIteration:
+                return
+        yield first
+        for message in messages:
+            yield message
+
+    def login(self, user, password):
+        if not self._server:
+            errmsg = _ERRMSG_NOT_CONNECTED
+            err = exception.create(ValueError, errmsg)
+            raise err
+        self._user = user
+        self._session = self._pool.get(self._server, user, password,
+                                       self._mailbox)
+
+    def mark_seen(self, messages):
+        return self._call("mark_seen", messages)
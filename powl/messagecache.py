@@ -0,0 +1,184 @@
+"""Provides a local cache of raw messages."""
+import collections
+import os
+import urllib.parse
+from powl import exception
+
+_ERRMSG_INVALID_MAX_BYTES = "max bytes ({0}) must be at least 1"
+
+
+class RawMessageCache(object):
+    """
+    Stores raw RFC822 messages as files in a folder, keyed by the mailbox,
+    UIDVALIDITY and UID of each message, within a byte budget. The mailbox
+    is part of the key since UIDs are only unique within a mailbox, so one
+    folder can be shared between mailboxes.
+
+    The least recently used messages are evicted once the budget is
+    exceeded. Recency is kept in the modification time of each file, so it
+    survives between runs.
+
+    Properties
+    ----------
+    size : int
+        Number of bytes of the cached messages.
+    """
+
+    _FILENAME = "{0}-{1}-{2}.eml"
+    _TEMP_FILENAME = ".{0}.tmp"
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        """
+        Parameters
+        ----------
+        path : str
+            Folder of the cached messages, created if it does not exist.
+        max_bytes : int
+            Maximum number of bytes of the cached messages.
+
+        Raises
+        ------
+        ValueError
+            If max_bytes is less than 1.
+        """
+        if max_bytes < 1:
+            errmsg = _ERRMSG_INVALID_MAX_BYTES.format(max_bytes)
+            err = exception.create(ValueError, errmsg)
+            raise err
+
+        self._path = path
+        self._max_bytes = max_bytes
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        # Map of key to size, from least to most recently used.
+        self._sizes = collections.OrderedDict()
+        self._size = 0
+        entries = []
+        for entry in os.scandir(path):
+            key = self._parse_filename(entry.name)
+            if key is not None and entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, key, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+            self._size += size
+        self._evict()
+
+    def __contains__(self, key):
+        return key in self._sizes
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def _evict(self):
+        """
+        Remove the least recently used messages until within max_bytes.
+        """
+        while self._size > self._max_bytes:
+            key, size = self._sizes.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(self._get_filename(key))
+            except FileNotFoundError:
+                pass
+
+    def _get_filename(self, key):
+        """
+        Return the path of the file of a key.
+        """
+        mailbox, uidvalidity, uid = key
+        # Quoted so any mailbox is a single safe file name component.
+        mailbox = urllib.parse.quote(mailbox, safe="")
+        filename = self._FILENAME.format(mailbox, uidvalidity, uid)
+        return os.path.join(self._path, filename)
+
+    def _parse_filename(self, filename):
+        """
+        Return the key of a file name, or None if it is not a message.
+        """
+        name, extension = os.path.splitext(filename)
+        values = name.rsplit("-", 2)
+        if extension != ".eml" or len(values) != 3:
+            return None
+        mailbox, uidvalidity, uid = values
+        try:
+            return (urllib.parse.unquote(mailbox), int(uidvalidity), int(uid))
+        except ValueError:
+            return None
+
+    @property
+    def size(self):
+        return self._size
+
+    def get(self, key):
+        """
+        Return the raw message of a key and mark it as most recently used.
+
+        Parameters
+        ----------
+        key : tuple of str, int, int
+            Mailbox, UIDVALIDITY and UID of the message.
+
+        Returns
+        -------
+        bytes or None
+            The raw message, or None if it is not cached.
+        """
+        if key not in self._sizes:
+            return None
+        filename = self._get_filename(key)
+        try:
+            with open(filename, "rb") as infile:
+                raw = infile.read()
+            os.utime(filename)
+        except FileNotFoundError:
+            self._size -= self._sizes.pop(key)
+            return None
+        self._sizes.move_to_end(key)
+        return raw
+
+    def iter_items(self):
+        """
+        Yield every cached message in key order without changing how
+        recently it was used, such as to replay them.
+
+        Returns
+        -------
+        iterator of (tuple of str, int, int), bytes
+        """
+        for key in sorted(self._sizes):
+            try:
+                with open(self._get_filename(key), "rb") as infile:
+                    raw = infile.read()
+            except FileNotFoundError:
+                continue
+            yield key, raw
+
+    def put(self, key, raw):
+        """
+        Cache a raw message, evicting the least recently used messages to
+        stay within max_bytes. A message bigger than max_bytes is not
+        cached.
+
+        Parameters
+        ----------
+        key : tuple of str, int, int
+            Mailbox, UIDVALIDITY and UID of the message.
+        raw : bytes
+            The raw RFC822 message.
+        """
+        if len(raw) > self._max_bytes:
+            return
+        filename = self._get_filename(key)
+        temp_filename = os.path.join(
+            self._path, self._TEMP_FILENAME.format(os.path.basename(filename)))
+        with open(temp_filename, "wb") as outfile:
+            outfile.write(raw)
+        # Readers never see a partially written message.
+        os.replace(temp_filename, filename)
+
+        self._size -= self._sizes.pop(key, 0)
+        self._sizes[key] = len(raw)
+        self._size += len(raw)
+        self._evict()
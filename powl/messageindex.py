@@ -0,0 +1,176 @@
+"""Provides a persistent index of processed messages."""
+import hashlib
+import math
+import mmap
+import os
+import sqlite3
+import threading
+from powl import exception
+
+_ERRMSG_INVALID_CAPACITY = "capacity ({0}) must be at least 1"
+_ERRMSG_INVALID_ERROR_RATE = "error rate ({0}) must be between 0 and 1"
+
+
+class BloomFilter(object):
+    """
+    A Bloom filter whose bits are a memory mapped file, so it persists as it
+    is updated and is never read into memory as a whole.
+
+    Properties
+    ----------
+    created : bool
+        Whether the file was created empty when opened.
+    """
+
+    def __init__(self, path, capacity=1000000, error_rate=0.001):
+        """
+        Parameters
+        ----------
+        path : str
+            File holding the bits. A file of another size is recreated.
+        capacity : int
+            Number of keys the filter is sized for.
+        error_rate : float
+            False positive rate at capacity.
+
+        Raises
+        ------
+        ValueError
+            If capacity is less than 1.
+            If error_rate is not between 0 and 1.
+        """
+        if capacity < 1:
+            errmsg = _ERRMSG_INVALID_CAPACITY.format(capacity)
+            err = exception.create(ValueError, errmsg)
+            raise err
+
+        if not 0 < error_rate < 1:
+            errmsg = _ERRMSG_INVALID_ERROR_RATE.format(error_rate)
+            err = exception.create(ValueError, errmsg)
+            raise err
+
+        bit_count = -capacity * math.log(error_rate) / math.log(2) ** 2
+        self._byte_count = int(math.ceil(bit_count / 8))
+        self._bit_count = self._byte_count * 8
+        self._hash_count = max(1, int(round(
+            self._bit_count / float(capacity) * math.log(2))))
+
+        self._created = (not os.path.isfile(path) or
+                         os.path.getsize(path) != self._byte_count)
+        if self._created:
+            with open(path, "wb") as outfile:
+                outfile.truncate(self._byte_count)
+        self._file = open(path, "r+b")
+        self._bits = mmap.mmap(self._file.fileno(), self._byte_count)
+
+    def __contains__(self, key):
+        for position in self._get_positions(key):
+            if not self._bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def _get_positions(self, key):
+        """
+        Return the bit positions of a key by double hashing.
+        """
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self._bit_count
+                for i in range(self._hash_count)]
+
+    @property
+    def created(self):
+        return self._created
+
+    def add(self, key):
+        """
+        Add a key to the filter.
+        """
+        for position in self._get_positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def close(self):
+        """
+        Write the bits to disk and close the file.
+        """
+        self._bits.flush()
+        self._bits.close()
+        self._file.close()
+
+
+class ProcessedMessageIndex(object):
+    """
+    Persists the keys of processed messages, such as their Message-ID.
+
+    A Bloom filter answers most lookups of new keys without touching the
+    disk. Only its possible matches are looked up in an SQLite table, so
+    each lookup stays O(1) however many keys were recorded and nothing is
+    loaded at startup.
+    """
+
+    _BLOOM_EXTENSION = ".bloom"
+
+    def __init__(self, path, capacity=1000000, error_rate=0.001):
+        """
+        Parameters
+        ----------
+        path : str
+            SQLite database of the keys. The Bloom filter is stored next to
+            it with a .bloom extension.
+        capacity : int
+            Number of keys the Bloom filter is sized for.
+        error_rate : float
+            False positive rate of the Bloom filter at capacity.
+
+        Raises
+        ------
+        ValueError
+            If capacity is less than 1.
+            If error_rate is not between 0 and 1.
+        """
+        self._bloom = BloomFilter(path + self._BLOOM_EXTENSION, capacity,
+                                  error_rate)
+        # Retrieval and actions run on different threads.
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS processed "
+                         "(key TEXT PRIMARY KEY) WITHOUT ROWID")
+        self._db.commit()
+
+        if self._bloom.created:
+            # A new filter must know every recorded key to have no false
+            # negatives.
+            for (key,) in self._db.execute("SELECT key FROM processed"):
+                self._bloom.add(key)
+
+    def __contains__(self, key):
+        if key not in self._bloom:
+            return False
+        with self._lock:
+            cursor = self._db.execute(
+                "SELECT 1 FROM processed WHERE key = ?", (key,))
+            return cursor.fetchone() is not None
+
+    def add(self, key):
+        """
+        Record a key as processed.
+
+        The Bloom filter is updated first so a crash in between can only
+        cause a false positive, which the table corrects.
+        """
+        self._bloom.add(key)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO processed (key) VALUES (?)", (key,))
+            self._db.commit()
+
+    def close(self):
+        """
+        Close the Bloom filter and the database.
+        """
+        self._bloom.close()
+        with self._lock:
+            self._db.close()
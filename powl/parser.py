@@ -1,8 +1,53 @@
 """Provides classes to parse messages and to parse for action data."""
+import functools
 import re
 from powl import actiontype
 from powl import actiondata
 from powl import exception
+from powl import result
+
+_ERRMSG_AMBIGUOUS_ACTION_KEY = "action key ({0}) is ambiguous between {1}"
+_ERRMSG_AMOUNT_NOT_NUMBER = "amount ({0}) is not a number"
+_ERRMSG_INVALID_CACHE_SIZE = "cache size ({0}) must be at least 1"
+_ERRMSG_FAT_PERCENTAGE_NOT_NUMBER = "fat percentage ({0}) is not a number"
+_ERRMSG_MASS_NOT_NUMBER = "mass ({0}) is not a number"
+_ERRMSG_MISSING = "{0} is missing from ({1})"
+_ERRMSG_NOT_ENOUGH_ARGUMENTS = "not enough arguments from ({0})"
+_ERRMSG_NOT_PARSED = "{0} was not parsed from ({1})"
+_ERRMSG_UNKNOWN_ACTION_KEY = "action key ({0}) is unknown"
+
+
+def _freeze(value):
+    """
+    Return value with each data object in it replaced by its frozen copy,
+    so it can be shared between callers.
+    """
+    if isinstance(value, tuple):
+        return tuple(_freeze(item) for item in value)
+    freeze = getattr(value, "freeze", None)
+    return freeze() if freeze is not None else value
+
+
+def _get_span(params, position):
+    """
+    Return the start and end offsets of params[position], without
+    surrounding whitespace, in the string params were split from by a one
+    character delimiter.
+    """
+    param = params[position]
+    start = sum(len(p) + 1 for p in params[:position])
+    start += len(param) - len(param.lstrip())
+    return start, start + len(param.strip())
+
+
+def _to_float(value):
+    """
+    Return value as a float, or None if it is not a number.
+    """
+    try:
+        return float(value)
+    except ValueError:
+        return None
 
 
 class Parser(object):
@@ -21,14 +66,152 @@ class Parser(object):
         """
         pass
 
+    def parse_many(self, strings):
+        """
+        Parse many strings into columns, recording failures instead of
+        raising them.
+
+        Parameters
+        ----------
+        strings : iterable of str
+            Strings to parse.
+
+        Returns
+        -------
+        columns : object
+            Data of the strings that were parsed, stored by column.
+        errors : list of tuple of int, str
+            Index and error message of each string that failed to parse.
+        """
+        pass
+
+    def try_parse(self, string):
+        """
+        Parse a string like parse, but return a failure instead of raising
+        an exception.
+
+        Parameters
+        ----------
+        string : str
+            String to parse.
+
+        Returns
+        -------
+        powl.result.Result
+            The parsed data, or an error with a code and the span of the
+            offending text.
+        """
+        pass
+
+
+class FlagTokenizer(object):
+    """
+    Scans a string of flags and their values once with a single compiled
+    pattern and fills a data object with the value of each known flag.
+
+    A flag is a dash and a letter after whitespace, such as "-m", so
+    dashes within values, such as in negative amounts or hyphenated words,
+    are kept. A value may follow a known flag letter right away, so
+    "-a4.50" is an amount and "-dcash" a debit. A value may only follow an
+    unknown letter right away if it does not start with a letter, so a
+    word such as "-decaf" is text unless "d" is a known flag. A dash
+    escaped as "\\-" is never a flag. Values may be double quoted, with
+    "\\"" for a quote within them. Values of unknown flags are ignored.
+    """
+
+    _QUOTED_ESCAPE = re.compile(r'\\(.)', re.DOTALL)
+    _TOKEN = (r'(?<!\S)-(?P<flag>[{0}]|[A-Za-z](?![A-Za-z]))'
+              r'|"(?P<quoted>(?:[^"\\]|\\.)*)"'
+              r'|\\(?P<escaped>.)'
+              r'|(?P<text>[^"\\-]+|.)')
+
+    def __init__(self, flags):
+        """
+        Parameters
+        ----------
+        flags : dict of str to str
+            Map of flag letter to the attribute of the data object that
+            receives its value.
+        """
+        self._flags = flags
+        self._token = re.compile(
+            self._TOKEN.format(re.escape("".join(sorted(flags)))),
+            re.DOTALL)
+
+    def _set(self, data, attribute, pieces, spans, span):
+        """
+        Set an attribute of data to the joined pieces of its value, and
+        record the span of the value if spans are recorded.
+        """
+        if attribute is None:
+            return
+        setattr(data, attribute, "".join(pieces).strip())
+        if spans is not None:
+            spans[attribute] = span
+
+    def fill(self, string, data, spans=None):
+        """
+        Set the attributes of data to the values of the flags in string.
+        A flag given more than once keeps its last value.
+
+        Parameters
+        ----------
+        string : str
+            String of flags and their values.
+        data : object
+            Data object to fill, such as a powl.actiondata.TransactionData.
+        spans : dict
+            Optional, filled with the start and end offsets in string of the
+            value of each set attribute, without surrounding whitespace and
+            with any quotes, or None for an empty value.
+
+        Returns
+        -------
+        object
+            The given data object.
+        """
+        attribute = None
+        pieces = []
+        span = None
+        for match in self._token.finditer(string):
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind == "flag":
+                self._set(data, attribute, pieces, spans, span)
+                attribute = self._flags.get(value)
+                pieces = []
+                span = None
+            elif attribute is not None:
+                start, end = match.span()
+                if kind == "text":
+                    start += len(value) - len(value.lstrip())
+                    end -= len(value) - len(value.rstrip())
+                if start < end:
+                    span = (span[0] if span else start, end)
+                if kind == "quoted" and "\\" in value:
+                    value = self._QUOTED_ESCAPE.sub(r"\1", value)
+                pieces.append(value)
+        self._set(data, attribute, pieces, spans, span)
+        return data
+
 
 class ActionItemParser(Parser):
     """
-    Parses an item containing an action and its data.
+    Parses an item containing an action and its data. The action key may
+    be any unambiguous prefix of an action type or alias.
     """
 
     _DELIMITER = ' '
 
+    def __init__(self, trie=actiontype.ACTION_TRIE):
+        """
+        Parameters
+        ----------
+        trie : powl.prefixtrie.PrefixTrie
+            Resolves action keys to action types.
+        """
+        self._trie = trie
+
     def parse(self, item):
         """
         Returns
@@ -39,20 +222,134 @@ class ActionItemParser(Parser):
         Raises
         ------
         KeyError
-            If the action_key is not in the action map.
+            If the action_key is unknown or ambiguous.
         ValueError
             If a valid action was not parsed.
         """
-        action_key, data = item.split(self._DELIMITER, 1)
+        parsed = self.try_parse(item)
+        if not parsed.ok:
+            err = parsed.error.to_exception()
+            raise err
+        return parsed.value
+
+    def try_parse(self, item):
+        """
+        Returns
+        -------
+        powl.result.Result
+            The action type and a string containing data for the action, or
+            an ERROR_UNKNOWN_ACTION, ERROR_AMBIGUOUS_ACTION or
+            ERROR_NOT_ENOUGH_ARGUMENTS error.
+        """
+        params = item.split(self._DELIMITER, 1)
+        if len(params) < 2:
+            return result.failure(result.ERROR_NOT_ENOUGH_ARGUMENTS,
+                                  _ERRMSG_NOT_ENOUGH_ARGUMENTS.format(item))
+
+        action_key, data = params
+        action_type = self._trie.get(action_key)
+        if action_type is None:
+            candidates = self._trie.candidates(action_key)
+            if candidates:
+                errmsg = _ERRMSG_AMBIGUOUS_ACTION_KEY.format(
+                    action_key, ", ".join(candidates))
+                return result.failure(result.ERROR_AMBIGUOUS_ACTION, errmsg,
+                                      (0, len(action_key)))
+            errmsg = _ERRMSG_UNKNOWN_ACTION_KEY.format(action_key)
+            return result.failure(result.ERROR_UNKNOWN_ACTION, errmsg,
+                                  (0, len(action_key)))
+        return result.success((action_type, data))
+
+
+class CachingParser(Parser):
+    """
+    Memoizes the results of another parser in a bounded LRU cache, since
+    the same shorthand items are sent again and again.
+
+    The string is the key of the cache as given, so a cached and an
+    uncached parser return the same result for it. Parsed data objects are
+    frozen once when their result is cached, and the frozen value is
+    returned on every call without copying.
+
+    Properties
+    ----------
+    hits : int
+        Number of strings whose result was in the cache.
+    misses : int
+        Number of strings that were parsed.
+    size : int
+        Number of cached results.
+    """
+
+    def __init__(self, parser, max_size=1024):
+        """
+        Parameters
+        ----------
+        parser : powl.parser.Parser
+            Parser whose results are cached.
+        max_size : int
+            Maximum number of cached results.
+
+        Raises
+        ------
+        ValueError
+            If max_size is less than 1.
+        """
+        if max_size < 1:
+            errmsg = _ERRMSG_INVALID_CACHE_SIZE.format(max_size)
+            err = exception.create(ValueError, errmsg)
+            raise err
 
-        try:
-            action_type = actiontype.ACTION_MAP[action_key]
-        except KeyError as err:
-            msg = "action key ({0}) is unknown".format(action_key)
-            exception.add_message(err, msg)
-            raise
-        else:
-            return action_type, data
+        self._parser = parser
+        self._try_parse = functools.lru_cache(max_size)(self._try_parse_frozen)
+
+    @property
+    def hits(self):
+        return self._try_parse.cache_info().hits
+
+    @property
+    def misses(self):
+        return self._try_parse.cache_info().misses
+
+    @property
+    def size(self):
+        return self._try_parse.cache_info().currsize
+
+    def parse(self, string):
+        """
+        Parse a string, or return its cached result.
+
+        Raises
+        ------
+        KeyError, ValueError
+            As raised by the cached parser.
+        """
+        parsed = self.try_parse(string)
+        if not parsed.ok:
+            err = parsed.error.to_exception()
+            raise err
+        return parsed.value
+
+    def parse_many(self, strings):
+        """
+        Parse many strings with the cached parser, without the cache since
+        the columns hold no per-string result to share.
+        """
+        return self._parser.parse_many(strings)
+
+    def _try_parse_frozen(self, string):
+        """
+        Parse a string with the cached parser and freeze its value.
+        """
+        parsed = self._parser.try_parse(string)
+        return result.Result(_freeze(parsed.value), parsed.error)
+
+    def try_parse(self, string):
+        """
+        Parse a string, or return its cached result.
+        """
+        parsed = self._try_parse(string)
+        return result.Result(parsed.value, parsed.error)
 
 
 class BodyCompositionDataFlagParser(Parser):
@@ -60,9 +357,7 @@ class BodyCompositionDataFlagParser(Parser):
     Parses a string containing body composition data based on flags.
     """
 
-    _TOKEN_FLAG = '-'
-    _TOKEN_MASS = '^m'
-    _TOKEN_FAT = '^f'
+    _TOKENIZER = FlagTokenizer({"f": "fat_percentage", "m": "mass"})
 
     def parse(self, string):
         """
@@ -77,44 +372,65 @@ class BodyCompositionDataFlagParser(Parser):
             If mass or fat percentage is not a float.
             If a value for BodyCompositionData is missing.
         """
-        data = actiondata.BodyCompositionData()
-        params = string.split(self._TOKEN_FLAG)
+        parsed = self.try_parse(string)
+        if not parsed.ok:
+            err = parsed.error.to_exception()
+            raise err
+        return parsed.value
 
-        for param in params:
-            if re.match(self._TOKEN_MASS, param):
-                data.mass = re.sub(self._TOKEN_MASS, '', param)
-                data.mass = data.mass.strip()
-            elif re.match(self._TOKEN_FAT, param):
-                data.fat_percentage = re.sub(self._TOKEN_FAT, '', param)
-                data.fat_percentage = data.fat_percentage.strip()
+    def parse_many(self, strings):
+        """
+        Returns
+        -------
+        columns : powl.actiondata.BodyCompositionColumns
+            Mass and fat percentage of each string that was parsed.
+        errors : list of tuple of int, str
+            Index and error message of each string that failed to parse.
+        """
+        columns = actiondata.BodyCompositionColumns()
+        errors = []
+        for index, string in enumerate(strings):
+            parsed = self.try_parse(string)
+            if parsed.ok:
+                columns.append(index, float(parsed.value.mass),
+                               float(parsed.value.fat_percentage))
+            else:
+                errors.append((index, parsed.error.message))
+        return columns, errors
+
+    def try_parse(self, string):
+        """
+        Returns
+        -------
+        powl.result.Result
+            The powl.actiondata.BodyCompositionData, or an
+            ERROR_MISSING_VALUE or ERROR_INVALID_NUMBER error.
+        """
+        spans = {}
+        data = self._TOKENIZER.fill(string, actiondata.BodyCompositionData(),
+                                    spans)
 
         if not data.mass:
-            msg = "mass was not parsed from ({0})".format(string)
-            err = exception.create(ValueError, msg)
-            raise err
+            return result.failure(result.ERROR_MISSING_VALUE,
+                                  _ERRMSG_NOT_PARSED.format("mass", string))
 
         if not data.fat_percentage:
-            msg =("fat percentage was not parsed " +
-                  "from ({0})".format(string))
-            err = exception.create(ValueError, msg)
-            raise err
+            return result.failure(
+                result.ERROR_MISSING_VALUE,
+                _ERRMSG_NOT_PARSED.format("fat percentage", string))
 
-        try:
-            float(data.mass)
-        except ValueError as err:
-            msg = "mass ({0}) is not a number".format(data.mass)
-            exception.add_message(err, msg)
-            raise
-
-        try:
-            float(data.fat_percentage)
-        except ValueError as err:
-            msg = ("fat percentage ({0}) ".format(data.fat_percentage) +
-                   "is not a number")
-            exception.add_message(err, msg)
-            raise
+        if _to_float(data.mass) is None:
+            return result.failure(result.ERROR_INVALID_NUMBER,
+                                  _ERRMSG_MASS_NOT_NUMBER.format(data.mass),
+                                  spans.get("mass"))
 
-        return data
+        if _to_float(data.fat_percentage) is None:
+            return result.failure(
+                result.ERROR_INVALID_NUMBER,
+                _ERRMSG_FAT_PERCENTAGE_NOT_NUMBER.format(data.fat_percentage),
+                spans.get("fat_percentage"))
+
+        return result.success(data)
 
 
 class BodyCompositionDataPositionalParser(Parser):
@@ -141,33 +457,84 @@ class BodyCompositionDataPositionalParser(Parser):
             If mass or fat percentage is not a float.
             If a value for BodyCompositionData is missing.
         """
-        data = actiondata.BodyCompositionData()
+        parsed = self.try_parse(string)
+        if not parsed.ok:
+            err = parsed.error.to_exception()
+            raise err
+        return parsed.value
+
+    def parse_many(self, strings):
+        """
+        Returns
+        -------
+        columns : powl.actiondata.BodyCompositionColumns
+            Mass and fat percentage of each string that was parsed.
+        errors : list of tuple of int, str
+            Index and error message of each string that failed to parse.
+
+        Notes
+        -----
+        No data object is created and no exception is raised per string.
+        """
+        columns = actiondata.BodyCompositionColumns()
+        errors = []
+        split = re.compile(self._DELIMITER).split
+        for index, string in enumerate(strings):
+            params = split(string, self._MAX_SPLITS)
+            if len(params) < self._NUM_PARAMS:
+                errors.append(
+                    (index, _ERRMSG_NOT_ENOUGH_ARGUMENTS.format(string)))
+                continue
+
+            mass = params[self._POSITION_MASS]
+            fat_percentage = params[self._POSITION_FAT]
+            try:
+                mass_value = float(mass)
+            except ValueError:
+                errors.append((index, _ERRMSG_MASS_NOT_NUMBER.format(mass)))
+                continue
+            try:
+                fat_percentage_value = float(fat_percentage)
+            except ValueError:
+                errmsg = _ERRMSG_FAT_PERCENTAGE_NOT_NUMBER.format(
+                    fat_percentage)
+                errors.append((index, errmsg))
+                continue
+            columns.append(index, mass_value, fat_percentage_value)
+        return columns, errors
+
+    def try_parse(self, string):
+        """
+        Returns
+        -------
+        powl.result.Result
+            The powl.actiondata.BodyCompositionData, or an
+            ERROR_NOT_ENOUGH_ARGUMENTS or ERROR_INVALID_NUMBER error.
+        """
         params = re.split(self._DELIMITER, string, self._MAX_SPLITS)
 
         if len(params) < self._NUM_PARAMS:
-            msg = "not enough arguments from ({0})".format(string)
-            err = exception.create(ValueError, msg)
-            raise err
+            return result.failure(result.ERROR_NOT_ENOUGH_ARGUMENTS,
+                                  _ERRMSG_NOT_ENOUGH_ARGUMENTS.format(string))
 
         mass = params[self._POSITION_MASS]
         fat_percentage = params[self._POSITION_FAT]
 
-        try:
-            data.mass = float(mass)
-        except ValueError as err:
-            msg = "mass ({0}) is not a number".format(mass)
-            exception.add_message(err, msg)
-            raise
-
-        try:
-            data.fat_percentage = float(fat_percentage)
-        except ValueError as err:
-            msg =("fat percentage ({0}) ".format(fat_percentage) +
-                  "is not a number")
-            exception.add_message(err, msg)
-            raise
+        data = actiondata.BodyCompositionData()
+        data.mass = _to_float(mass)
+        if data.mass is None:
+            return result.failure(result.ERROR_INVALID_NUMBER,
+                                  _ERRMSG_MASS_NOT_NUMBER.format(mass),
+                                  _get_span(params, self._POSITION_MASS))
 
-        return data
+        data.fat_percentage = _to_float(fat_percentage)
+        if data.fat_percentage is None:
+            return result.failure(
+                result.ERROR_INVALID_NUMBER,
+                _ERRMSG_FAT_PERCENTAGE_NOT_NUMBER.format(fat_percentage),
+                _get_span(params, self._POSITION_FAT))
+
+        return result.success(data)
 
 
 class TransactionDataFlagParser(Parser):
@@ -176,11 +543,10 @@ class TransactionDataFlagParser(Parser):
     arguments.
     """
 
-    _TOKEN_FLAG = '-'
-    _TOKEN_DEBIT = '^d'
-    _TOKEN_CREDIT = '^c'
-    _TOKEN_AMOUNT = '^a'
-    _TOKEN_MEMO = '^m'
+    # Checked in this order for missing values.
+    _FIELDS = ("debit", "credit", "amount", "memo")
+    _TOKENIZER = FlagTokenizer({"a": "amount", "c": "credit", "d": "debit",
+                                "m": "memo"})
 
     def parse(self, string):
         """
@@ -195,52 +561,56 @@ class TransactionDataFlagParser(Parser):
             If amount is not a float.
             If a value for TransactionData is missing.
         """
-        data = actiondata.TransactionData()
-        params = string.split(self._TOKEN_FLAG)
-
-        for param in params:
-            if re.match(self._TOKEN_DEBIT, param):
-                data.debit = re.sub(self._TOKEN_DEBIT, '', param)
-                data.debit = data.debit.strip()
-            elif re.match(self._TOKEN_CREDIT, param):
-                data.credit = re.sub(self._TOKEN_CREDIT, '', param)
-                data.credit = data.credit.strip()
-            elif re.match(self._TOKEN_AMOUNT, param):
-                data.amount = re.sub(self._TOKEN_AMOUNT, '', param)
-                data.amount = data.amount.strip()
-            elif re.match(self._TOKEN_MEMO, param):
-                data.memo = re.sub(self._TOKEN_MEMO, '', param)
-                data.memo = data.memo.replace("\"", '')
-                data.memo = data.memo.strip()
-
-        if not data.debit:
-            msg = "debit is missing from ({0})".format(string)
-            err = exception.create(ValueError, msg)
-            raise err
-
-        if not data.credit:
-            msg = "credit is missing from ({0})".format(string)
-            err = exception.create(ValueError, msg)
+        parsed = self.try_parse(string)
+        if not parsed.ok:
+            err = parsed.error.to_exception()
             raise err
+        return parsed.value
 
-        if not data.amount:
-            msg = "amount is missing from ({0})".format(string)
-            err = exception.create(ValueError, msg)
-            raise err
+    def parse_many(self, strings):
+        """
+        Returns
+        -------
+        columns : powl.actiondata.TransactionColumns
+            Debit, credit, amount and memo of each string that was parsed.
+        errors : list of tuple of int, str
+            Index and error message of each string that failed to parse.
+        """
+        columns = actiondata.TransactionColumns()
+        errors = []
+        for index, string in enumerate(strings):
+            parsed = self.try_parse(string)
+            if parsed.ok:
+                data = parsed.value
+                columns.append(index, data.debit, data.credit,
+                               float(data.amount), data.memo)
+            else:
+                errors.append((index, parsed.error.message))
+        return columns, errors
+
+    def try_parse(self, string):
+        """
+        Returns
+        -------
+        powl.result.Result
+            The powl.actiondata.TransactionData, or an ERROR_MISSING_VALUE or
+            ERROR_INVALID_NUMBER error.
+        """
+        spans = {}
+        data = self._TOKENIZER.fill(string, actiondata.TransactionData(),
+                                    spans)
 
-        if not data.memo:
-            msg = "memo is missing from ({0})".format(string)
-            err = exception.create(ValueError, msg)
-            raise err
+        for field in self._FIELDS:
+            if not getattr(data, field):
+                return result.failure(result.ERROR_MISSING_VALUE,
+                                      _ERRMSG_MISSING.format(field, string))
 
-        try:
-            float(data.amount)
-        except ValueError as err:
-            message = "amount ({0}) is not a number".format(data.amount)
-            exception.add_message(err, message)
-            raise
+        if _to_float(data.amount) is None:
+            errmsg = _ERRMSG_AMOUNT_NOT_NUMBER.format(data.amount)
+            return result.failure(result.ERROR_INVALID_NUMBER, errmsg,
+                                  spans.get("amount"))
 
-        return data
+        return result.success(data)
 
 
 class TransactionDataPositionalParser(Parser):
@@ -270,25 +640,70 @@ class TransactionDataPositionalParser(Parser):
             If amount is not a float.
             If a value for TransactionData is missing.
         """
-        data = actiondata.TransactionData()
+        parsed = self.try_parse(string)
+        if not parsed.ok:
+            err = parsed.error.to_exception()
+            raise err
+        return parsed.value
+
+    def parse_many(self, strings):
+        """
+        Returns
+        -------
+        columns : powl.actiondata.TransactionColumns
+            Debit, credit, amount and memo of each string that was parsed.
+        errors : list of tuple of int, str
+            Index and error message of each string that failed to parse.
+
+        Notes
+        -----
+        No data object is created and no exception is raised per string.
+        """
+        columns = actiondata.TransactionColumns()
+        errors = []
+        for index, string in enumerate(strings):
+            params = string.split(self._DELIMITER, self._MAX_SPLITS)
+            if len(params) < self._NUM_PARAMS:
+                errors.append(
+                    (index, _ERRMSG_NOT_ENOUGH_ARGUMENTS.format(string)))
+                continue
+
+            amount = params[self._POSITION_AMOUNT]
+            try:
+                amount_value = float(amount)
+            except ValueError:
+                errors.append(
+                    (index, _ERRMSG_AMOUNT_NOT_NUMBER.format(amount)))
+                continue
+            columns.append(index, params[self._POSITION_DEBIT],
+                           params[self._POSITION_CREDIT], amount_value,
+                           params[self._POSITION_MEMO])
+        return columns, errors
+
+    def try_parse(self, string):
+        """
+        Returns
+        -------
+        powl.result.Result
+            The powl.actiondata.TransactionData, or an
+            ERROR_NOT_ENOUGH_ARGUMENTS or ERROR_INVALID_NUMBER error.
+        """
         params = string.split(self._DELIMITER, self._MAX_SPLITS)
 
         if len(params) < self._NUM_PARAMS:
-            msg = "not enough arguments from ({0})".format(string)
-            err = exception.create(ValueError, msg)
-            raise err
+            return result.failure(result.ERROR_NOT_ENOUGH_ARGUMENTS,
+                                  _ERRMSG_NOT_ENOUGH_ARGUMENTS.format(string))
+
+        amount = params[self._POSITION_AMOUNT]
+        if _to_float(amount) is None:
+            return result.failure(result.ERROR_INVALID_NUMBER,
+                                  _ERRMSG_AMOUNT_NOT_NUMBER.format(amount),
+                                  _get_span(params, self._POSITION_AMOUNT))
 
+        data = actiondata.TransactionData()
         data.debit = params[self._POSITION_DEBIT]
         data.credit = params[self._POSITION_CREDIT]
-        data.amount = params[self._POSITION_AMOUNT]
+        data.amount = amount
         data.memo = params[self._POSITION_MEMO]
-
-        try:
-            float(data.amount)
-        except ValueError:
-            msg = "amount ({0}) is not a number".format(data.amount)
-            err = exception.create(ValueError, msg)
-            raise err
-
-        return data
+        return result.success(data)
 
@@ -0,0 +1,165 @@
+"""Provides a trie that resolves keys by unambiguous prefixes."""
+from powl import exception
+
+_ERRMSG_AMBIGUOUS_KEY = "key ({0}) is ambiguous between {1}"
+_ERRMSG_UNKNOWN_KEY = "key ({0}) is unknown"
+
+# Value of a node whose keys map to more than one value.
+_AMBIGUOUS = object()
+# Exact value of a node no key ends at.
+_MISSING = object()
+
+
+class _Node(object):
+    """
+    A node of powl.prefixtrie.PrefixTrie.
+    """
+
+    __slots__ = ("children", "exact", "keys", "value", "values")
+
+    def __init__(self):
+        self.children = {}
+        # Value of the key ending at this node, if any.
+        self.exact = _MISSING
+        # Keys starting with the prefix of this node, in order.
+        self.keys = []
+        # Resolved value, or _AMBIGUOUS.
+        self.value = _AMBIGUOUS
+        # Distinct values of keys, only used while compiling.
+        self.values = []
+
+
+class PrefixTrie(object):
+    """
+    Resolves a key, or any prefix of keys that all map to one value, in one
+    walk of its characters, so lookups stay O(key length) however many keys
+    there are.
+
+    A key that is given exactly always resolves to its own value, even if
+    it is also the prefix of other keys.
+    """
+
+    def __init__(self, mapping):
+        """
+        Parameters
+        ----------
+        mapping : dict of str to object
+            Map of key to value. Several keys may map to one value.
+        """
+        self._root = _Node()
+        for key in sorted(mapping):
+            value = mapping[key]
+            node = self._root
+            self._add(node, key, value)
+            for character in key:
+                node = node.children.setdefault(character, _Node())
+                self._add(node, key, value)
+            node.exact = value
+        self._compile()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def _add(self, node, key, value):
+        """
+        Record a key and its value on a node along its path.
+        """
+        node.keys.append(key)
+        if value not in node.values:
+            node.values.append(value)
+
+    def _compile(self):
+        """
+        Resolve the value of every node.
+        """
+        nodes = [self._root]
+        while nodes:
+            node = nodes.pop()
+            if node.exact is not _MISSING:
+                node.value = node.exact
+            elif len(node.values) == 1:
+                node.value = node.values[0]
+            node.keys = tuple(node.keys)
+            node.values = None
+            nodes.extend(node.children.values())
+
+    def _find(self, prefix):
+        """
+        Return the node of a prefix, or None if no key starts with it or it
+        is empty, since an empty key is never meant as a prefix of all.
+        """
+        if not prefix:
+            return None
+        node = self._root
+        for character in prefix:
+            node = node.children.get(character)
+            if node is None:
+                return None
+        return node
+
+    def candidates(self, prefix):
+        """
+        Return the keys starting with a prefix.
+
+        Parameters
+        ----------
+        prefix : str
+
+        Returns
+        -------
+        tuple of str
+            Keys in sorted order, empty if none starts with prefix.
+        """
+        node = self._find(prefix)
+        return node.keys if node is not None else ()
+
+    def get(self, key, default=None):
+        """
+        Return the value of a key or of an unambiguous prefix.
+
+        Parameters
+        ----------
+        key : str
+            Key or prefix of keys.
+        default : object
+            Returned if the key is unknown or ambiguous.
+
+        Returns
+        -------
+        object
+        """
+        node = self._find(key)
+        if node is None or node.value is _AMBIGUOUS:
+            return default
+        return node.value
+
+    def resolve(self, key):
+        """
+        Return the value of a key or of an unambiguous prefix.
+
+        Parameters
+        ----------
+        key : str
+            Key or prefix of keys.
+
+        Returns
+        -------
+        object
+
+        Raises
+        ------
+        KeyError
+            If no key starts with key.
+            If key is the prefix of keys mapping to different values, with
+            the candidate keys in the message.
+        """
+        node = self._find(key)
+        if node is None:
+            errmsg = _ERRMSG_UNKNOWN_KEY.format(key)
+            err = exception.create(KeyError, errmsg)
+            raise err
+        if node.value is _AMBIGUOUS:
+            errmsg = _ERRMSG_AMBIGUOUS_KEY.format(key, ", ".join(node.keys))
+            err = exception.create(KeyError, errmsg)
+            raise err
+        return node.value
@@ -0,0 +1,113 @@
+"""Provides results that report a failure without raising an exception."""
+from powl import exception
+
+# Error codes.
+ERROR_ACTION_FAILED = "action failed"
+ERROR_AMBIGUOUS_ACTION = "ambiguous action"
+ERROR_INVALID_NUMBER = "invalid number"
+ERROR_MISSING_VALUE = "missing value"
+ERROR_NOT_ENOUGH_ARGUMENTS = "not enough arguments"
+ERROR_UNKNOWN_ACTION = "unknown action"
+
+# Maps error codes to the exception raised for them. Others are ValueError.
+_EXCEPTION_TYPES = {
+    ERROR_AMBIGUOUS_ACTION: KeyError,
+    ERROR_UNKNOWN_ACTION: KeyError
+}
+
+
+class Error(object):
+    """
+    Describes why an input could not be parsed or performed.
+
+    Attributes
+    ----------
+    code : str
+        Category of the error, one of the ERROR_ codes.
+    message : str
+        Error message, the same as the raising methods embed.
+    span : tuple of int, int or None
+        Start and end offsets of the offending text in the input, or None
+        if it cannot be located.
+    exception : Exception or None
+        Exception that caused the error, if one was raised.
+    """
+
+    __slots__ = ("code", "message", "span", "exception")
+
+    def __init__(self, code, message, span=None, exception=None):
+        self.code = code
+        self.message = message
+        self.span = span
+        self.exception = exception
+
+    def to_exception(self):
+        """
+        Return the exception the raising methods raise for this error, with
+        the message embedded.
+        """
+        exception_type = _EXCEPTION_TYPES.get(self.code, ValueError)
+        return exception.create(exception_type, self.message)
+
+
+class Result(object):
+    """
+    Either the value of a successful operation or its error.
+
+    Attributes
+    ----------
+    value : object
+        The value, or None on failure.
+    error : powl.result.Error or None
+        The error, or None on success.
+    """
+
+    __slots__ = ("value", "error")
+
+    def __init__(self, value=None, error=None):
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        """
+        Whether the operation succeeded.
+        """
+        return self.error is None
+
+
+def failure(code, message, span=None, exception=None):
+    """
+    Return a failed powl.result.Result.
+
+    Parameters
+    ----------
+    code : str
+        Category of the error, one of the ERROR_ codes.
+    message : str
+        Error message.
+    span : tuple of int, int
+        Optional start and end offsets of the offending text in the input.
+    exception : Exception
+        Optional exception that caused the error.
+
+    Returns
+    -------
+    powl.result.Result
+    """
+    return Result(error=Error(code, message, span, exception))
+
+
+def success(value):
+    """
+    Return a successful powl.result.Result.
+
+    Parameters
+    ----------
+    value : object
+
+    Returns
+    -------
+    powl.result.Result
+    """
+    return Result(value)
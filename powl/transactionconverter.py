@@ -2,6 +2,7 @@
 import textwrap
 import time
 from powl import exception
+from powl import prefixtrie
 
 class TransactionConverter(object):
     """
@@ -61,6 +62,9 @@ class QifConverter(TransactionConverter):
         For example "ent" can map to "Expenses:Entertainment" and
         "entertainment" can also map to "Expenses:Entertainment".
 
+        convert also accepts any unambiguous prefix of an account key, such
+        as "util" for "utilities".
+
         Raises
         ------
         ValueError
@@ -75,10 +79,11 @@ class QifConverter(TransactionConverter):
         self._revenues = revenues
         self._expenses = expenses
 
-        self._accounts = dict(self._assets.items() +
-                              self._liabilities.items() +
-                              self._revenues.items() +
-                              self._expenses.items())
+        self._accounts = {}
+        for accounts in (assets, liabilities, revenues, expenses):
+            self._accounts.update(accounts)
+        self._account_keys = prefixtrie.PrefixTrie(
+            dict((key, key) for key in self._accounts))
 
         for key, value in self._files.items():
             if key not in self._accounts.keys():
@@ -112,11 +117,18 @@ class QifConverter(TransactionConverter):
         qif_file : powl.filesystem.File
             The QIF file to output to.
 
+        Raises
+        ------
+        KeyError
+            If debit or credit is the prefix of several account keys.
+
         Notes
         -----
         Since it depends which QIF file records the transaction, the return
         value also contains the file to write to.
         """
+        debit = self._resolve_account_key(debit)
+        credit = self._resolve_account_key(credit)
         qif_date = self._format_date(date)
         qif_transfer = self._get_transfer_account(debit, credit)
         qif_amount = self._format_amount(debit, amount)
@@ -352,3 +364,18 @@ class QifConverter(TransactionConverter):
         self._log.debug("   amount:   %s", amount)
         self._log.debug("   memo:     %s", memo)
 
+    def _resolve_account_key(self, key):
+        """
+        Return the account key that key is or is the unambiguous prefix of.
+        A key that no account key starts with is returned as is, for the
+        lookups that need it to report it.
+
+        Raises
+        ------
+        KeyError
+            If key is the prefix of several account keys, with the
+            candidate keys in the message.
+        """
+        if not self._account_keys.candidates(key):
+            return key
+        return self._account_keys.resolve(key)
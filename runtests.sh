@@ -8,16 +8,41 @@ echo "powl.actionretriever"
 echo "--------------------"
 python test/small/test_actionretriever.py
 
+echo "\n"
+echo "powl.asyncmail"
+echo "--------------"
+python test/small/test_asyncmail.py
+
 echo "\n"
 echo "powl.exception"
 echo "--------------"
 python test/small/test_exception.py
 
+echo "\n"
+echo "powl.mail"
+echo "---------"
+python test/small/test_mail.py
+
+echo "\n"
+echo "powl.messagecache"
+echo "-----------------"
+python test/small/test_messagecache.py
+
+echo "\n"
+echo "powl.messageindex"
+echo "-----------------"
+python test/small/test_messageindex.py
+
 echo "\n"
 echo "powl.parser"
 echo "-----------"
 python test/small/test_parser.py
 
+echo "\n"
+echo "powl.prefixtrie"
+echo "---------------"
+python test/small/test_prefixtrie.py
+
 echo "\n"
 echo "powl.transactionconverter"
 echo "-------------------------"
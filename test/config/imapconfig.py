@@ -0,0 +1,26 @@
+# Server Address
+server = "<enter server here>"
+
+# Email Address
+user = "<enter user here>"
+
+# Email Password
+password = "<enter password here>"
+
+# Mailbox folder
+mailbox = "<enter mailbox here>"
+
+# Timeout in seconds
+timeout = 1
+
+# Server that is not an IMAP server
+not_imap_server = "<enter not imap server here>"
+
+# Expected emails (order does not matter)
+# list of date, body
+#  date: str as YYYY-MM-DDTHH::MM (must be unique in list)
+#  body: str as plain text
+expected_emails = [
+    ("YYYY-MM-DDTHH:MM", "body"),
+    ("2014-12-31T15:30", "hello"),
+]
@@ -1,4 +1,5 @@
 """Provides mock objects for powl.action."""
+from powl import result
 
 class MockAction(object):
     """
@@ -21,3 +22,7 @@ class MockAction(object):
         self._do_string = string
         self._do_date = date
 
+    def try_do(self, string, date):
+        self.do(string, date)
+        return result.success(None)
+
@@ -1,36 +1,45 @@
 """Provides mock objects for powl.actionretriever."""
-from powl import actionretriver
 
-class MockMail(actionretriver.Mail):
+class MockActionItemRetriever(object):
     """
-    Provides a mock object for powl.actionretriver.Mail.
+    Provides a mock object for powl.actionretriever.ActionItemRetriever.
     """
 
-    def __init(self, server, user, password, messages):
+    def __init__(self, action_items, error=None):
         """
         Parameters
         ----------
-        server : str
-        user : str
-        password : str
-        messages
+        action_items : list of tuple of str, time.struct_time
+            Action items and their dates to retrieve.
+        error : Exception
+            Raised after every action item has been retrieved.
         """
-        self._server = server
-        self._user = user
-        self._password = password
-        self._message = messages
-        self._connected = False
+        self._action_items = action_items
+        self._error = error
+        self.retrieved_count = 0
+        self.acknowledged = []
+        self.performed = []
+        self.wait_timeouts = []
+        self.poll_intervals = []
 
-    # powl.actionretriever.Mail methods.
-    def connect(self, server):
-        pass
+    # powl.actionretriever.ActionItemRetriever methods.
+    def acknowledge(self, action_items):
+        self.acknowledged.extend(action_items)
 
-    def login(self, user, password):
-        pass
+    def get_action_items(self):
+        return list(self.iter_action_items())
 
-    def get_message_id_list(self):
-        pass
+    def iter_action_items(self):
+        for action_item in self._action_items:
+            self.retrieved_count += 1
+            yield action_item
+        if self._error:
+            raise self._error
 
-    def get_message_and_date(self, message_id):
-        pass
+    def mark_performed(self, action_item):
+        self.performed.append(action_item)
 
+    def wait(self, timeout, poll_interval=None):
+        self.wait_timeouts.append(timeout)
+        self.poll_intervals.append(poll_interval)
+        return True
@@ -0,0 +1,116 @@
+"""Provides a mock IMAP server for powl.asyncmail."""
+import asyncio
+from test.mock import imap as mock_imap
+
+
+class MockImapServer(object):
+    """
+    Serves the messages of a test.mock.imap.MockImap over an asyncio
+    stream without SSL.
+    """
+
+    def __init__(self, messages, password="password", fetch_delay=0):
+        """
+        Parameters
+        ----------
+        messages : dict of int to bytes
+            Map of message UID to raw RFC822 message.
+        password : str
+            Only password accepted by LOGIN.
+        fetch_delay : float
+            Seconds waited before each message of a FETCH response.
+        """
+        self._messages = messages
+        self._password = password
+        self._fetch_delay = fetch_delay
+        self._server = None
+        self.connections = 0
+        self.imaps = []
+        self.max_connections = 0
+        self._open_connections = 0
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._open_connections += 1
+        self.max_connections = max(self.max_connections,
+                                   self._open_connections)
+        imap = mock_imap.MockImap(self._messages)
+        self.imaps.append(imap)
+        writer.write(b"* OK mock ready\r\n")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                tag, command = line.decode("ascii").rstrip("\r\n").split(" ", 1)
+                # Give other connections a chance to run.
+                await asyncio.sleep(0.01)
+                if not await self._respond(imap, writer, tag, command):
+                    break
+                await writer.drain()
+        finally:
+            self._open_connections -= 1
+            writer.close()
+
+    async def _respond(self, imap, writer, tag, command):
+        """
+        Write the response to a command. Return False on LOGOUT.
+        """
+        name, _, args = command.partition(" ")
+        name = name.upper()
+        if name == "LOGIN":
+            user, password = [a.strip('"') for a in args.split(" ")]
+            status = "OK" if password == self._password else "NO"
+            writer.write("{0} {1} LOGIN\r\n".format(tag, status).encode())
+        elif name == "SELECT":
+            writer.write(b"* 5 EXISTS\r\n")
+            writer.write(b"* OK [UIDVALIDITY 9] UIDs valid\r\n")
+            writer.write("{0} OK SELECT\r\n".format(tag).encode())
+        elif name == "UID" and args.upper().startswith("SEARCH"):
+            result, response = imap.uid("SEARCH", args.split(" ", 1)[1])
+            writer.write(b"* SEARCH " + response[0] + b"\r\n")
+            writer.write("{0} OK SEARCH\r\n".format(tag).encode())
+        elif name == "UID" and args.upper().startswith("FETCH"):
+            message_set, parts = args.split(" ", 2)[1:]
+            result, response = imap.uid("FETCH", message_set, parts)
+            await self._write_fetch_response(writer, response)
+            writer.write("{0} OK FETCH\r\n".format(tag).encode())
+        elif name == "UID" and args.upper().startswith("STORE"):
+            message_set, operation, flags = args.split(" ", 3)[1:]
+            imap.uid("STORE", message_set, operation, flags)
+            writer.write("{0} OK STORE\r\n".format(tag).encode())
+        elif name == "LOGOUT":
+            writer.write(b"* BYE\r\n")
+            writer.write("{0} OK LOGOUT\r\n".format(tag).encode())
+            return False
+        else:
+            writer.write("{0} BAD unknown\r\n".format(tag).encode())
+        return True
+
+    async def _write_fetch_response(self, writer, response):
+        """
+        Write a FETCH response given in the form imaplib returns.
+        """
+        line_start = True
+        for part in response:
+            text, literal = part if isinstance(part, tuple) else (part, None)
+            if line_start:
+                await writer.drain()
+                await asyncio.sleep(self._fetch_delay)
+                sequence_number, rest = text.split(b" ", 1)
+                text = b"* " + sequence_number + b" FETCH " + rest
+            writer.write(text + b"\r\n")
+            if literal is not None:
+                writer.write(literal)
+            line_start = literal is None
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
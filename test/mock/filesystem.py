@@ -27,6 +27,10 @@ class MockFile(object):
     def append_line_data(self, value):
         self._append_line_data = value
 
+    @property
+    def write_data(self):
+        return self._write_data
+
     # powl.filesystem.File methods
     def __init__(self, path, filename):
         self._path = path
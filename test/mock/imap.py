@@ -0,0 +1,356 @@
+"""Provides mock objects for imaplib."""
+import email
+import imaplib
+import re
+import socket
+
+_CHANGED_SINCE = re.compile(r"CHANGEDSINCE (\d+)")
+_SECTION_PART = re.compile(r"BODY\.PEEK\[([\d.]+)\]")
+_TRUNCATED_TEXT_PART = re.compile(r"BODY\.PEEK\[TEXT\]<0\.(\d+)>")
+_UID_CRITERIA = re.compile(r"UID (\d+):\*")
+_UNSEEN_CRITERIA = re.compile(r"\bUNSEEN\b", re.IGNORECASE)
+
+
+def _body_structure(message):
+    """
+    Return the BODYSTRUCTURE of an email.message.Message.
+    """
+    if message.is_multipart():
+        parts = "".join(_body_structure(p) for p in message.get_payload())
+        return '({0} "{1}")'.format(parts,
+                                    message.get_content_subtype().upper())
+
+    charset = message.get_content_charset()
+    if charset:
+        params = '("CHARSET" "{0}")'.format(charset)
+    else:
+        params = "NIL"
+    encoding = message.get("Content-Transfer-Encoding", "7BIT").upper()
+    payload = message.get_payload()
+    if message.get_content_maintype() == "text":
+        # Text parts have their line count before the extension data.
+        size = "{0} {1}".format(len(payload), len(payload.splitlines()))
+    else:
+        size = str(len(payload))
+    disposition = message.get_content_disposition()
+    if disposition:
+        filename = message.get_filename()
+        disposition = '("{0}" {1})'.format(
+            disposition.upper(),
+            '("FILENAME" "{0}")'.format(filename) if filename else "NIL")
+    else:
+        disposition = "NIL"
+    return '("{0}" "{1}" {2} NIL NIL "{3}" {4} NIL {5})'.format(
+        message.get_content_maintype().upper(),
+        message.get_content_subtype().upper(),
+        params,
+        encoding,
+        size,
+        disposition)
+
+
+def _get_section(message, section):
+    """
+    Return the raw payload of a section such as "1.2" of a message.
+    """
+    part = message
+    for index in section.split("."):
+        if part.is_multipart():
+            part = part.get_payload(int(index) - 1)
+    if part.get("Content-Transfer-Encoding", "").lower() == "8bit":
+        # The raw bytes, which get_payload would decode by the charset.
+        return part.get_payload(decode=True)
+    return part.get_payload().encode("ascii")
+
+
+def _parse_message_set(message_set, last_id):
+    """
+    Return the list of ids in an IMAP message set such as "1:3,5".
+    """
+    ids = []
+    for part in message_set.split(","):
+        if ":" in part:
+            start, stop = part.split(":")
+            stop = last_id if stop == "*" else int(stop)
+            ids.extend(range(int(start), stop + 1))
+        else:
+            ids.append(int(part))
+    return ids
+
+
+class MockImap(object):
+    """
+    Provides a mock object for imaplib.IMAP4_SSL.
+    """
+
+    def __init__(self, messages, uidvalidity=1, capabilities=(),
+                 modseq=None):
+        """
+        Parameters
+        ----------
+        messages : dict of int to bytes
+            Map of message UID to raw RFC822 message.
+        uidvalidity : int
+            UIDVALIDITY reported when the mailbox is selected or by STATUS.
+        capabilities : tuple of str
+            Capabilities reported after login.
+        modseq : int
+            HIGHESTMODSEQ reported when the mailbox is selected with
+            CONDSTORE or by STATUS, and MODSEQ of the messages not in
+            modseqs.
+        """
+        self._messages = messages
+        self._responses = {}
+        self.uidvalidity = uidvalidity
+        self.capabilities = capabilities
+        self.modseq = modseq
+        self.modseqs = {}
+        self.alive = True
+        self.idle_responses = []
+        self.command_responses = []
+        self.fetch_responses = []
+        self.untagged_responses = {}
+        self.sock = None
+        self._peer = None
+        self._lines = []
+        self._idle_tag = None
+        self.commands = []
+        self.flags = dict((i, set()) for i in messages)
+        self.literal_bytes = 0
+        self.mailboxes = set(["archive"])
+        self.copied = {}
+        self.expunged = []
+
+    def _fetch_items(self, message_id, message_parts):
+        """
+        Return a list of (name, value, is_literal) for a FETCH.
+        """
+        raw = self._messages[message_id]
+        message = email.message_from_bytes(raw)
+        items = []
+        if message_parts == "(RFC822)":
+            self.flags[message_id].add("\\Seen")
+            items.append(("RFC822", raw, True))
+        if message_parts == "(BODY.PEEK[])":
+            items.append(("BODY[]", raw, True))
+        if "RFC822.SIZE" in message_parts:
+            items.append(("RFC822.SIZE", len(raw), False))
+        if "BODY.PEEK[HEADER]" in message_parts:
+            header, separator, text = raw.partition(b"\r\n\r\n")
+            items.append(("BODY[HEADER]", header + separator, True))
+            match = _TRUNCATED_TEXT_PART.search(message_parts)
+            items.append(("BODY[TEXT]<0>", text[:int(match.group(1))], True))
+        if "BODYSTRUCTURE" in message_parts:
+            items.append(("BODYSTRUCTURE", _body_structure(message), False))
+        if "HEADER.FIELDS (DATE MESSAGE-ID)" in message_parts:
+            header = ""
+            for name in ("Date", "Message-ID"):
+                if message[name]:
+                    header += "{0}: {1}\r\n".format(name, message[name])
+            items.append(("BODY[HEADER.FIELDS (DATE MESSAGE-ID)]",
+                          (header + "\r\n").encode("ascii"), True))
+        for section in _SECTION_PART.findall(message_parts):
+            items.append(("BODY[{0}]".format(section),
+                          _get_section(message, section), True))
+        return items
+
+    def _fetch(self, message_set, message_parts, modifiers=""):
+        response = []
+        uids = sorted(self._messages)
+        changed_since = _CHANGED_SINCE.search(modifiers)
+        for message_id in _parse_message_set(message_set, self._last_id()):
+            if message_id not in self._messages:
+                continue
+            modseq = self.modseqs.get(message_id, self.modseq or 0)
+            if changed_since and modseq <= int(changed_since.group(1)):
+                continue
+            sequence_number = uids.index(message_id) + 1
+            pending = "{0} (UID {1}".format(sequence_number, message_id)
+            separator = " "
+            for name, value, is_literal in self._fetch_items(message_id,
+                                                             message_parts):
+                if is_literal:
+                    pending += "{0}{1} {{{2}}}".format(separator, name,
+                                                       len(value))
+                    response.append((pending.encode("ascii"), value))
+                    self.literal_bytes += len(value)
+                    pending = ""
+                else:
+                    pending += "{0}{1} {2}".format(separator, name, value)
+                separator = " "
+            if changed_since:
+                pending += " MODSEQ ({0})".format(modseq)
+            response.append((pending + ")").encode("ascii"))
+        response.extend(self.fetch_responses)
+        return "OK", response
+
+    def _execute(self, command):
+        """
+        Execute a pipelined command and return its status.
+        """
+        if command == "EXPUNGE":
+            self._expunge(sorted(self._messages))
+            return "OK"
+        if command.startswith("UID EXPUNGE "):
+            self._expunge(_parse_message_set(command.split(" ", 2)[2],
+                                             self._last_id()))
+            return "OK"
+        uid, name, message_set, args = command.split(" ", 3)
+        message_ids = [i for i in _parse_message_set(message_set,
+                                                     self._last_id())
+                       if i in self._messages]
+        if name == "STORE":
+            operation, flags = args.split(" ", 1)
+            self._store(message_set, operation, flags)
+            return "OK"
+        mailbox = args.strip('"')
+        if mailbox not in self.mailboxes:
+            return "NO"
+        self.copied.setdefault(mailbox, []).extend(message_ids)
+        if name == "MOVE":
+            for message_id in message_ids:
+                del self._messages[message_id]
+                del self.flags[message_id]
+        return "OK"
+
+    def _expunge(self, message_ids):
+        """
+        Remove the given messages that are flagged as deleted.
+        """
+        for message_id in message_ids:
+            if "\\Deleted" in self.flags.get(message_id, ()):
+                self.expunged.append(message_id)
+                del self._messages[message_id]
+                del self.flags[message_id]
+
+    def _last_id(self):
+        return max(self._messages) if self._messages else 0
+
+    def _push_line(self, line):
+        """
+        Queue a line for readline and make the socket readable.
+        """
+        if self.sock is None:
+            self.sock, self._peer = socket.socketpair()
+        self._lines.append(line)
+        self._peer.send(b"x")
+
+    def _search(self, criteria):
+        match = _UID_CRITERIA.search(criteria)
+        first_uid = int(match.group(1)) if match else 1
+        uids = [i for i in sorted(self._messages) if i >= first_uid]
+        if _UNSEEN_CRITERIA.search(criteria):
+            uids = [i for i in uids if "\\Seen" not in self.flags[i]]
+        if match and not uids and self._messages:
+            # "n:*" always matches the highest UID.
+            uids = [self._last_id()]
+        ids = " ".join(str(i) for i in uids)
+        return "OK", [ids.encode("ascii")]
+
+    def _store(self, message_set, command, flags):
+        for message_id in _parse_message_set(message_set, self._last_id()):
+            if message_id in self.flags:
+                self.flags[message_id].add(flags.strip("()"))
+        return "OK", []
+
+    # imaplib.IMAP4 methods.
+    def capability(self):
+        self.commands.append(("CAPABILITY",))
+        capabilities = " ".join(("IMAP4rev1",) + tuple(self.capabilities))
+        return "OK", [capabilities.encode("ascii")]
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self._peer.close()
+
+    def login(self, user, password):
+        self.commands.append(("LOGIN", user))
+        return "OK", [b"Logged in"]
+
+    def logout(self):
+        self.commands.append(("LOGOUT",))
+        self.close()
+        return "BYE", [b"Logging out"]
+
+    def noop(self):
+        self.commands.append(("NOOP",))
+        if not self.alive:
+            raise imaplib.IMAP4.abort("socket error: EOF")
+        return "OK", [b"NOOP completed"]
+
+    def readline(self):
+        self.sock.recv(1)
+        return self._lines.pop(0)
+
+    def response(self, code):
+        return code, [self._responses.pop(code, None)]
+
+    def select(self, mailbox):
+        self.commands.append(("SELECT", mailbox))
+        self._responses["UIDVALIDITY"] = str(self.uidvalidity).encode("ascii")
+        if mailbox.endswith("(CONDSTORE)") and self.modseq is not None:
+            modseq = str(self.modseq).encode("ascii")
+            self._responses["HIGHESTMODSEQ"] = modseq
+        count = str(len(self._messages)).encode("ascii")
+        return "OK", [count]
+
+    def send(self, data):
+        self.commands.append(("SEND", data))
+        line = data.decode("ascii").strip()
+        if line.endswith(" IDLE"):
+            self._idle_tag = line.split()[0]
+            self._push_line(b"+ idling\r\n")
+            for response in self.idle_responses:
+                self._push_line(response)
+            self.idle_responses = []
+        elif line == "DONE":
+            done = "{0} OK IDLE terminated\r\n".format(self._idle_tag)
+            self._push_line(done.encode("ascii"))
+        else:
+            for command in line.splitlines():
+                tag, command = command.split(" ", 1)
+                if command.startswith("STATUS "):
+                    mailbox, names = command[7:].split(" ", 1)
+                    status, response = self.status(mailbox.strip('"'), names)
+                    if status == "OK":
+                        self._push_line(b"* STATUS " + response[0] + b"\r\n")
+                else:
+                    status = self._execute(command)
+                for response in self.command_responses:
+                    self._push_line(response)
+                self.command_responses = []
+                response = "{0} {1} {2}\r\n".format(tag, status, command)
+                self._push_line(response.encode("ascii"))
+
+    def status(self, mailbox, names):
+        self.commands.append(("STATUS", mailbox, names))
+        if mailbox != "inbox" and mailbox not in self.mailboxes:
+            return "NO", [b"mailbox does not exist"]
+        values = {
+            "HIGHESTMODSEQ": self.modseq,
+            "UIDNEXT": self._last_id() + 1,
+            "UIDVALIDITY": self.uidvalidity,
+            "UNSEEN": len([i for i in self.flags
+                           if "\\Seen" not in self.flags[i]])}
+        items = ["{0} {1}".format(name, values[name])
+                 for name in names.strip("()").split()
+                 if values.get(name) is not None]
+        status = '"{0}" ({1})'.format(mailbox, " ".join(items))
+        return "OK", [status.encode("ascii")]
+
+    def uid(self, command, *args):
+        self.commands.append(("UID " + command,) + args)
+        if not self.alive:
+            raise imaplib.IMAP4.abort("socket error: EOF")
+        if command == "FETCH":
+            return self._fetch(*args)
+        elif command == "SEARCH":
+            return self._search(args[-1])
+        elif command == "STORE":
+            return self._store(*args)
+        return "BAD", [b"unknown command"]
+
+    def xatom(self, name, *args):
+        self.commands.append((name,) + args)
+        return "OK", [b"completed"]
@@ -1,10 +1,14 @@
 """Provides mock objects for powl.log."""
+import logging
 
 class MockLog(object):
     """
     Provides a mock null object for powl.log.Log.
     """
 
+    def __init__(self, level=logging.INFO):
+        self._level = level
+
     def critical(self, message, *args, **kwargs):
         pass
 
@@ -17,6 +21,9 @@ class MockLog(object):
     def info(self, message, *args, **kwargs):
         pass
 
+    def is_enabled_for(self, level):
+        return level >= self._level
+
     def warning(self, message, *args, **kwargs):
         pass
 
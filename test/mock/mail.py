@@ -0,0 +1,56 @@
+"""Provides mock objects for powl.mail."""
+
+
+class MockMail(object):
+    """
+    Provides a mock object for powl.mail.Mail.
+    """
+
+    def __init__(self, messages, error=None):
+        """
+        Parameters
+        ----------
+        messages : list of powl.mail.MailMessage
+            Messages returned by get_messages.
+        error : Exception
+            Raised by idle, and by iter_messages after every message.
+        """
+        self._messages = messages
+        self.error = error
+        self.close_count = 0
+        self.connect_count = 0
+        self.idle_timeouts = []
+        self.poll_intervals = []
+        self.acknowledged = []
+
+    # powl.mail.Mail methods.
+    def acknowledge(self, messages):
+        self.acknowledged.extend(messages)
+
+    def close(self):
+        self.close_count += 1
+
+    def connect(self, server):
+        self.connect_count += 1
+
+    def get_messages(self):
+        return list(self._messages)
+
+    def idle(self, timeout, poll_interval=None):
+        self.idle_timeouts.append(timeout)
+        self.poll_intervals.append(poll_interval)
+        if self.error:
+            raise self.error
+        return True
+
+    def iter_messages(self):
+        for message in self._messages:
+            yield message
+        if self.error:
+            raise self.error
+
+    def login(self, user, password):
+        pass
+
+    def mark_seen(self, messages):
+        pass
@@ -1,4 +1,5 @@
 """Provides mock objects for powl.parse."""
+from powl import result
 
 class MockParser(object):
 
@@ -27,3 +28,6 @@ class MockParser(object):
         self._parse_string = string
         return self._parse_retval
 
+    def try_parse(self, string):
+        return result.success(self.parse(string))
+
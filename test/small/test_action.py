@@ -6,9 +6,72 @@ import unittest
 from powl import action
 from powl import actiontype
 from powl import exception
+from powl import parser
+from powl import result
 from test.mock import action as mock_action
 from test.mock import log as mock_log
 
+class _FailingAction(action.Action):
+    """
+    Action that raises an IOError.
+    """
+
+    def __init__(self):
+        self.error = IOError("disk full")
+
+    def do(self, string, date):
+        raise self.error
+
+
+class _CountingParser(parser.TransactionDataPositionalParser):
+    """
+    Counts the calls to try_parse.
+    """
+
+    def __init__(self):
+        self.try_parse_count = 0
+
+    def try_parse(self, string):
+        self.try_parse_count += 1
+        return parser.TransactionDataPositionalParser.try_parse(self, string)
+
+
+class TestActionParser(unittest.TestCase):
+    """
+    Class for testing the ActionParser.
+    """
+
+    def setUp(self):
+        self._data_parser = _CountingParser()
+        self._action_manager = action.ActionManager(mock_log.MockLog())
+        self._action_manager.add_action(
+            actiontype.TRANSACTION,
+            action.TransactionAction(mock_log.MockLog(), self._data_parser,
+                                     None))
+        self._parser = action.ActionParser(parser.ActionItemParser(),
+                                           self._action_manager)
+
+    def test__try_parse__parses_data(self):
+        parsed = self._parser.try_parse("a 4.50 mis ca coffee")
+        action_type, action_data, data = parsed.value
+        self.assertEqual(actiontype.TRANSACTION, action_type)
+        self.assertEqual("4.50 mis ca coffee", action_data)
+        self.assertEqual("coffee", data.memo)
+
+    def test__try_parse__cached_skips_data_parser(self):
+        cached = parser.CachingParser(self._parser)
+        first = cached.try_parse("a 4.50 mis ca coffee")
+        second = cached.try_parse("a 4.50 mis ca coffee")
+
+        self.assertEqual(1, self._data_parser.try_parse_count)
+        self.assertEqual("coffee", second.value[2].memo)
+        self.assertIs(first.value[2], second.value[2])
+
+    def test__try_parse__invalid_data(self):
+        parsed = self._parser.try_parse("a 4.5b mis ca coffee")
+        self.assertEqual(result.ERROR_INVALID_NUMBER, parsed.error.code)
+
+
 class TestActionManager(unittest.TestCase):
     """
     Class for testing the ActionManager.
@@ -45,6 +108,35 @@ class TestActionManager(unittest.TestCase):
         actual_message = exception.get_message(context.exception)
         self.assertEqual(expected_message, actual_message)
 
+    def test__try_do_action__action_type_unknown(self):
+        done = self._action_manager.try_do_action("unknown", "data",
+                                                  time.localtime())
+        self.assertFalse(done.ok)
+        self.assertEqual(result.ERROR_UNKNOWN_ACTION, done.error.code)
+        self.assertEqual("action type (unknown) is unknown",
+                         done.error.message)
+
+    def test__try_do_action__action_raises(self):
+        failing_action = _FailingAction()
+        self._action_manager.add_action("failing", failing_action)
+
+        done = self._action_manager.try_do_action("failing", "data",
+                                                  time.localtime())
+        self.assertEqual(result.ERROR_ACTION_FAILED, done.error.code)
+        self.assertEqual("disk full", done.error.message)
+        self.assertIs(failing_action.error, done.error.exception)
+
+    def test__try_do_action__invalid_data_is_not_raised(self):
+        # The converter is never reached.
+        transaction = action.TransactionAction(
+            self._log, parser.TransactionDataPositionalParser(), None)
+        self._action_manager.add_action(actiontype.TRANSACTION, transaction)
+
+        done = self._action_manager.try_do_action(
+            actiontype.TRANSACTION, "5b mis ca coffee", time.localtime())
+        self.assertEqual(result.ERROR_INVALID_NUMBER, done.error.code)
+        self.assertIsNone(done.error.exception)
+
 if __name__ == '__main__':
     unittest.main()
 
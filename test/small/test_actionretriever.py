@@ -1,8 +1,17 @@
 #!/usr/bin/env python
 """Tests for powl.actionretriever."""
+import email
+import imaplib
+import os
+import shutil
+import tempfile
 import unittest
 from powl import actionretriever
 from powl import exception
+from powl import mail
+from powl import messageindex
+from test.mock import imap as mock_imap
+from test.mock import mail as mock_mail
 
 class MailRetrieverTest(unittest.TestCase):
 
@@ -186,6 +195,267 @@ class MailRetrieverTest(unittest.TestCase):
 #        return self.config_server, self.config_address, self.config_password, self.config_mailbox
 
 
+class MailRetrieverSessionTest(unittest.TestCase):
+
+    def setUp(self):
+        message = mail.MailMessage(email.message_from_string(
+            "Date: Tue, 1 Sep 2015 08:30:00 -0000\n\nn note"))
+        self._mail = mock_mail.MockMail([message])
+        self._retriever = actionretriever.MailRetriever(
+            self._mail, "mail.test.com", "test@test.com", "mockpassword")
+
+    def test__acknowledge__only_given_items(self):
+        second = mail.MailMessage(email.message_from_string(
+            "Date: Wed, 2 Sep 2015 08:30:00 -0000\n\nn second"), 2)
+        self._mail._messages.append(second)
+        items = self._retriever.get_action_items()
+        self._retriever.acknowledge(items[1:])
+
+        self.assertEqual([second], self._mail.acknowledged)
+
+    def test__acknowledge__forgets_pending_items(self):
+        items = self._retriever.get_action_items()
+        self._retriever.acknowledge([])
+        self._retriever.acknowledge(items)
+
+        self.assertEqual([], self._mail.acknowledged)
+
+    def test__get_action_items__returns_body_and_date(self):
+        items = self._retriever.get_action_items()
+        self.assertEqual(1, len(items))
+        body, date = items[0]
+        self.assertEqual("n note", body)
+        self.assertEqual((2015, 9, 1), date[:3])
+
+    def test__get_action_items__session_is_reused(self):
+        self._retriever.get_action_items()
+        self._retriever.get_action_items()
+        self.assertEqual(1, self._mail.connect_count)
+
+    def test__iter_action_items__failure_closes_session(self):
+        self._mail.error = imaplib.IMAP4.abort("socket error: EOF")
+        with self.assertRaises(imaplib.IMAP4.abort):
+            self._retriever.get_action_items()
+        self.assertEqual(1, self._mail.close_count)
+
+        self._mail.error = None
+        self._retriever.get_action_items()
+        self.assertEqual(2, self._mail.connect_count)
+
+    def test__iter_action_items__yields_body_and_date(self):
+        items = self._retriever.iter_action_items()
+        body, date = next(items)
+        self.assertEqual("n note", body)
+        self.assertEqual([], list(items))
+
+    def test__wait__failure_closes_session(self):
+        self._mail.error = imaplib.IMAP4.abort("socket error: EOF")
+        with self.assertRaises(imaplib.IMAP4.abort):
+            self._retriever.wait(30)
+        self.assertEqual(1, self._mail.close_count)
+
+    def test__wait__idles_on_session(self):
+        self.assertTrue(self._retriever.wait(30, 5))
+        self.assertEqual([30], self._mail.idle_timeouts)
+        self.assertEqual([5], self._mail.poll_intervals)
+        self.assertEqual(1, self._mail.connect_count)
+
+
+class MailRetrieverPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self._connections = []
+        self._dead = False
+        self._pool = mail.ImapSessionPool(keepalive_interval=300,
+                                          mail_factory=self._create_mail)
+        self._retriever = actionretriever.MailRetriever(
+            mail.PooledImapMail(self._pool), "mail.test.com",
+            "test@test.com", "mockpassword")
+
+    def tearDown(self):
+        self._pool.close()
+
+    def _create_imap(self, server):
+        raw = b"Date: Tue, 1 Sep 2015 08:30:00 -0000\r\n\r\nn note\r\n"
+        imap = mock_imap.MockImap({1: raw})
+        imap.alive = not self._dead
+        self._connections.append(imap)
+        return imap
+
+    def _create_mail(self, mailbox):
+        return mail.ImapMail(mailbox, imap_class=self._create_imap)
+
+    def test__iter_action_items__reconnects_dead_session(self):
+        self._retriever.get_action_items()
+        self._connections[0].alive = False
+
+        items = list(self._retriever.iter_action_items())
+
+        self.assertEqual(["n note"], [body for body, date in items])
+        self.assertEqual(2, len(self._connections))
+
+    def test__iter_action_items__failure_drops_pooled_session(self):
+        self._retriever.get_action_items()
+        self._connections[0].alive = False
+        self._dead = True
+
+        with self.assertRaises(imaplib.IMAP4.abort):
+            list(self._retriever.iter_action_items())
+
+        self._dead = False
+        items = list(self._retriever.iter_action_items())
+        self.assertEqual(["n note"], [body for body, date in items])
+        self.assertEqual(3, len(self._connections))
+
+
+class MailRetrieverIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self._path = tempfile.mkdtemp()
+        self._index = messageindex.ProcessedMessageIndex(
+            os.path.join(self._path, "processed.db"), 100)
+        self._messages = [
+            mail.MailMessage(email.message_from_string(
+                "Date: Tue, 1 Sep 2015 08:30:00 -0000\n"
+                "Message-ID: <first@test.com>\n\nn first"), 1),
+            mail.MailMessage(email.message_from_string(
+                "Date: Wed, 2 Sep 2015 08:30:00 -0000\n\nn second"), 2)]
+        self._mail = mock_mail.MockMail(self._messages)
+        self._retriever = actionretriever.MailRetriever(
+            self._mail, "mail.test.com", "test@test.com", "mockpassword",
+            self._index)
+
+    def tearDown(self):
+        self._index.close()
+        shutil.rmtree(self._path)
+
+    def test__iter_action_items__skips_performed_messages(self):
+        for item in self._retriever.get_action_items():
+            self._retriever.mark_performed(item)
+
+        self.assertEqual([], self._retriever.get_action_items())
+
+    def test__acknowledge__includes_skipped_messages(self):
+        first, second = self._retriever.get_action_items()
+        self._retriever.mark_performed(first)
+        self._retriever.get_action_items()
+        self._retriever.acknowledge([])
+
+        self.assertEqual([self._messages[0]], self._mail.acknowledged)
+
+    def test__mark_performed__message_without_message_id(self):
+        first, second = self._retriever.get_action_items()
+        self._retriever.mark_performed(second)
+
+        self.assertNotIn("<first@test.com>", self._index)
+        self.assertEqual(["n first"],
+                         [body for body, date in
+                          self._retriever.get_action_items()])
+
+
+
+def _create_raw_message(body, day):
+    return ("Date: {0} Sep 2015 08:30:00 -0000\n"
+            "Content-Type: text/plain\n"
+            "\n"
+            "{1}\n").format(day, body).encode("ascii")
+
+
+class MaildirRetrieverTest(unittest.TestCase):
+
+    def setUp(self):
+        self._path = tempfile.mkdtemp()
+        for subdir in ("cur", "new", "tmp"):
+            os.mkdir(os.path.join(self._path, subdir))
+
+    def tearDown(self):
+        shutil.rmtree(self._path)
+
+    def _write(self, subdir, filename, data):
+        with open(os.path.join(self._path, subdir, filename), "wb") as f:
+            f.write(data)
+
+    def test__iter_action_items__cur_and_new(self):
+        self._write("new", "3.host", _create_raw_message("n third", 3))
+        self._write("cur", "2.host:2,S", _create_raw_message("n second", 2))
+        self._write("cur", "1.host:2,S", _create_raw_message("n first", 1))
+        self._write("tmp", "4.host", _create_raw_message("n partial", 4))
+        retriever = actionretriever.MaildirRetriever(self._path)
+
+        items = list(retriever.iter_action_items())
+        self.assertEqual(["n first", "n second", "n third"],
+                         [body for body, date in items])
+        self.assertEqual((2015, 9, 3), items[2][1][:3])
+
+    def test__iter_action_items__delivery_order(self):
+        """
+        Test with messages read in cur that were delivered after others
+        still in new, and with names of different lengths.
+        """
+        self._write("cur", "1441101000.M5P1.host:2,S",
+                    _create_raw_message("n second", 2))
+        self._write("new", "1441101000.M40P2.host",
+                    _create_raw_message("n third", 3))
+        self._write("new", "999999999.M1P3.host",
+                    _create_raw_message("n first", 1))
+        retriever = actionretriever.MaildirRetriever(self._path)
+
+        items = retriever.get_action_items()
+        self.assertEqual(["n first", "n second", "n third"],
+                         [body for body, date in items])
+
+    def test__get_action_items__missing_folders(self):
+        retriever = actionretriever.MaildirRetriever(
+            os.path.join(self._path, "missing"))
+        self.assertEqual([], retriever.get_action_items())
+
+
+class MboxRetrieverTest(unittest.TestCase):
+
+    def setUp(self):
+        handle, self._path = tempfile.mkstemp()
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self._path)
+
+    def _write(self, data):
+        with open(self._path, "wb") as f:
+            f.write(data)
+
+    def test__iter_action_items__splits_messages(self):
+        self._write(b"From a@test.com Tue Sep  1 08:30:00 2015\n" +
+                    _create_raw_message("n first", 1) + b"\n" +
+                    b"From b@test.com Wed Sep  2 08:30:00 2015\n" +
+                    _create_raw_message("n second\n>From the desk", 2))
+        retriever = actionretriever.MboxRetriever(self._path)
+
+        items = list(retriever.iter_action_items())
+        self.assertEqual(["n first", "n second\nFrom the desk"],
+                         [body for body, date in items])
+        self.assertEqual((2015, 9, 2), items[1][1][:3])
+
+    def test__iter_action_items__unescaped_from_line(self):
+        """
+        Test with a "From " line in a body that was not escaped, which only
+        starts a message after a blank line.
+        """
+        self._write(b"From a@test.com Tue Sep  1 08:30:00 2015\n" +
+                    _create_raw_message("n first\nFrom the desk", 1) +
+                    b"\n" +
+                    b"From b@test.com Wed Sep  2 08:30:00 2015\n" +
+                    _create_raw_message("n second", 2))
+        retriever = actionretriever.MboxRetriever(self._path)
+
+        items = retriever.get_action_items()
+        self.assertEqual(["n first\nFrom the desk", "n second"],
+                         [body for body, date in items])
+
+    def test__get_action_items__empty_file(self):
+        retriever = actionretriever.MboxRetriever(self._path)
+        self.assertEqual([], retriever.get_action_items())
+
+
 if __name__ == '__main__':
     unittest.main()
 
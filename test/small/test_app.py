@@ -1,10 +1,20 @@
 #!/usr/bin/env python
 """Tests for powl.app."""
 import injector
+import logging
+import time
 import unittest
+from powl import action
+from powl import actionretriever
+from powl import actiontype
 from powl import log
 from powl import app
+from powl import mail
+from powl import parser
+from powl import result
+from test.mock import actionretriever as mock_actionretriever
 from test.mock import filesystem as mock_filesystem
+from test.mock import imap as mock_imap
 from test.mock import log as mock_log
 from test.mock import parser as mock_parser
 
@@ -34,6 +44,196 @@ class TestApp(unittest.TestCase):
         expected_file_output = note
         self.assertEqual(expected_file_output, actual_file_output)
 
+
+class _RecordingAction(action.Action):
+    """
+    Records each performed action with the number of retrieved items at the
+    time it was performed, if the retriever counts them.
+    """
+
+    def __init__(self, retriever):
+        self._retriever = retriever
+        self.performed = []
+
+    def do(self, string, date):
+        if string == "fail":
+            raise IOError("disk full")
+        retrieved_count = getattr(self._retriever, "retrieved_count", None)
+        self.performed.append((string, retrieved_count))
+
+
+class _RecordingLog(mock_log.MockLog):
+    """
+    Records debug messages.
+    """
+
+    def __init__(self, level=logging.INFO):
+        mock_log.MockLog.__init__(self, level)
+        self.debug_messages = []
+
+    def debug(self, message, *args, **kwargs):
+        self.debug_messages.append(message)
+
+
+class AppPipelineTest(unittest.TestCase):
+    """
+    Class for testing the retrieval pipeline of powl.app.App.
+    """
+
+    def _create_app(self, retriever, queue_size=app.App._QUEUE_SIZE,
+                    app_log=None):
+        action_manager = action.ActionManager(mock_log.MockLog())
+        note_action = _RecordingAction(retriever)
+        action_manager.add_action(actiontype.NOTE, note_action)
+
+        def configure(binder):
+            binder.bind(action.ActionManager, to=action_manager)
+            binder.bind(actionretriever.ActionItemRetriever, to=retriever)
+            binder.bind(log.Log, to=app_log or mock_log.MockLog())
+            binder.bind(parser.ActionItemParser, to=parser.ActionItemParser())
+
+        return app.App(injector.Injector(configure), queue_size), note_action
+
+    def _create_items(self, count):
+        date = time.localtime()
+        return [("n note{0}".format(i), date) for i in range(count)]
+
+    def test__run__acknowledges_performed_items(self):
+        date = time.localtime()
+        items = [("n first", date), ("x unknown", date), ("n third", date)]
+        retriever = mock_actionretriever.MockActionItemRetriever(items)
+        powl_app, note_action = self._create_app(retriever)
+        powl_app.run()
+        self.assertEqual([items[0], items[2]], retriever.acknowledged)
+
+    def test__run__marks_performed_items(self):
+        date = time.localtime()
+        items = [("n first", date), ("x unknown", date), ("n third", date)]
+        retriever = mock_actionretriever.MockActionItemRetriever(items)
+        powl_app, note_action = self._create_app(retriever)
+        powl_app.run()
+        self.assertEqual([items[0], items[2]], retriever.performed)
+
+    def test__run__checkpoint_stops_below_failed_item(self):
+        """
+        Test with the retriever thread running ahead of a failed action, so
+        the checkpoint must not pass the message of the failed action.
+        """
+        raw = ("Date: Tue, 1 Sep 2015 08:30:00 -0000\r\n"
+               "Content-Type: text/plain\r\n"
+               "\r\n"
+               "{0}\r\n")
+        bodies = ["n first", "n second", "n fail", "n fourth", "n fifth"]
+        messages = dict((i + 1, raw.format(b).encode("ascii"))
+                        for i, b in enumerate(bodies))
+        mock_imaps = []
+
+        def create_imap(server):
+            mock_imaps.append(mock_imap.MockImap(messages, uidvalidity=7))
+            return mock_imaps[-1]
+
+        checkpoint_file = mock_filesystem.MockFile("./", "checkpoint")
+        imap_mail = mail.ImapMail(
+            checkpoint=mail.ImapCheckpoint(checkpoint_file),
+            imap_class=create_imap)
+        retriever = actionretriever.MailRetriever(imap_mail, "server",
+                                                  "user", "password")
+        self.addCleanup(lambda: mock_imaps[0].close())
+        powl_app, note_action = self._create_app(retriever, queue_size=1)
+        powl_app.run()
+
+        self.assertEqual(4, len(note_action.performed))
+        self.assertEqual("7 2\n", checkpoint_file.write_data)
+
+    def test__run__counts_errors_by_code(self):
+        date = time.localtime()
+        items = [("x unknown", date), ("y unknown", date), ("n fail", date),
+                 ("note", date), ("n note", date)]
+        retriever = mock_actionretriever.MockActionItemRetriever(
+            items, IOError("connection lost"))
+        powl_app, note_action = self._create_app(retriever)
+        powl_app.run()
+
+        expected = {result.ERROR_UNKNOWN_ACTION: 2,
+                    result.ERROR_ACTION_FAILED: 1,
+                    result.ERROR_NOT_ENOUGH_ARGUMENTS: 1,
+                    app.App._ERROR_RETRIEVAL: 1}
+        self.assertEqual(expected, powl_app.error_counts)
+        self.assertEqual([items[4]], retriever.acknowledged)
+
+    def test__run__traceback_only_when_debug_enabled(self):
+        date = time.localtime()
+        items = [("n fail", date), ("x unknown", date)]
+        info_log = _RecordingLog()
+        retriever = mock_actionretriever.MockActionItemRetriever(items)
+        self._create_app(retriever, app_log=info_log)[0].run()
+        self.assertEqual([], info_log.debug_messages)
+
+        debug_log = _RecordingLog(logging.DEBUG)
+        retriever = mock_actionretriever.MockActionItemRetriever(items)
+        self._create_app(retriever, app_log=debug_log)[0].run()
+        self.assertEqual(1, len(debug_log.debug_messages))
+        self.assertIn("disk full", debug_log.debug_messages[0])
+
+    def test__parser_cache_module__caches_repeated_items(self):
+        date = time.localtime()
+        items = [("n note", date), ("n note", date), ("x unknown", date),
+                 ("x unknown", date)]
+        retriever = mock_actionretriever.MockActionItemRetriever(items)
+        action_manager = action.ActionManager(mock_log.MockLog())
+        note_action = _RecordingAction(retriever)
+        action_manager.add_action(actiontype.NOTE, note_action)
+
+        def configure(binder):
+            binder.bind(action.ActionManager, to=action_manager)
+            binder.bind(actionretriever.ActionItemRetriever, to=retriever)
+            binder.bind(log.Log, to=mock_log.MockLog())
+
+        powl_injector = injector.Injector([configure,
+                                           app.ParserCacheModule(8)])
+        powl_app = app.App(powl_injector)
+        powl_app.run()
+        self.assertEqual(2, powl_app._parser.hits)
+        self.assertEqual(2, powl_app._parser.misses)
+        self.assertEqual(2, len(note_action.performed))
+
+    def test__run__bounded_queue(self):
+        queue_size = 2
+        retriever = mock_actionretriever.MockActionItemRetriever(
+            self._create_items(20))
+        powl_app, note_action = self._create_app(retriever, queue_size)
+        powl_app.run()
+        self.assertEqual(20, len(note_action.performed))
+        for index, (_, retrieved_count) in enumerate(note_action.performed):
+            # The queue holds queue_size items, the retriever thread may hold
+            # one more waiting to be put and the consumer holds one.
+            self.assertLessEqual(retrieved_count - index, queue_size + 2)
+
+    def test__run__items_in_order(self):
+        retriever = mock_actionretriever.MockActionItemRetriever(
+            self._create_items(50))
+        powl_app, note_action = self._create_app(retriever, 3)
+        powl_app.run()
+        expected = ["note{0}".format(i) for i in range(50)]
+        actual = [string for string, _ in note_action.performed]
+        self.assertEqual(expected, actual)
+
+    def test__run__retrieval_error(self):
+        retriever = mock_actionretriever.MockActionItemRetriever(
+            self._create_items(3), IOError("connection lost"))
+        powl_app, note_action = self._create_app(retriever)
+        powl_app.run()
+        self.assertEqual(3, len(note_action.performed))
+
+    def test__run__unknown_action_key(self):
+        date = time.localtime()
+        items = [("x unknown", date), ("n note", date)]
+        retriever = mock_actionretriever.MockActionItemRetriever(items)
+        powl_app, note_action = self._create_app(retriever)
+        powl_app.run()
+        self.assertEqual([("note", 2)], note_action.performed)
+
+
 if __name__ == '__main__':
     unittest.main()
 
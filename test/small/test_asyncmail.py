@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+"""Tests for powl.asyncmail."""
+import asyncio
+import imaplib
+import unittest
+from powl import asyncmail
+from powl import exception
+from test.mock import asyncimap as mock_asyncimap
+
+
+def _create_raw_message(body):
+    """
+    Return a minimal RFC822 message with a text/plain body.
+    """
+    raw = ("Date: Tue, 1 Sep 2015 08:30:00 -0000\r\n"
+           "Content-Type: text/plain\r\n"
+           "\r\n"
+           "{0}\r\n").format(body)
+    return raw.encode("ascii")
+
+
+class AsyncImapMailTest(unittest.TestCase):
+
+    def setUp(self):
+        self._messages = {
+            1: _create_raw_message("n first"),
+            2: _create_raw_message("n second"),
+            4: _create_raw_message("n fourth")}
+        self._server = mock_asyncimap.MockImapServer(self._messages)
+
+    def _run(self, coroutine_function):
+        async def run():
+            await self._server.start()
+            try:
+                return await coroutine_function()
+            finally:
+                await self._server.stop()
+        return asyncio.run(run())
+
+    def _create_mail(self, **kwargs):
+        return asyncmail.AsyncImapMail(port=self._server.port, use_ssl=False,
+                                       **kwargs)
+
+    def test__acknowledge__flags_seen(self):
+        async def retrieve():
+            async_mail = self._create_mail(batch_size=2)
+            await async_mail.connect("127.0.0.1")
+            await async_mail.login("user", "password")
+            try:
+                messages = await async_mail.get_messages()
+                await async_mail.acknowledge(messages)
+            finally:
+                await async_mail.close()
+
+        self._run(retrieve)
+
+        flags = self._server.imaps[0].flags
+        self.assertEqual([1, 2, 4], sorted(flags))
+        for message_flags in flags.values():
+            self.assertIn("\\Seen", message_flags)
+
+    def test__get_all_messages__acknowledges_messages(self):
+        async def retrieve():
+            accounts = [(self._create_mail(), "127.0.0.1", "user", "password")
+                        for i in range(2)]
+            return await asyncmail.get_all_messages(accounts)
+
+        results = self._run(retrieve)
+
+        self.assertEqual([[1, 2, 4], [1, 2, 4]],
+                         [[m.id for m in messages] for messages in results])
+        for imap in self._server.imaps:
+            for message_flags in imap.flags.values():
+                self.assertIn("\\Seen", message_flags)
+
+    def test__get_all_messages__process_before_logout(self):
+        async def process(async_mail, messages):
+            await async_mail.acknowledge(messages[:1])
+            return [m.body for m in messages]
+
+        async def retrieve():
+            accounts = [(self._create_mail(), "127.0.0.1", "user", "password")]
+            return await asyncmail.get_all_messages(accounts, process=process)
+
+        results = self._run(retrieve)
+
+        self.assertEqual([["n first", "n second", "n fourth"]], results)
+        flags = self._server.imaps[0].flags
+        self.assertIn("\\Seen", flags[1])
+        self.assertNotIn("\\Seen", flags[2])
+        self.assertNotIn("\\Seen", flags[4])
+
+    def test__get_all_messages__limits_concurrency(self):
+        async def retrieve():
+            accounts = [(self._create_mail(), "127.0.0.1", "user", "password")
+                        for i in range(6)]
+            return await asyncmail.get_all_messages(accounts, concurrency=2)
+
+        results = self._run(retrieve)
+
+        self.assertEqual(6, len(results))
+        for messages in results:
+            self.assertEqual(["n first", "n second", "n fourth"],
+                             [m.body for m in messages])
+        self.assertEqual(6, self._server.connections)
+        self.assertEqual(2, self._server.max_connections)
+
+    def test__get_all_messages__returns_errors_per_account(self):
+        async def retrieve():
+            accounts = [
+                (self._create_mail(), "127.0.0.1", "user", "password"),
+                (self._create_mail(), "127.0.0.1", "user", "wrong")]
+            return await asyncmail.get_all_messages(accounts)
+
+        results = self._run(retrieve)
+
+        self.assertEqual(3, len(results[0]))
+        self.assertIsInstance(results[1], imaplib.IMAP4.error)
+        self.assertEqual(asyncmail._ERRMSG_INVALID_CREDENTIALS,
+                         exception.get_message(results[1]))
+
+    def test__get_messages__batches_fetches(self):
+        async def retrieve():
+            async_mail = self._create_mail(batch_size=2)
+            await async_mail.connect("127.0.0.1")
+            await async_mail.login("user", "password")
+            try:
+                return await async_mail.get_messages()
+            finally:
+                await async_mail.close()
+
+        messages = self._run(retrieve)
+
+        self.assertEqual(["n first", "n second", "n fourth"],
+                         [m.body for m in messages])
+        self.assertEqual([1, 2, 4], [m.id for m in messages])
+
+    def test__get_messages__leaves_unseen(self):
+        async def retrieve():
+            async_mail = self._create_mail()
+            await async_mail.connect("127.0.0.1")
+            await async_mail.login("user", "password")
+            try:
+                return await async_mail.get_messages()
+            finally:
+                await async_mail.close()
+
+        messages = self._run(retrieve)
+
+        self.assertEqual(3, len(messages))
+        for message_flags in self._server.imaps[0].flags.values():
+            self.assertNotIn("\\Seen", message_flags)
+
+    def test__get_messages__called_before_connect_fails(self):
+        async_mail = asyncmail.AsyncImapMail()
+        with self.assertRaises(ValueError) as context:
+            asyncio.run(async_mail.get_messages())
+
+        actual_errmsg = exception.get_message(context.exception)
+        self.assertEqual(asyncmail._ERRMSG_NOT_CONNECTED, actual_errmsg)
+
+
+    def test__get_messages__slow_fetch_within_timeout_per_read(self):
+        """
+        Test with a FETCH that takes longer than the timeout in total but
+        not between any two reads.
+        """
+        self._server = mock_asyncimap.MockImapServer(self._messages,
+                                                     fetch_delay=0.2)
+
+        async def retrieve():
+            async_mail = self._create_mail(timeout=0.5)
+            await async_mail.connect("127.0.0.1")
+            await async_mail.login("user", "password")
+            try:
+                return await async_mail.get_messages()
+            finally:
+                await async_mail.close()
+
+        messages = self._run(retrieve)
+
+        self.assertEqual([1, 2, 4], [m.id for m in messages])
+
+    def test__get_messages__timeout_closes_connection(self):
+        self._server = mock_asyncimap.MockImapServer(self._messages,
+                                                     fetch_delay=0.5)
+        mails = []
+
+        async def retrieve():
+            async_mail = self._create_mail(timeout=0.2)
+            mails.append(async_mail)
+            await async_mail.connect("127.0.0.1")
+            await async_mail.login("user", "password")
+            await async_mail.get_messages()
+
+        with self.assertRaises(asyncio.TimeoutError):
+            self._run(retrieve)
+        with self.assertRaises(ValueError):
+            asyncio.run(mails[0].get_messages())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,1221 @@
+#!/usr/bin/env python
+"""Tests for powl.mail."""
+import base64
+import datetime
+import email
+import imaplib
+import io
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+import zlib
+from powl import exception
+from powl import mail
+from powl import messagecache
+from test.mock import filesystem as mock_filesystem
+from test.mock import imap as mock_imap
+from test.mock import log as mock_log
+
+
+def _create_raw_message(body, date="Tue, 1 Sep 2015 08:30:00 -0000"):
+    """
+    Return a minimal RFC822 message with a text/plain body.
+    """
+    raw = ("Date: {0}\r\n"
+           "Content-Type: text/plain\r\n"
+           "\r\n"
+           "{1}\r\n").format(date, body)
+    return raw.encode("ascii")
+
+
+def _create_raw_multipart_message(body, attachment_size):
+    """
+    Return a multipart RFC822 message with a text/plain part followed by a
+    base64 encoded attachment.
+    """
+    attachment = base64.b64encode(b"x" * attachment_size).decode("ascii")
+    raw = ("Date: Wed, 2 Sep 2015 09:00:00 -0000\r\n"
+           "Message-ID: <multipart@test.com>\r\n"
+           "MIME-Version: 1.0\r\n"
+           'Content-Type: multipart/mixed; boundary="XYZ"\r\n'
+           "\r\n"
+           "--XYZ\r\n"
+           'Content-Type: text/plain; charset="us-ascii"\r\n'
+           "\r\n"
+           "{0}\r\n"
+           "--XYZ\r\n"
+           "Content-Type: image/png\r\n"
+           "Content-Transfer-Encoding: base64\r\n"
+           "\r\n"
+           "{1}\r\n"
+           "--XYZ--\r\n").format(body, attachment)
+    return raw.encode("ascii")
+
+
+class _SocketConnection(object):
+    """
+    Reads and writes a socket through a buffered file object like
+    imaplib.IMAP4 does.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.file = sock.makefile("rb")
+
+    def readline(self):
+        return self.file.readline()
+
+    def send(self, data):
+        self.sock.sendall(data)
+
+
+class _DeflateImapServer(threading.Thread):
+    """
+    Answers the commands of one client over a socket, compressing the
+    connection in both directions once COMPRESS DEFLATE completes.
+    """
+
+    def __init__(self, sock, messages):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self._sock = sock
+        self._messages = messages
+        self._buffer = b""
+        self._compressor = None
+        self._decompressor = None
+        self.compressed_commands = []
+
+    def _readline(self):
+        while b"\n" not in self._buffer:
+            data = self._sock.recv(4096)
+            if not data:
+                return b""
+            if self._decompressor:
+                data = self._decompressor.decompress(data)
+            self._buffer += data
+        line, _, self._buffer = self._buffer.partition(b"\n")
+        return line + b"\n"
+
+    def _respond(self, name, args):
+        """
+        Return the untagged responses to a command.
+        """
+        if name == "CAPABILITY":
+            return b"* CAPABILITY IMAP4rev1 COMPRESS=DEFLATE\r\n"
+        if name == "STATUS":
+            uidnext = str(max(self._messages) + 1).encode("ascii")
+            return (b'* STATUS "inbox" (UIDNEXT ' + uidnext +
+                    b" UIDVALIDITY 1 UNSEEN 1)\r\n")
+        if name == "SELECT":
+            return b"* OK [UIDVALIDITY 1] UIDs valid\r\n"
+        if name == "UID" and args.startswith("SEARCH"):
+            uids = " ".join(str(i) for i in sorted(self._messages))
+            return b"* SEARCH " + uids.encode("ascii") + b"\r\n"
+        if name == "UID" and args.startswith("FETCH"):
+            response = b""
+            for number, uid in enumerate(sorted(self._messages)):
+                raw = self._messages[uid]
+                response += "* {0} FETCH (UID {1} BODY[] {{{2}}}\r\n".format(
+                    number + 1, uid, len(raw)).encode("ascii")
+                response += raw + b")\r\n"
+            return response
+        if name == "LOGOUT":
+            return b"* BYE logging out\r\n"
+        return b""
+
+    def _send(self, data):
+        if self._compressor:
+            data = (self._compressor.compress(data) +
+                    self._compressor.flush(zlib.Z_SYNC_FLUSH))
+        self._sock.sendall(data)
+
+    def run(self):
+        self._send(b"* OK ready\r\n")
+        while True:
+            line = self._readline().decode("ascii").rstrip("\r\n")
+            if not line:
+                return
+            tag, name, args = (line + " ").split(" ", 2)
+            if self._decompressor:
+                self.compressed_commands.append(name)
+            self._send(self._respond(name, args.strip()) +
+                       tag.encode("ascii") + b" OK done\r\n")
+            if name == "COMPRESS":
+                self._compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+                self._decompressor = zlib.decompressobj(-15)
+            elif name == "LOGOUT":
+                return
+
+
+class _SocketImap(imaplib.IMAP4):
+    """
+    imaplib.IMAP4 over an already connected socket.
+    """
+
+    def __init__(self, sock):
+        self._connected_sock = sock
+        imaplib.IMAP4.__init__(self, "localhost")
+
+    def _create_socket(self, timeout):
+        return self._connected_sock
+
+
+class _WarningLog(mock_log.MockLog):
+    """
+    Records warning messages.
+    """
+
+    def __init__(self):
+        mock_log.MockLog.__init__(self)
+        self.warnings = []
+
+    def warning(self, message, *args, **kwargs):
+        self.warnings.append(message % args)
+
+
+class AdaptiveBatchSizeTest(unittest.TestCase):
+
+    def test__init__invalid_bounds(self):
+        with self.assertRaises(ValueError) as context:
+            mail.AdaptiveBatchSize(min_size=10, max_size=5)
+
+        actual_errmsg = exception.get_message(context.exception)
+        expected_errmsg = mail._ERRMSG_INVALID_BATCH_BOUNDS.format(10, 5)
+        self.assertEqual(expected_errmsg, actual_errmsg)
+
+    def test__update__additive_increase(self):
+        batch_size = mail.AdaptiveBatchSize(min_size=10, max_size=25,
+                                            target_seconds=1.0, increase=10)
+        batch_size.update(10, 0.5)
+        self.assertEqual(20, batch_size.size)
+        batch_size.update(20, 0.5)
+        self.assertEqual(25, batch_size.size)
+        self.assertEqual(0.5, batch_size.latency)
+        self.assertEqual(40, batch_size.throughput)
+
+    def test__update__multiplicative_decrease(self):
+        batch_size = mail.AdaptiveBatchSize(min_size=10, max_size=1000,
+                                            initial_size=100,
+                                            target_seconds=1.0)
+        batch_size.update(100, 3.0)
+        self.assertEqual(50, batch_size.size)
+        batch_size.update(50, 3.0)
+        batch_size.update(25, 3.0)
+        self.assertEqual(12, batch_size.size)
+        batch_size.update(12, 3.0)
+        self.assertEqual(10, batch_size.size)
+
+    def test__update__short_batch_does_not_grow(self):
+        batch_size = mail.AdaptiveBatchSize(min_size=10, max_size=1000)
+        batch_size.update(3, 0.1)
+        self.assertEqual(10, batch_size.size)
+
+
+class DeflateStreamTest(unittest.TestCase):
+
+    class _Connection(object):
+        def __init__(self, sock):
+            self.sock = sock
+
+    def setUp(self):
+        self._sock, self._peer = socket.socketpair()
+        self._connection = self._Connection(self._sock)
+        self._stream = mail._DeflateStream(self._connection)
+        self._stream.install()
+
+    def tearDown(self):
+        self._sock.close()
+        self._peer.close()
+
+    def test__read__inflates(self):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        data = b"* 1 FETCH (RFC822 {12}\r\nn note first)\r\nP1 OK done\r\n"
+        self._peer.sendall(compressor.compress(data) +
+                           compressor.flush(zlib.Z_SYNC_FLUSH))
+
+        self.assertEqual(b"* 1 FETCH (RFC822 {12}\r\n",
+                         self._connection.readline())
+        self.assertEqual(b"n note first", self._connection.read(12))
+        self.assertTrue(self._stream.pending())
+        self.assertEqual(b")\r\n", self._connection.readline())
+        self.assertEqual(b"P1 OK done\r\n", self._connection.readline())
+        self.assertFalse(self._stream.pending())
+
+    def test__install__imaplib_round_trip(self):
+        """
+        Test the stream through the readline, read and send used by the
+        response parsing of a real imaplib.IMAP4.
+        """
+        messages = {1: _create_raw_message("n first"),
+                    2: _create_raw_message("n second")}
+        server = _DeflateImapServer(self._peer, messages)
+        server.start()
+        imap = mail.ImapMail(imap_class=lambda host: _SocketImap(self._sock))
+        imap.connect("localhost")
+        imap.login("user", "password")
+
+        actual = imap.get_messages()
+        deflate = imap._deflate
+        imap.close()
+        server.join(5)
+
+        self.assertEqual(["n first", "n second"], [m.body for m in actual])
+        self.assertEqual(["STATUS", "SELECT", "UID", "UID", "LOGOUT"],
+                         server.compressed_commands)
+        self.assertGreater(deflate.bytes_received, 0)
+
+    def test__send__deflates(self):
+        data = b"P1 UID FETCH 1:500 (RFC822)\r\n" * 20
+        self._connection.send(data)
+
+        sent = self._peer.recv(65536)
+        self.assertLess(len(sent), len(data))
+        decompressor = zlib.decompressobj(-15)
+        self.assertEqual(data, decompressor.decompress(sent))
+
+
+class ImapMailTest(unittest.TestCase):
+
+    def setUp(self):
+        self._messages = {
+            1: _create_raw_message("n first"),
+            2: _create_raw_message("n second"),
+            3: _create_raw_message("n third"),
+            5: _create_raw_message("n fifth"),
+            6: _create_raw_message("n sixth")}
+        self._imaps = []
+
+    def tearDown(self):
+        for imap in self._imaps:
+            imap._imap.close()
+
+    def _login(self, uidvalidity=1, capabilities=(), modseq=None, seen=False,
+               **kwargs):
+        imap = mail.ImapMail(**kwargs)
+        imap._imap = mock_imap.MockImap(self._messages, uidvalidity,
+                                        capabilities, modseq)
+        if seen:
+            for flags in imap._imap.flags.values():
+                flags.add("\\Seen")
+        imap.login("user", "password")
+        self._imaps.append(imap)
+        return imap
+
+    def _sent_lines(self, imap):
+        return [c[1].decode("ascii").splitlines()
+                for c in imap._imap.commands if c[0] == "SEND"]
+
+    def _fetch_commands(self, imap):
+        return [c for c in imap._imap.commands if c[0] == "UID FETCH"]
+
+    def _search_commands(self, imap):
+        return [c for c in imap._imap.commands if c[0] == "UID SEARCH"]
+
+    def test__checkpoint__load_empty(self):
+        checkpoint_file = mock_filesystem.MockFile("./", "checkpoint")
+        checkpoint = mail.ImapCheckpoint(checkpoint_file)
+        self.assertEqual((None, 0, None), checkpoint.load())
+
+    def test__checkpoint__load_invalid(self):
+        checkpoint_file = mock_filesystem.MockFile("./", "checkpoint")
+        checkpoint_file.read_retval = ["abc"]
+        checkpoint = mail.ImapCheckpoint(checkpoint_file)
+
+        with self.assertRaises(ValueError) as context:
+            checkpoint.load()
+
+        actual_errmsg = exception.get_message(context.exception)
+        expected_errmsg = mail._ERRMSG_INVALID_CHECKPOINT.format("abc")
+        self.assertEqual(expected_errmsg, actual_errmsg)
+
+    def test__checkpoint__load_without_modseq(self):
+        checkpoint_file = mock_filesystem.MockFile("./", "checkpoint")
+        checkpoint_file.read_retval = ["7 3\n"]
+        checkpoint = mail.ImapCheckpoint(checkpoint_file)
+        self.assertEqual((7, 3, None), checkpoint.load())
+
+    def test__format_message_set__collapses_ranges(self):
+        actual = mail.format_message_set([b"5", b"1", b"2", b"3", b"9"])
+        self.assertEqual("1:3,5,9", actual)
+
+    def test__acknowledge__copy_failure_does_not_delete(self):
+        imap = self._login(acknowledge_mode=mail.ACKNOWLEDGE_MOVE,
+                           acknowledge_mailbox="missing")
+        messages = imap.get_messages()
+
+        with self.assertRaises(imaplib.IMAP4.error):
+            imap.acknowledge(messages)
+        self.assertEqual(1, len(self._sent_lines(imap)))
+        for flags in imap._imap.flags.values():
+            self.assertNotIn("\\Deleted", flags)
+
+    def test__acknowledge__move(self):
+        imap = self._login(capabilities=("MOVE",),
+                           acknowledge_mode=mail.ACKNOWLEDGE_MOVE,
+                           acknowledge_mailbox="archive")
+        messages = imap.get_messages()
+        imap.acknowledge(messages[:3])
+
+        expected = [["POWL1 UID MOVE 1:3 \"archive\""]]
+        self.assertEqual(expected, self._sent_lines(imap))
+        self.assertEqual([1, 2, 3], imap._imap.copied["archive"])
+        self.assertEqual([5, 6], sorted(imap._imap.flags))
+
+    def test__acknowledge__move_without_capability(self):
+        imap = self._login(acknowledge_mode=mail.ACKNOWLEDGE_MOVE,
+                           acknowledge_mailbox="archive")
+        messages = imap.get_messages()
+        imap.acknowledge(messages[:3])
+
+        expected = [["POWL1 UID COPY 1:3 \"archive\""],
+                    ["POWL2 UID STORE 1:3 +FLAGS.SILENT (\\Deleted)"],
+                    ["POWL3 EXPUNGE"]]
+        self.assertEqual(expected, self._sent_lines(imap))
+        self.assertEqual([1, 2, 3], imap._imap.copied["archive"])
+        self.assertEqual([1, 2, 3], imap._imap.expunged)
+        self.assertEqual([5, 6], sorted(imap._imap.flags))
+
+        second = self._login()
+        self.assertEqual([5, 6], [m.id for m in second.get_messages()])
+
+    def test__acknowledge__delete_expunges(self):
+        imap = self._login(acknowledge_mode=mail.ACKNOWLEDGE_DELETE)
+        imap.acknowledge(imap.get_messages())
+
+        expected = [["POWL1 UID STORE 1:3,5:6 +FLAGS.SILENT (\\Deleted)"],
+                    ["POWL2 EXPUNGE"]]
+        self.assertEqual(expected, self._sent_lines(imap))
+
+        second = self._login()
+        self.assertEqual([], second.get_messages())
+
+    def test__acknowledge__delete_uid_expunges(self):
+        imap = self._login(capabilities=("UIDPLUS",),
+                           acknowledge_mode=mail.ACKNOWLEDGE_DELETE)
+        messages = imap.get_messages()
+        imap._imap.flags[5].add("\\Deleted")
+        imap.acknowledge(messages[:3])
+
+        expected = [["POWL1 UID STORE 1:3 +FLAGS.SILENT (\\Deleted)"],
+                    ["POWL2 UID EXPUNGE 1:3"]]
+        self.assertEqual(expected, self._sent_lines(imap))
+        self.assertEqual([1, 2, 3], imap._imap.expunged)
+        self.assertEqual([5, 6], sorted(imap._imap.flags))
+
+    def test__acknowledge__pipelines_batches(self):
+        imap = self._login(batch_size=2, fetch_mode=mail.FETCH_PARTIAL)
+        messages = imap.get_messages()
+        imap.acknowledge(messages)
+
+        expected = [["POWL1 UID STORE 1:2 +FLAGS.SILENT (\\Seen)",
+                     "POWL2 UID STORE 3,5 +FLAGS.SILENT (\\Seen)",
+                     "POWL3 UID STORE 6 +FLAGS.SILENT (\\Seen)"]]
+        self.assertEqual(expected, self._sent_lines(imap))
+        for flags in imap._imap.flags.values():
+            self.assertIn("\\Seen", flags)
+
+    def test__login__compress(self):
+        imap = self._login(capabilities=("COMPRESS=DEFLATE",))
+
+        self.assertIn(("COMPRESS", "DEFLATE"), imap._imap.commands)
+        self.assertEqual(imap._deflate.readline, imap._imap.readline)
+
+    def test__login__compress_disabled(self):
+        imap = self._login(capabilities=("COMPRESS=DEFLATE",),
+                           compress=False)
+
+        self.assertNotIn(("COMPRESS", "DEFLATE"), imap._imap.commands)
+        self.assertIsNone(imap._deflate)
+
+    def test__login__invalid_mailbox(self):
+        imap = mail.ImapMail("missing")
+        imap._imap = mock_imap.MockImap(self._messages)
+        self._imaps.append(imap)
+
+        with self.assertRaises(ValueError) as context:
+            imap.login("user", "password")
+
+        actual_errmsg = exception.get_message(context.exception)
+        expected_errmsg = mail._ERRMSG_INVALID_MAILBOX.format("missing")
+        self.assertEqual(expected_errmsg, actual_errmsg)
+        self.assertNotIn("SELECT", [c[0] for c in imap._imap.commands])
+
+    def test__get_messages__adaptive_batch_size(self):
+        batch_sizer = mail.AdaptiveBatchSize(min_size=1, max_size=10,
+                                             target_seconds=60, increase=1)
+        imap = self._login(batch_sizer=batch_sizer)
+        self.assertEqual(1, imap.batch_size)
+        messages = imap.get_messages()
+
+        self.assertEqual(5, len(messages))
+        actual_sets = [c[1] for c in self._fetch_commands(imap)]
+        self.assertEqual(["1", "2:3", "5:6"], actual_sets)
+        self.assertEqual(3, imap.batch_size)
+
+    def test__get_messages__batches_fetches(self):
+        imap = self._login(batch_size=2)
+        messages = imap.get_messages()
+
+        expected_bodies = ["n first", "n second", "n third", "n fifth",
+                           "n sixth"]
+        self.assertEqual(expected_bodies, [m.body for m in messages])
+
+        expected_sets = ["1:2", "3,5", "6"]
+        actual_sets = [c[1] for c in self._fetch_commands(imap)]
+        self.assertEqual(expected_sets, actual_sets)
+
+    def test__get_messages__single_fetch_for_small_mailbox(self):
+        imap = self._login()
+        messages = imap.get_messages()
+
+        self.assertEqual(5, len(messages))
+        self.assertEqual(1, len(self._fetch_commands(imap)))
+
+    def test__get_messages__checkpoint_saves_highest_uid(self):
+        checkpoint_file = mock_filesystem.MockFile("./", "checkpoint")
+        checkpoint = mail.ImapCheckpoint(checkpoint_file)
+        imap = self._login(uidvalidity=7, checkpoint=checkpoint)
+        messages = imap.get_messages()
+        self.assertEqual("", checkpoint_file.write_data)
+
+        imap.acknowledge(messages)
+        self.assertEqual("7 6\n", checkpoint_file.write_data)
+
+    def test__get_messages__checkpoint_searches_new_uids_only(self):
+        checkpoint_file = mock_filesystem.MockFile("./", "checkpoint")
+        checkpoint_file.read_retval = ["7 3\n"]
+        checkpoint = mail.ImapCheckpoint(checkpoint_file)
+        imap = self._login(uidvalidity=7, checkpoint=checkpoint)
+        messages = imap.get_messages()
+
+        self.assertEqual(["n fifth", "n sixth"], [m.body for m in messages])
+        self.assertEqual([5, 6], [m.id for m in messages])
+        search = self._search_commands(imap)[0]
+        self.assertEqual("UID 4:* (Unseen)", search[-1])
+
+    def test__get_messages__checkpoint_with_no_new_uids(self):
+        checkpoint_file = mock_filesystem.MockFile("./", "checkpoint")
+        checkpoint_file.read_retval = ["7 6\n"]
+        checkpoint = mail.ImapCheckpoint(checkpoint_file)
+        imap = self._login(uidvalidity=7, checkpoint=checkpoint)
+
+        self.assertEqual([], imap.get_messages())
+        commands = [c[0] for c in imap._imap.commands]
+        self.assertEqual(["CAPABILITY", "STATUS"], commands[1:])
+
+    def test__get_messages__checkpoint_uidvalidity_changed(self):
+        checkpoint_file = mock_filesystem.MockFile("./", "checkpoint")
+        checkpoint_file.read_retval = ["6 3\n"]
+        checkpoint = mail.ImapCheckpoint(checkpoint_file)
+        imap = self._login(uidvalidity=7, checkpoint=checkpoint)
+        messages = imap.get_messages()
+        imap.acknowledge(messages)
+
+        self.assertEqual(5, len(messages))
+        search = self._search_commands(imap)[0]
+        self.assertEqual("(Unseen)", search[-1])
+        self.assertEqual("7 6\n", checkpoint_file.write_data)
+
+    def test__get_messages__condstore_changed_modseq(self):
+        checkpoint_file = mock_filesystem.MockFile("./", "checkpoint")
+        checkpoint_file.read_retval = ["7 3 40\n"]
+        checkpoint = mail.ImapCheckpoint(checkpoint_file)
+        imap = self._login(uidvalidity=7, capabilities=("CONDSTORE",),
+                           modseq=42, checkpoint=checkpoint)
+        messages = imap.get_messages()
+        imap.acknowledge(messages)
+
+        self.assertEqual(2, len(messages))
+        self.assertEqual("7 6 42\n", checkpoint_file.write_data)
+        self.assertIn(("SELECT", "inbox (CONDSTORE)"), imap._imap.commands)
+
+    def test__get_messages__condstore_unchanged_modseq(self):
+        checkpoint_file = mock_filesystem.MockFile("./", "checkpoint")
+        checkpoint_file.read_retval = ["7 6 42\n"]
+        checkpoint = mail.ImapCheckpoint(checkpoint_file)
+        imap = self._login(uidvalidity=7, capabilities=("CONDSTORE",),
+                           modseq=42, checkpoint=checkpoint)
+        commands_after_login = len(imap._imap.commands)
+
+        self.assertEqual([], imap.get_messages())
+        new_commands = imap._imap.commands[commands_after_login:]
+        self.assertEqual([], new_commands)
+        self.assertEqual([], imap.get_messages())
+        new_commands = imap._imap.commands[commands_after_login:]
+        self.assertEqual(["STATUS"], [c[0] for c in new_commands])
+
+    def test__get_messages__condstore_polls_with_status(self):
+        imap = self._login(capabilities=("QRESYNC",), modseq=42)
+
+        self.assertEqual(5, len(imap.get_messages()))
+        expected_status = ("STATUS", "inbox",
+                           "(UIDNEXT UIDVALIDITY UNSEEN HIGHESTMODSEQ)")
+        self.assertIn(expected_status, imap._imap.commands)
+
+    def test__get_messages__condstore_selected_polls_changedsince(self):
+        imap = self._login(capabilities=("QRESYNC",), modseq=42)
+        imap.acknowledge(imap.get_messages())
+        commands_after_first_poll = len(imap._imap.commands)
+
+        self.assertEqual([], imap.get_messages())
+        new_commands = imap._imap.commands[commands_after_first_poll:]
+        expected_fetch = ("UID FETCH", "1:*", "(UID)", "(CHANGEDSINCE 42)")
+        self.assertEqual([expected_fetch], new_commands)
+
+    def test__get_messages__condstore_selected_finds_new_mail(self):
+        imap = self._login(capabilities=("CONDSTORE",), modseq=42)
+        imap.acknowledge(imap.get_messages())
+
+        self._messages[7] = _create_raw_message("n seventh")
+        imap._imap.flags[7] = set()
+        imap._imap.modseqs[7] = 43
+        imap._imap.modseq = 43
+        messages = imap.get_messages()
+        imap.acknowledge(messages)
+
+        self.assertEqual([7], [m.id for m in messages])
+        self.assertNotIn("STATUS", [c[0] for c in imap._imap.commands[4:]])
+        self.assertEqual([], imap.get_messages())
+        expected_fetch = ("UID FETCH", "1:*", "(UID)", "(CHANGEDSINCE 43)")
+        self.assertEqual(expected_fetch, imap._imap.commands[-1])
+
+    def test__get_messages__selected_skips_status(self):
+        imap = self._login()
+        imap.acknowledge(imap.get_messages())
+        commands_after_first_poll = len(imap._imap.commands)
+
+        imap.get_messages()
+        new_commands = imap._imap.commands[commands_after_first_poll:]
+        self.assertEqual(["UID SEARCH"], [c[0] for c in new_commands])
+
+    def test__get_messages__full_leaves_unseen(self):
+        imap = self._login()
+        messages = imap.get_messages()
+        for flags in imap._imap.flags.values():
+            self.assertNotIn("\\Seen", flags)
+
+        imap.acknowledge(messages)
+        for flags in imap._imap.flags.values():
+            self.assertIn("\\Seen", flags)
+
+    def test__get_messages__ignores_unsolicited_fetch(self):
+        imap = self._login()
+        imap._imap.fetch_responses = [b"3 (FLAGS (\\Seen))"]
+        messages = imap.get_messages()
+
+        expected_bodies = ["n first", "n second", "n third", "n fifth",
+                           "n sixth"]
+        self.assertEqual(expected_bodies, [m.body for m in messages])
+
+    def test__get_messages__no_condstore(self):
+        imap = self._login(modseq=42, criteria="ALL")
+        imap.get_messages()
+
+        self.assertIn(("SELECT", "inbox"), imap._imap.commands)
+        self.assertEqual(5, len(imap.get_messages()))
+
+    def test__get_messages__no_unseen_skips_select(self):
+        imap = self._login(seen=True)
+
+        self.assertEqual([], imap.get_messages())
+        commands = [c[0] for c in imap._imap.commands]
+        self.assertEqual(["LOGIN", "CAPABILITY", "STATUS"], commands)
+
+    def test__get_messages__no_unseen_with_other_criteria(self):
+        imap = self._login(criteria="(From \"me@test.com\")", seen=True)
+
+        imap.get_messages()
+        self.assertEqual(1, len(self._search_commands(imap)))
+
+    def test__get_messages__no_unseen_with_search_filter(self):
+        search_filter = mail.ImapSearchFilter(senders=["me@test.com"])
+        imap = self._login(criteria=search_filter.compile(), seen=True)
+
+        self.assertEqual([], imap.get_messages())
+        self.assertEqual([], self._search_commands(imap))
+
+    def test__get_messages__search_filter_criteria(self):
+        search_filter = mail.ImapSearchFilter(max_size=4096)
+        checkpoint_file = mock_filesystem.MockFile("./", "checkpoint")
+        checkpoint_file.read_retval = ["7 3\n"]
+        checkpoint = mail.ImapCheckpoint(checkpoint_file)
+        imap = self._login(uidvalidity=7, checkpoint=checkpoint,
+                           criteria=search_filter.compile())
+        imap.get_messages()
+
+        search = self._search_commands(imap)[0]
+        self.assertEqual("UID 4:* (UNSEEN SMALLER 4096)", search[-1])
+
+    def test__get_messages__oversize_skip(self):
+        self._messages[4] = _create_raw_multipart_message("n fourth", 50000)
+        warning_log = _WarningLog()
+        imap = self._login(window_bytes=10000, max_message_bytes=1000,
+                           oversize_mode=mail.OVERSIZE_SKIP, log=warning_log)
+        messages = imap.get_messages()
+
+        self.assertEqual([1, 2, 3, 5, 6], [m.id for m in messages])
+        self.assertLess(imap._imap.literal_bytes, 1000)
+        self.assertEqual(1, imap.skipped_count)
+        size = len(self._messages[4])
+        expected = ["skipped oversized message UID 4 of {0} bytes in "
+                    "inbox".format(size)]
+        self.assertEqual(expected, warning_log.warnings)
+
+    def test__get_messages__oversize_truncate(self):
+        self._messages[4] = _create_raw_multipart_message("n fourth", 50000)
+        imap = self._login(window_bytes=10000, max_message_bytes=1000)
+        messages = imap.get_messages()
+
+        self.assertEqual([1, 2, 3, 4, 5, 6], [m.id for m in messages])
+        self.assertEqual("n fourth", messages[3].body)
+        self.assertLess(imap._imap.literal_bytes, 2000)
+        self.assertNotIn("\\Seen", imap._imap.flags[4])
+
+    def test__get_messages__oversize_truncate_base64(self):
+        encoded = base64.b64encode(b"n " + b"x" * 200)
+        self._messages[4] = (b"Date: Tue, 1 Sep 2015 08:30:00 -0000\r\n"
+                             b"Content-Type: text/plain\r\n"
+                             b"Content-Transfer-Encoding: base64\r\n"
+                             b"\r\n" + encoded + b"\r\n")
+        # Leaves one character over a multiple of 4 of the text.
+        imap = self._login(window_bytes=10000, max_message_bytes=101)
+        messages = imap.get_messages()
+
+        self.assertEqual([1, 2, 3, 4, 5, 6], [m.id for m in messages])
+        self.assertEqual("n " + "x" * 73, messages[3].body)
+
+    def test__get_messages__cache_skips_fetch(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        cache = messagecache.RawMessageCache(path)
+        self._login(criteria="ALL", cache=cache).get_messages()
+
+        imap = self._login(criteria="ALL", cache=cache)
+        messages = imap.get_messages()
+
+        expected_bodies = ["n first", "n second", "n third", "n fifth",
+                           "n sixth"]
+        self.assertEqual(expected_bodies, [m.body for m in messages])
+        self.assertEqual([], self._fetch_commands(imap))
+
+    def test__get_messages__cache_shared_between_mailboxes(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        cache = messagecache.RawMessageCache(path)
+        self._login(criteria="ALL", cache=cache).get_messages()
+
+        self._messages = {1: _create_raw_message("n archived")}
+        imap = self._login(criteria="ALL", cache=cache, mailbox="archive")
+        messages = imap.get_messages()
+
+        self.assertEqual(["n archived"], [m.body for m in messages])
+        self.assertEqual(6, len(cache))
+
+    def test__get_messages__cache_fetches_missing(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        cache = messagecache.RawMessageCache(path)
+        for uid in (1, 2):
+            cache.put(("user@None/inbox", 1, uid), self._messages[uid])
+        cache.put(("user@None/inbox", 2, 3), self._messages[3])
+
+        window_bytes = 10 * max(len(m) for m in self._messages.values())
+        imap = self._login(criteria="ALL", cache=cache,
+                           window_bytes=window_bytes)
+        messages = imap.get_messages()
+
+        self.assertEqual([1, 2, 3, 5, 6], [m.id for m in messages])
+        self.assertEqual([("UID FETCH", "3,5:6", "(RFC822.SIZE)"),
+                          ("UID FETCH", "3,5:6", "(BODY.PEEK[])")],
+                         self._fetch_commands(imap))
+        self.assertIn(("user@None/inbox", 1, 6), cache)
+
+    def test__get_messages__window_bytes_groups_fetches(self):
+        window_bytes = 2 * max(len(m) for m in self._messages.values())
+        imap = self._login(window_bytes=window_bytes)
+        messages = imap.get_messages()
+
+        self.assertEqual(5, len(messages))
+        fetches = self._fetch_commands(imap)
+        self.assertEqual([("UID FETCH", "1:3,5:6", "(RFC822.SIZE)")],
+                         fetches[:1])
+        self.assertEqual(["1:2", "3,5", "6"], [c[1] for c in fetches[1:]])
+
+    def test__get_status__many_mailboxes(self):
+        imap = self._login(uidvalidity=7)
+        actual = imap.get_status(["inbox", "archive"])
+
+        expected_status = {"UIDNEXT": 7, "UIDVALIDITY": 7, "UNSEEN": 5}
+        self.assertEqual({"inbox": expected_status,
+                          "archive": expected_status}, actual)
+        commands = [c[0] for c in imap._imap.commands]
+        self.assertNotIn("SELECT", commands)
+        expected_lines = [
+            'POWL1 STATUS "inbox" (UIDNEXT UIDVALIDITY UNSEEN)',
+            'POWL2 STATUS "archive" (UIDNEXT UIDVALIDITY UNSEEN)']
+        self.assertEqual([expected_lines], self._sent_lines(imap))
+
+    def test__get_status__many_mailboxes_one_missing(self):
+        imap = self._login()
+
+        with self.assertRaises(ValueError) as context:
+            imap.get_status(["missing", "archive"])
+
+        actual_errmsg = exception.get_message(context.exception)
+        expected_errmsg = mail._ERRMSG_INVALID_MAILBOX.format("missing")
+        self.assertEqual(expected_errmsg, actual_errmsg)
+        self.assertEqual({"archive": {"UIDNEXT": 7, "UIDVALIDITY": 1,
+                                      "UNSEEN": 5}},
+                         imap.get_status(["archive"]))
+
+    def test__iter_messages__checkpoint_stops_below_unacknowledged(self):
+        checkpoint_file = mock_filesystem.MockFile("./", "checkpoint")
+        checkpoint = mail.ImapCheckpoint(checkpoint_file)
+        imap = self._login(uidvalidity=7, batch_size=2, checkpoint=checkpoint,
+                           fetch_mode=mail.FETCH_PARTIAL)
+        messages = list(imap.iter_messages())
+        self.assertEqual("", checkpoint_file.write_data)
+
+        # The message with UID 3 failed and is not acknowledged.
+        imap.acknowledge([m for m in messages if m.id != 3])
+        self.assertEqual("7 2\n", checkpoint_file.write_data)
+
+        checkpoint_file.read_retval = [checkpoint_file.write_data]
+        retried = imap.get_messages()
+        self.assertEqual([3], [m.id for m in retried])
+        imap.acknowledge(retried)
+        self.assertEqual("7 3\n", checkpoint_file.write_data)
+
+    def test__iter_messages__checkpoint_ignores_unconsumed(self):
+        checkpoint_file = mock_filesystem.MockFile("./", "checkpoint")
+        checkpoint = mail.ImapCheckpoint(checkpoint_file)
+        imap = self._login(uidvalidity=7, batch_size=2, checkpoint=checkpoint)
+        messages = imap.iter_messages()
+
+        consumed = [next(messages), next(messages), next(messages)]
+        imap.acknowledge(consumed)
+        self.assertEqual("7 3\n", checkpoint_file.write_data)
+
+    def test__iter_messages__fetches_lazily(self):
+        imap = self._login(batch_size=2)
+        messages = imap.iter_messages()
+
+        self.assertEqual("n first", next(messages).body)
+        self.assertEqual(1, len(self._fetch_commands(imap)))
+        self.assertEqual(5, len(list(messages)) + 1)
+        self.assertEqual(3, len(self._fetch_commands(imap)))
+
+    def test__get_messages__partial_fetch_mode(self):
+        self._messages[4] = _create_raw_multipart_message("n fourth", 50000)
+        imap = self._login(fetch_mode=mail.FETCH_PARTIAL)
+        messages = imap.get_messages()
+
+        expected_bodies = ["n first", "n second", "n third", "n fourth",
+                           "n fifth", "n sixth"]
+        self.assertEqual(expected_bodies, [m.body for m in messages])
+        self.assertEqual((2015, 9, 2, 9, 0, 0), messages[3].date[:6])
+        self.assertLess(imap._imap.literal_bytes, 2000)
+
+    def test__get_messages__partial_fetch_mode_skips_attachment(self):
+        self._messages[4] = (
+            b"Date: Tue, 1 Sep 2015 08:30:00 -0000\r\n"
+            b'Content-Type: multipart/mixed; boundary="XYZ"\r\n'
+            b"\r\n"
+            b"--XYZ\r\n"
+            b"Content-Type: text/plain\r\n"
+            b'Content-Disposition: attachment; filename="notes.txt"\r\n'
+            b"\r\n"
+            b"attached notes\r\n"
+            b"--XYZ\r\n"
+            b"Content-Type: text/plain\r\n"
+            b"\r\n"
+            b"n fourth\r\n"
+            b"--XYZ--\r\n")
+        partial = self._login(fetch_mode=mail.FETCH_PARTIAL).get_messages()
+        full = self._login().get_messages()
+
+        self.assertEqual("n fourth", partial[3].body)
+        self.assertEqual([m.body for m in full], [m.body for m in partial])
+
+    def test__get_messages__partial_fetch_mode_8bit(self):
+        self._messages[4] = (
+            b"Date: Tue, 1 Sep 2015 08:30:00 -0000\r\n"
+            b'Content-Type: text/plain; charset="utf-8"\r\n'
+            b"Content-Transfer-Encoding: 8bit\r\n"
+            b"\r\n" +
+            u"n caf\u00e9 \u20ac4.50\r\n".encode("utf-8"))
+        imap = self._login(fetch_mode=mail.FETCH_PARTIAL)
+        messages = imap.get_messages()
+
+        self.assertEqual(u"n caf\u00e9 \u20ac4.50", messages[3].body)
+
+    def test__get_messages__partial_fetch_mode_does_not_flag_seen(self):
+        imap = self._login(fetch_mode=mail.FETCH_PARTIAL)
+        imap.get_messages()
+
+        for flags in imap._imap.flags.values():
+            self.assertNotIn("\\Seen", flags)
+
+    def test__idle__new_mail(self):
+        imap = self._login(capabilities=("IDLE",))
+        imap._imap.idle_responses = [b"* OK Still here\r\n",
+                                     b"* 7 EXISTS\r\n"]
+
+        self.assertTrue(imap.idle(5))
+        sent = [c[1] for c in imap._imap.commands if c[0] == "SEND"]
+        self.assertEqual([b"POWL1 IDLE\r\n", b"DONE\r\n"], sent)
+
+    def test__idle__new_mail_buffered_with_continuation(self):
+        """
+        Test with the continuation and the new mail arriving in one segment,
+        so the new mail is buffered by imaplib and never makes the socket
+        readable.
+        """
+        sock, peer = socket.socketpair()
+        self.addCleanup(sock.close)
+        self.addCleanup(peer.close)
+        connection = _SocketConnection(sock)
+        imap = mail.ImapMail()
+        imap._imap = connection
+        imap._logged_in = True
+        imap._selected = True
+        imap._capabilities = set(["IDLE"])
+        peer.sendall(b"+ idling\r\n* 7 EXISTS\r\nPOWL1 OK IDLE done\r\n")
+
+        started = time.time()
+        self.assertTrue(imap.idle(5))
+        self.assertLess(time.time() - started, 1)
+        self.assertEqual(b"POWL1 IDLE\r\nDONE\r\n", peer.recv(1024))
+
+    def test__idle__new_mail_before_idle(self):
+        imap = self._login(capabilities=("IDLE",))
+        messages = imap.get_messages()
+        imap._imap.command_responses = [b"* 7 EXISTS\r\n"]
+        imap.acknowledge(messages)
+
+        self.assertTrue(imap.idle(5))
+        sent = [c[1] for c in imap._imap.commands
+                if c[0] == "SEND" and c[1].endswith(b"IDLE\r\n")]
+        self.assertEqual([], sent)
+        self.assertFalse(imap.idle(0.01))
+
+    def test__idle__new_mail_kept_by_imaplib(self):
+        imap = self._login()
+        imap.get_messages()
+        imap._imap.untagged_responses["EXISTS"] = [b"7"]
+
+        started = time.time()
+        self.assertTrue(imap.idle(5))
+        self.assertLess(time.time() - started, 1)
+        self.assertEqual({}, imap._imap.untagged_responses)
+
+    def test__idle__timeout(self):
+        imap = self._login(capabilities=("IDLE",))
+
+        self.assertFalse(imap.idle(0.01))
+        sent = [c[1] for c in imap._imap.commands if c[0] == "SEND"]
+        self.assertEqual([b"POWL1 IDLE\r\n", b"DONE\r\n"], sent)
+
+    def test__idle__without_capability_polls(self):
+        imap = self._login()
+
+        started = time.time()
+        self.assertTrue(imap.idle(5, 0.01))
+        self.assertLess(time.time() - started, 1)
+        sent = [c for c in imap._imap.commands if c[0] == "SEND"]
+        self.assertEqual([], sent)
+
+    def test__init__invalid_acknowledge_mode(self):
+        with self.assertRaises(ValueError) as context:
+            mail.ImapMail(acknowledge_mode="forget")
+
+        actual_errmsg = exception.get_message(context.exception)
+        expected_errmsg = mail._ERRMSG_INVALID_ACKNOWLEDGE_MODE.format(
+            "forget")
+        self.assertEqual(expected_errmsg, actual_errmsg)
+
+    def test__init__invalid_batch_size(self):
+        with self.assertRaises(ValueError) as context:
+            mail.ImapMail(batch_size=0)
+
+        actual_errmsg = exception.get_message(context.exception)
+        expected_errmsg = mail._ERRMSG_INVALID_BATCH_SIZE.format(0)
+        self.assertEqual(expected_errmsg, actual_errmsg)
+
+    def test__init__invalid_byte_limit(self):
+        with self.assertRaises(ValueError) as context:
+            mail.ImapMail(window_bytes=0)
+
+        actual_errmsg = exception.get_message(context.exception)
+        expected_errmsg = mail._ERRMSG_INVALID_BYTE_LIMIT.format(0)
+        self.assertEqual(expected_errmsg, actual_errmsg)
+
+    def test__init__invalid_fetch_mode(self):
+        with self.assertRaises(ValueError) as context:
+            mail.ImapMail(fetch_mode="everything")
+
+        actual_errmsg = exception.get_message(context.exception)
+        expected_errmsg = mail._ERRMSG_INVALID_FETCH_MODE.format("everything")
+        self.assertEqual(expected_errmsg, actual_errmsg)
+
+    def test__init__invalid_move_mailbox(self):
+        with self.assertRaises(ValueError) as context:
+            mail.ImapMail(acknowledge_mode=mail.ACKNOWLEDGE_MOVE)
+
+        actual_errmsg = exception.get_message(context.exception)
+        self.assertEqual(mail._ERRMSG_INVALID_MOVE_MAILBOX, actual_errmsg)
+
+    def test__init__invalid_oversize_mode(self):
+        with self.assertRaises(ValueError) as context:
+            mail.ImapMail(oversize_mode="drop")
+
+        actual_errmsg = exception.get_message(context.exception)
+        expected_errmsg = mail._ERRMSG_INVALID_OVERSIZE_MODE.format("drop")
+        self.assertEqual(expected_errmsg, actual_errmsg)
+
+    def test__mark_seen__single_store(self):
+        imap = self._login(fetch_mode=mail.FETCH_PARTIAL)
+        messages = imap.get_messages()
+        imap.mark_seen(messages[:3])
+
+        stores = [c for c in imap._imap.commands if c[0] == "UID STORE"]
+        expected_stores = [("UID STORE", "1:3", "+FLAGS", "(\\Seen)")]
+        self.assertEqual(expected_stores, stores)
+        self.assertEqual(set(), imap._imap.flags[5])
+
+
+class MailMessageTest(unittest.TestCase):
+
+    def _create_multipart(self, parts, boundary="XYZ"):
+        raw = ("Date: Wed, 2 Sep 2015 09:00:00 -0000\r\n"
+               'Content-Type: multipart/mixed; boundary="{0}"\r\n'
+               "\r\n"
+               "preamble\r\n").format(boundary)
+        for part in parts:
+            raw += "--{0}\r\n{1}\r\n".format(boundary, part)
+        raw += "--{0}--\r\n".format(boundary)
+        return raw.encode("ascii")
+
+    def test__body__base64(self):
+        encoded = base64.b64encode("n café".encode("utf-8")).decode("ascii")
+        raw = self._create_multipart([
+            'Content-Type: text/plain; charset="utf-8"\r\n'
+            "Content-Transfer-Encoding: base64\r\n\r\n" + encoded])
+        self.assertEqual("n café", mail.MailMessage.from_bytes(raw).body)
+
+    def test__body__malformed_base64(self):
+        encoded = base64.b64encode(b"n coffee").decode("ascii")
+        raw = self._create_multipart([
+            "Content-Type: text/plain\r\n"
+            "Content-Transfer-Encoding: base64\r\n\r\n" +
+            encoded[:4] + " *\r\n" + encoded[4:] + "Q"])
+        self.assertEqual("n coffee", mail.MailMessage.from_bytes(raw).body)
+
+    def test__body__first_text_part(self):
+        raw = self._create_multipart([
+            "Content-Type: text/plain\r\n\r\nn first",
+            "Content-Type: text/plain\r\n\r\nn second"])
+        self.assertEqual("n first", mail.MailMessage.from_bytes(raw).body)
+
+    def test__body__matches_parsed_message(self):
+        raw = _create_raw_multipart_message("n note", 100)
+        parsed = mail.MailMessage(email.message_from_bytes(raw))
+        self.assertEqual(parsed.body, mail.MailMessage.from_bytes(raw).body)
+        self.assertEqual(parsed.date, mail.MailMessage.from_bytes(raw).date)
+
+    def test__body__nested_alternative(self):
+        alternative = ('Content-Type: multipart/alternative; boundary="ALT"'
+                       "\r\n\r\n"
+                       "--ALT\r\nContent-Type: text/html\r\n\r\n<b>n</b>"
+                       "\r\n--ALT\r\nContent-Type: text/plain\r\n\r\n"
+                       "n nested\r\n--ALT--")
+        raw = self._create_multipart([
+            "Content-Type: image/png\r\n\r\nxxxx", alternative])
+        self.assertEqual("n nested", mail.MailMessage.from_bytes(raw).body)
+
+    def test__body__quoted_printable(self):
+        raw = self._create_multipart([
+            'Content-Type: text/plain; charset="utf-8"\r\n'
+            "Content-Transfer-Encoding: quoted-printable\r\n\r\n"
+            "n caf=C3=A9 and a soft=\r\n break"])
+        self.assertEqual("n café and a soft break",
+                         mail.MailMessage.from_bytes(raw).body)
+
+    def test__body__skips_attachment(self):
+        raw = self._create_multipart([
+            "Content-Type: text/plain\r\n"
+            "Content-Disposition: attachment; filename=a.txt\r\n\r\n"
+            "attached",
+            "Content-Type: text/plain\r\n\r\nn body"])
+        self.assertEqual("n body", mail.MailMessage.from_bytes(raw).body)
+
+    def test__extract_text_plain__stops_after_text(self):
+        raw = _create_raw_multipart_message("n note", 50000)
+        lines = iter(io.BytesIO(raw))
+        headers, text = mail._extract_text_plain(lines)
+
+        self.assertEqual("n note", text.strip())
+        self.assertIn(b"Content-Type: image/png\r\n", list(lines))
+
+    def test__init__extracts_fields_once(self):
+        parsed = email.message_from_bytes(_create_raw_multipart_message(
+            "n note", 100))
+        message = mail.MailMessage(parsed, 3)
+        parsed.set_payload([])
+        del parsed["Date"]
+
+        self.assertEqual("n note", message.body)
+        self.assertEqual((2015, 9, 2, 9, 0, 0), message.date[:6])
+        self.assertEqual("<multipart@test.com>", message.message_id)
+
+    def test__init__slots(self):
+        message = mail.MailMessage.from_bytes(_create_raw_message("n note"))
+        self.assertFalse(hasattr(message, "__dict__"))
+        self.assertIsNone(message.message_id)
+
+    def test__message__parsed_on_demand(self):
+        raw = _create_raw_message("n note")
+        message = mail.MailMessage.from_bytes(raw, 3)
+        self.assertEqual("n note", message.message.get_payload().strip())
+        self.assertEqual(3, message.id)
+
+    def test__release__keeps_fields(self):
+        raw = _create_raw_multipart_message("n note", 100)
+        message = mail.MailMessage.from_bytes(raw, 3)
+        message.release()
+
+        self.assertIsNone(message.message)
+        self.assertEqual("n note", message.body)
+        self.assertEqual(3, message.id)
+        self.assertEqual("<multipart@test.com>", message.message_id)
+
+
+class ImapSearchFilterTest(unittest.TestCase):
+
+    def test__compile__all_keys(self):
+        search_filter = mail.ImapSearchFilter(
+            senders=["me@test.com"],
+            subject_prefix="powl:",
+            since=datetime.date(2015, 9, 1),
+            before=time.strptime("2015-10-02", "%Y-%m-%d"),
+            max_size=10000)
+
+        expected = ('(UNSEEN FROM "me@test.com" SUBJECT "powl:" '
+                    'SINCE 1-Sep-2015 BEFORE 2-Oct-2015 SMALLER 10000)')
+        self.assertEqual(expected, search_filter.compile())
+
+    def test__compile__empty(self):
+        search_filter = mail.ImapSearchFilter(unseen=False)
+        self.assertEqual("(ALL)", search_filter.compile())
+
+    def test__compile__quotes_values(self):
+        search_filter = mail.ImapSearchFilter(subject_prefix='say "hi"\\')
+        expected = '(UNSEEN SUBJECT "say \\"hi\\"\\\\")'
+        self.assertEqual(expected, search_filter.compile())
+
+    def test__compile__non_ascii_value(self):
+        search_filter = mail.ImapSearchFilter(subject_prefix=u"Caf\u00e9")
+
+        with self.assertRaises(ValueError) as context:
+            search_filter.compile()
+
+        actual_errmsg = exception.get_message(context.exception)
+        expected_errmsg = mail._ERRMSG_NON_ASCII_SEARCH.format(u"Caf\u00e9")
+        self.assertEqual(expected_errmsg, actual_errmsg)
+
+    def test__compile__senders_nested_or(self):
+        search_filter = mail.ImapSearchFilter(
+            senders=["a@test.com", "b@test.com", "test.org"], unseen=False)
+
+        expected = ('(OR OR FROM "a@test.com" FROM "b@test.com" '
+                    'FROM "test.org")')
+        self.assertEqual(expected, search_filter.compile())
+
+    def test__init__invalid_max_size(self):
+        with self.assertRaises(ValueError) as context:
+            mail.ImapSearchFilter(max_size=0)
+
+        actual_errmsg = exception.get_message(context.exception)
+        expected_errmsg = mail._ERRMSG_INVALID_MAX_SIZE.format(0)
+        self.assertEqual(expected_errmsg, actual_errmsg)
+
+
+class ImapSessionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self._connections = []
+        self._pool = mail.ImapSessionPool(keepalive_interval=300,
+                                          mail_factory=self._create_mail)
+
+    def tearDown(self):
+        self._pool.close()
+
+    def _create_imap(self, server):
+        imap = mock_imap.MockImap({1: _create_raw_message("n first")})
+        self._connections.append(imap)
+        return imap
+
+    def _create_mail(self, mailbox):
+        return mail.ImapMail(mailbox, imap_class=self._create_imap)
+
+    def test__get__reuses_session(self):
+        first = self._pool.get("mail.test.com", "user", "password")
+        second = self._pool.get("mail.test.com", "user", "password")
+
+        self.assertIs(first, second)
+        self.assertEqual(1, len(self._connections))
+
+    def test__get__session_per_mailbox(self):
+        self._pool.get("mail.test.com", "user", "password", "inbox")
+        self._pool.get("mail.test.com", "user", "password", "archive")
+        self.assertEqual(2, len(self._connections))
+
+    def test__keepalive__reconnects_dead_session(self):
+        self._pool._keepalive_interval = 0
+        session = self._pool.get("mail.test.com", "user", "password")
+        self._connections[0].alive = False
+
+        self._pool.keepalive()
+
+        self.assertEqual(2, len(self._connections))
+        self.assertTrue(session.is_alive())
+
+    def test__keepalive__sends_noop(self):
+        self._pool._keepalive_interval = 0
+        self._pool.get("mail.test.com", "user", "password")
+        self._pool.keepalive()
+
+        self.assertIn(("NOOP",), self._connections[0].commands)
+        self.assertEqual(1, len(self._connections))
+
+    def test__pooled_mail__reconnects_on_dead_socket(self):
+        pooled = mail.PooledImapMail(self._pool)
+        pooled.connect("mail.test.com")
+        pooled.login("user", "password")
+        self._connections[0].alive = False
+
+        messages = pooled.get_messages()
+
+        self.assertEqual(["n first"], [m.body for m in messages])
+        self.assertEqual(2, len(self._connections))
+
+
+class ParseFetchResponseTest(unittest.TestCase):
+
+    def test__parse_fetch_response__keyed_by_uid(self):
+        response = [(b"1 (UID 3 BODY[] {5}", b"hello"), b")"]
+        expected = {3: {"UID": "3", "BODY[]": b"hello"}}
+        self.assertEqual(expected, mail.parse_fetch_response(response))
+
+    def test__parse_fetch_response__ignores_response_without_uid(self):
+        response = [(b"1 (UID 3 BODY[] {5}", b"hello"), b")",
+                    b"3 (FLAGS (\\Seen))"]
+        expected = {3: {"UID": "3", "BODY[]": b"hello"}}
+        self.assertEqual(expected, mail.parse_fetch_response(response))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""Tests for powl.messagecache."""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from powl import exception
+from powl import messagecache
+
+
+class RawMessageCacheTest(unittest.TestCase):
+    """
+    Class for testing powl.messagecache.RawMessageCache.
+    """
+
+    def setUp(self):
+        self._path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._path)
+
+    def _set_used(self, key, seconds_ago):
+        filename = os.path.join(self._path, "{0}-{1}-{2}.eml".format(*key))
+        used = time.time() - seconds_ago
+        os.utime(filename, (used, used))
+
+    def test__get__missing_key(self):
+        cache = messagecache.RawMessageCache(self._path)
+        self.assertIsNone(cache.get(("inbox", 1, 1)))
+
+    def test__get__keyed_by_mailbox(self):
+        cache = messagecache.RawMessageCache(self._path)
+        cache.put(("user@server/inbox", 1, 1), b"inbox")
+        cache.put(("user@server/other-box", 1, 1), b"other")
+        cache = messagecache.RawMessageCache(self._path)
+
+        self.assertEqual(b"inbox", cache.get(("user@server/inbox", 1, 1)))
+        self.assertEqual(b"other", cache.get(("user@server/other-box", 1, 1)))
+        self.assertIsNone(cache.get(("other@server/inbox", 1, 1)))
+
+    def test__get__persists_across_instances(self):
+        messagecache.RawMessageCache(self._path).put(("inbox", 7, 3), b"raw")
+        cache = messagecache.RawMessageCache(self._path)
+
+        self.assertIn(("inbox", 7, 3), cache)
+        self.assertEqual(b"raw", cache.get(("inbox", 7, 3)))
+        self.assertEqual(3, cache.size)
+
+    def test__init__evicts_least_recently_used_file(self):
+        cache = messagecache.RawMessageCache(self._path)
+        cache.put(("inbox", 1, 1), b"first")
+        cache.put(("inbox", 1, 2), b"second")
+        self._set_used(("inbox", 1, 1), 10)
+        self._set_used(("inbox", 1, 2), 20)
+
+        cache = messagecache.RawMessageCache(self._path, 6)
+
+        self.assertEqual(b"first", cache.get(("inbox", 1, 1)))
+        self.assertNotIn(("inbox", 1, 2), cache)
+        self.assertEqual(["inbox-1-1.eml"], os.listdir(self._path))
+
+    def test__init__invalid_max_bytes(self):
+        with self.assertRaises(ValueError) as context:
+            messagecache.RawMessageCache(self._path, 0)
+        expected = messagecache._ERRMSG_INVALID_MAX_BYTES.format(0)
+        self.assertEqual(expected, exception.get_message(context.exception))
+
+    def test__iter_items__key_order(self):
+        cache = messagecache.RawMessageCache(self._path)
+        cache.put(("inbox", 1, 10), b"tenth")
+        cache.put(("inbox", 1, 2), b"second")
+
+        expected = [(("inbox", 1, 2), b"second"),
+                    (("inbox", 1, 10), b"tenth")]
+        self.assertEqual(expected, list(cache.iter_items()))
+
+    def test__put__evicts_least_recently_used(self):
+        cache = messagecache.RawMessageCache(self._path, 10)
+        cache.put(("inbox", 1, 1), b"aaaa")
+        cache.put(("inbox", 1, 2), b"bbbb")
+        cache.get(("inbox", 1, 1))
+        cache.put(("inbox", 1, 3), b"cccc")
+
+        self.assertIn(("inbox", 1, 1), cache)
+        self.assertNotIn(("inbox", 1, 2), cache)
+        self.assertIn(("inbox", 1, 3), cache)
+        self.assertEqual(8, cache.size)
+        self.assertEqual(2, len(os.listdir(self._path)))
+
+    def test__put__too_big(self):
+        cache = messagecache.RawMessageCache(self._path, 3)
+        cache.put(("inbox", 1, 1), b"raw message")
+
+        self.assertNotIn(("inbox", 1, 1), cache)
+        self.assertEqual([], os.listdir(self._path))
+
+    def test__put__replaces_message(self):
+        cache = messagecache.RawMessageCache(self._path)
+        cache.put(("inbox", 1, 1), b"first")
+        cache.put(("inbox", 1, 1), b"replaced")
+
+        self.assertEqual(b"replaced", cache.get(("inbox", 1, 1)))
+        self.assertEqual(8, cache.size)
+        self.assertEqual(1, len(cache))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""Tests for powl.messageindex."""
+import os
+import shutil
+import tempfile
+import unittest
+from powl import exception
+from powl import messageindex
+
+
+class BloomFilterTest(unittest.TestCase):
+    """
+    Class for testing powl.messageindex.BloomFilter.
+    """
+
+    def setUp(self):
+        self._path = tempfile.mkdtemp()
+        self._filename = os.path.join(self._path, "index.bloom")
+
+    def tearDown(self):
+        shutil.rmtree(self._path)
+
+    def test__contains__added_keys(self):
+        bloom = messageindex.BloomFilter(self._filename, 100)
+        keys = ["<{0}@test.com>".format(i) for i in range(100)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        bloom.close()
+
+    def test__contains__false_positive_rate(self):
+        bloom = messageindex.BloomFilter(self._filename, 1000, 0.01)
+        for i in range(1000):
+            bloom.add("<{0}@test.com>".format(i))
+        false_positives = len([i for i in range(1000, 11000)
+                               if "<{0}@test.com>".format(i) in bloom])
+        self.assertLess(false_positives, 200)
+        bloom.close()
+
+    def test__init__invalid_capacity(self):
+        with self.assertRaises(ValueError) as context:
+            messageindex.BloomFilter(self._filename, 0)
+        expected = messageindex._ERRMSG_INVALID_CAPACITY.format(0)
+        self.assertEqual(expected, exception.get_message(context.exception))
+
+    def test__init__invalid_error_rate(self):
+        with self.assertRaises(ValueError) as context:
+            messageindex.BloomFilter(self._filename, 10, 1)
+        expected = messageindex._ERRMSG_INVALID_ERROR_RATE.format(1)
+        self.assertEqual(expected, exception.get_message(context.exception))
+
+    def test__init__persists_bits(self):
+        bloom = messageindex.BloomFilter(self._filename, 100)
+        self.assertTrue(bloom.created)
+        bloom.add("<a@test.com>")
+        bloom.close()
+
+        bloom = messageindex.BloomFilter(self._filename, 100)
+        self.assertFalse(bloom.created)
+        self.assertIn("<a@test.com>", bloom)
+        bloom.close()
+
+
+class ProcessedMessageIndexTest(unittest.TestCase):
+    """
+    Class for testing powl.messageindex.ProcessedMessageIndex.
+    """
+
+    def setUp(self):
+        self._path = tempfile.mkdtemp()
+        self._filename = os.path.join(self._path, "processed.db")
+
+    def tearDown(self):
+        shutil.rmtree(self._path)
+
+    def test__add__persists_across_instances(self):
+        index = messageindex.ProcessedMessageIndex(self._filename, 100)
+        index.add("<a@test.com>")
+        index.add("<a@test.com>")
+        index.close()
+
+        index = messageindex.ProcessedMessageIndex(self._filename, 100)
+        self.assertIn("<a@test.com>", index)
+        self.assertNotIn("<b@test.com>", index)
+        index.close()
+
+    def test__contains__bloom_false_positive(self):
+        index = messageindex.ProcessedMessageIndex(self._filename, 100)
+        # Set the bits of a key without recording it in the table.
+        index._bloom.add("<a@test.com>")
+        self.assertNotIn("<a@test.com>", index)
+        index.close()
+
+    def test__init__rebuilds_missing_bloom_filter(self):
+        index = messageindex.ProcessedMessageIndex(self._filename, 100)
+        index.add("<a@test.com>")
+        index.close()
+        os.remove(self._filename + ".bloom")
+
+        index = messageindex.ProcessedMessageIndex(self._filename, 100)
+        self.assertIn("<a@test.com>", index._bloom)
+        index.close()
+
+    def test__init__rebuilds_resized_bloom_filter(self):
+        index = messageindex.ProcessedMessageIndex(self._filename, 100)
+        index.add("<a@test.com>")
+        index.close()
+
+        index = messageindex.ProcessedMessageIndex(self._filename, 100000)
+        self.assertIn("<a@test.com>", index)
+        index.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
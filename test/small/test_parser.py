@@ -1,8 +1,11 @@
 #!/usr/bin/env python
 import unittest
+from powl import actiondata
 from powl import actiontype
 from powl import exception
 from powl import parser
+from powl import prefixtrie
+from powl import result
 
 class ActionItemParserTest(unittest.TestCase):
 
@@ -20,6 +23,17 @@ class ActionItemParserTest(unittest.TestCase):
         self.assertEqual(expected_action_key, actual_action_key)
         self.assertEqual(expected_data, actual_data)
 
+    def test__parse__bodycomposition__key_is_bo(self):
+        """
+        Test with a prefix of the body composition action type.
+        """
+        string = "bo -m 136 -f 13.5"
+        expected_action_key = actiontype.BODY_COMPOSITION
+        expected_data = "-m 136 -f 13.5"
+        actual_action_key, actual_data = self.parser.parse(string)
+        self.assertEqual(expected_action_key, actual_action_key)
+        self.assertEqual(expected_data, actual_data)
+
     def test__parse__bodycomposition__key_is_bodycomposition(self):
         """
         Test with string for a body composition action.
@@ -64,6 +78,17 @@ class ActionItemParserTest(unittest.TestCase):
         self.assertEqual(expected_action_key, actual_action_key)
         self.assertEqual(expected_data, actual_data)
 
+    def test__parse__transaction__key_is_trans(self):
+        """
+        Test with a prefix of the transaction action type.
+        """
+        string = "trans -d out -c debitcard -a 10 -m dinner"
+        expected_action_key = actiontype.TRANSACTION
+        expected_data = "-d out -c debitcard -a 10 -m dinner"
+        actual_action_key, actual_data = self.parser.parse(string)
+        self.assertEqual(expected_action_key, actual_action_key)
+        self.assertEqual(expected_data, actual_data)
+
     def test__parse__transaction__key_is_transaction(self):
         """
         Test with string for a transaction action.
@@ -75,6 +100,20 @@ class ActionItemParserTest(unittest.TestCase):
         self.assertEqual(expected_action_key, actual_action_key)
         self.assertEqual(expected_data, actual_data)
 
+    def test__parse__ambiguous_action(self):
+        """
+        Test with a prefix shared by different actions.
+        """
+        trie = prefixtrie.PrefixTrie({"note": actiontype.NOTE,
+                                      "notify": actiontype.TRANSACTION})
+        item_parser = parser.ActionItemParser(trie)
+        expected_message = ("action key (not) is ambiguous between "
+                            "note, notify")
+        with self.assertRaises(KeyError) as context:
+            item_parser.parse("not this")
+        actual_message = exception.get_message(context.exception)
+        self.assertEqual(expected_message, actual_message)
+
     def test__parse__unknown_action(self):
         """
         Test with string for an unknown action.
@@ -86,6 +125,37 @@ class ActionItemParserTest(unittest.TestCase):
         actual_message = exception.get_message(context.exception)
         self.assertEqual(expected_message, actual_message)
 
+    def test__try_parse__ambiguous_action(self):
+        trie = prefixtrie.PrefixTrie({"note": actiontype.NOTE,
+                                      "notify": actiontype.TRANSACTION})
+        parsed = parser.ActionItemParser(trie).try_parse("no this")
+        self.assertFalse(parsed.ok)
+        self.assertEqual(result.ERROR_AMBIGUOUS_ACTION, parsed.error.code)
+        self.assertEqual((0, 2), parsed.error.span)
+
+    def test__try_parse__empty_action_key(self):
+        parsed = self.parser.try_parse(" n note")
+        self.assertFalse(parsed.ok)
+        self.assertEqual(result.ERROR_UNKNOWN_ACTION, parsed.error.code)
+
+    def test__try_parse__no_data(self):
+        parsed = self.parser.try_parse("note")
+        self.assertFalse(parsed.ok)
+        self.assertEqual(result.ERROR_NOT_ENOUGH_ARGUMENTS, parsed.error.code)
+
+    def test__try_parse__success(self):
+        parsed = self.parser.try_parse("n a note")
+        self.assertTrue(parsed.ok)
+        self.assertEqual((actiontype.NOTE, "a note"), parsed.value)
+
+    def test__try_parse__unknown_action(self):
+        parsed = self.parser.try_parse("write this message")
+        self.assertFalse(parsed.ok)
+        self.assertEqual(result.ERROR_UNKNOWN_ACTION, parsed.error.code)
+        self.assertEqual("action key (write) is unknown",
+                         parsed.error.message)
+        self.assertEqual((0, 5), parsed.error.span)
+
 
 class BodyCompositionDataFlagParserTest(unittest.TestCase):
 
@@ -148,6 +218,15 @@ class BodyCompositionDataFlagParserTest(unittest.TestCase):
         self.assertEqual(expected_mass, actual.mass)
         self.assertEqual(expected_fat_percentage, actual.fat_percentage)
 
+    def test__parse_many__columns_and_errors(self):
+        strings = ["-m 200.1 -f 15.2", "-m 100", "-m 180 -f 20"]
+        columns, errors = self.parser.parse_many(strings)
+        self.assertEqual([0, 2], list(columns.indexes))
+        self.assertEqual([200.1, 180.0], list(columns.masses))
+        self.assertEqual([15.2, 20.0], list(columns.fat_percentages))
+        expected_message = "fat percentage was not parsed from (-m 100)"
+        self.assertEqual([(1, expected_message)], errors)
+
 
 class BodyCompositionDataPositionalParserTest(unittest.TestCase):
 
@@ -209,6 +288,151 @@ class BodyCompositionDataPositionalParserTest(unittest.TestCase):
         self.assertEqual(expected_mass, actual.mass)
         self.assertEqual(expected_fat_percentage, actual.fat_percentage)
 
+    def test__parse_many__columns_and_errors(self):
+        strings = ["200.1 15.2", "200", "200 1i5", "180 20"]
+        columns, errors = self.parser.parse_many(strings)
+        self.assertEqual(2, len(columns))
+        self.assertEqual([0, 3], list(columns.indexes))
+        self.assertEqual([200.1, 180.0], list(columns.masses))
+        self.assertEqual([15.2, 20.0], list(columns.fat_percentages))
+        self.assertEqual([(1, "not enough arguments from (200)"),
+                          (2, "fat percentage (1i5) is not a number")],
+                         errors)
+
+    def test__try_parse__span_of_invalid_number(self):
+        parsed = self.parser.try_parse("15 1i5")
+        self.assertEqual(result.ERROR_INVALID_NUMBER, parsed.error.code)
+        self.assertEqual((3, 6), parsed.error.span)
+
+    def test__try_parse__span_without_extra_spaces(self):
+        parsed = self.parser.try_parse("15   1i5")
+        self.assertEqual((5, 8), parsed.error.span)
+
+
+class CachingParserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = parser.CachingParser(parser.ActionItemParser(), 2)
+
+    def test__init__invalid_max_size(self):
+        with self.assertRaises(ValueError) as context:
+            parser.CachingParser(parser.ActionItemParser(), 0)
+        actual_message = exception.get_message(context.exception)
+        self.assertEqual("cache size (0) must be at least 1", actual_message)
+
+    def test__parse__cached_error_raised_each_time(self):
+        for _ in range(2):
+            with self.assertRaises(KeyError) as context:
+                self.parser.parse("write this message")
+            actual_message = exception.get_message(context.exception)
+            self.assertEqual("action key (write) is unknown", actual_message)
+        self.assertEqual(1, self.parser.hits)
+
+    def test__parse__counts_hits_and_misses(self):
+        first = self.parser.parse("a 4.50 cash coffee")
+        second = self.parser.parse("a 4.50 cash coffee")
+        self.assertEqual((actiontype.TRANSACTION, "4.50 cash coffee"), first)
+        self.assertEqual(first, second)
+        self.assertEqual(1, self.parser.hits)
+        self.assertEqual(1, self.parser.misses)
+
+    def test__try_parse__same_result_as_uncached(self):
+        item_parser = parser.ActionItemParser()
+        for item in (" n note", "n note\r\n", "a 4.50 cash coffee"):
+            cached = self.parser.try_parse(item)
+            uncached = item_parser.try_parse(item)
+            self.assertEqual(uncached.value, cached.value)
+            self.assertEqual(uncached.ok, cached.ok)
+        self.assertEqual(result.ERROR_UNKNOWN_ACTION,
+                         self.parser.try_parse(" n note").error.code)
+
+    def test__try_parse__evicts_least_recently_used(self):
+        self.parser.try_parse("n first")
+        self.parser.try_parse("n second")
+        self.parser.try_parse("n first")
+        self.parser.try_parse("n third")
+        self.parser.try_parse("n first")
+        self.parser.try_parse("n second")
+
+        self.assertEqual(2, self.parser.size)
+        self.assertEqual(2, self.parser.hits)
+        self.assertEqual(4, self.parser.misses)
+
+    def test__try_parse__returns_frozen_data(self):
+        data_parser = parser.CachingParser(
+            parser.TransactionDataFlagParser())
+        first = data_parser.try_parse("-d mis -c ca -a 5 -m coffee")
+        with self.assertRaises(AttributeError):
+            first.value.memo = "changed"
+        second = data_parser.try_parse("-d mis -c ca -a 5 -m coffee")
+        self.assertEqual("coffee", second.value.memo)
+        self.assertIs(first.value, second.value)
+        self.assertEqual(1, data_parser.hits)
+
+
+class FlagTokenizerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tokenizer = parser.FlagTokenizer({"a": "amount", "m": "memo"})
+
+    def test__fill__attached_value(self):
+        data = self.tokenizer.fill('-a4.50 -m"coffee beans"',
+                                   actiondata.TransactionData())
+        self.assertEqual("4.50", data.amount)
+        self.assertEqual("coffee beans", data.memo)
+
+    def test__fill__attached_word_of_known_flag(self):
+        data = self.tokenizer.fill("-a 5 -mcoffee",
+                                   actiondata.TransactionData())
+        self.assertEqual("5", data.amount)
+        self.assertEqual("coffee", data.memo)
+
+    def test__fill__attached_word_of_unknown_flag_is_text(self):
+        data = self.tokenizer.fill("-a 5 -m well -done",
+                                   actiondata.TransactionData())
+        self.assertEqual("well -done", data.memo)
+
+    def test__fill__escaped_dash(self):
+        data = self.tokenizer.fill(r"-m \-a note -a 5",
+                                   actiondata.TransactionData())
+        self.assertEqual("-a note", data.memo)
+        self.assertEqual("5", data.amount)
+
+    def test__fill__hyphenated_value(self):
+        data = self.tokenizer.fill("-m well-known - shop -a 5",
+                                   actiondata.TransactionData())
+        self.assertEqual("well-known - shop", data.memo)
+
+    def test__fill__last_value_wins(self):
+        data = self.tokenizer.fill("-a 1 -a 2", actiondata.TransactionData())
+        self.assertEqual("2", data.amount)
+
+    def test__fill__negative_value(self):
+        data = self.tokenizer.fill("-a -5.25 -m refund",
+                                   actiondata.TransactionData())
+        self.assertEqual("-5.25", data.amount)
+        self.assertEqual("refund", data.memo)
+
+    def test__fill__quoted_value(self):
+        data = self.tokenizer.fill(r'-m "say \"hi\" -a 3" -a 5',
+                                   actiondata.TransactionData())
+        self.assertEqual('say "hi" -a 3', data.memo)
+        self.assertEqual("5", data.amount)
+
+    def test__fill__spans(self):
+        spans = {}
+        string = r'-a  5.25  -m "say \"hi\""  \-x'
+        self.tokenizer.fill(string, actiondata.TransactionData(), spans)
+        self.assertEqual("5.25", string[slice(*spans["amount"])])
+        self.assertEqual(r'"say \"hi\""  \-x',
+                         string[slice(*spans["memo"])])
+
+    def test__fill__unknown_flag_is_ignored(self):
+        data = self.tokenizer.fill("-x ignored -a 5",
+                                   actiondata.TransactionData())
+        self.assertEqual("5", data.amount)
+        self.assertEqual("", data.memo)
+
 
 class TransactionDataFlagParser(unittest.TestCase):
 
@@ -234,6 +458,13 @@ class TransactionDataFlagParser(unittest.TestCase):
         self.assertEqual(amount, actual.amount)
         self.assertEqual(memo, actual.memo)
 
+    def test__parse__compact_form(self):
+        data = self.parser.parse("-dcash -ccoffee -a4.50 -mlatte")
+        self.assertEqual("cash", data.debit)
+        self.assertEqual("coffee", data.credit)
+        self.assertEqual("4.50", data.amount)
+        self.assertEqual("latte", data.memo)
+
     def test__parse__amount_is_not_a_number(self):
         """
         Test that the method throws when amount is not a number.
@@ -306,6 +537,49 @@ class TransactionDataFlagParser(unittest.TestCase):
         self.assertEqual(amount, actual.amount)
         self.assertEqual(memo, actual.memo)
 
+    def test__parse__negative_amount_and_hyphenated_memo(self):
+        """
+        Test that dashes within values are not taken as flags.
+        """
+        string = "-d cash -c mis -a -12.50 -m re-stock refund"
+        actual = self.parser.parse(string)
+        self.assertEqual("-12.50", actual.amount)
+        self.assertEqual("re-stock refund", actual.memo)
+
+    def test__parse_many__columns_and_errors(self):
+        strings = ["-d mis -c ca -a 5.25 -m coffee", "-d mis -c ca -a 5",
+                   "-d ent -c cc -a -12 -m refund"]
+        columns, errors = self.parser.parse_many(strings)
+        self.assertEqual([0, 2], list(columns.indexes))
+        self.assertEqual(["mis", "ent"], columns.debits)
+        self.assertEqual(["ca", "cc"], columns.credits)
+        self.assertEqual([5.25, -12.0], list(columns.amounts))
+        self.assertEqual(["coffee", "refund"], columns.memos)
+        expected_message = "memo is missing from ({0})".format(strings[1])
+        self.assertEqual([(1, expected_message)], errors)
+
+    def test__try_parse__invalid_amount(self):
+        string = "-d phone -c bank -a 35b -m bill"
+        parsed = self.parser.try_parse(string)
+        self.assertEqual(result.ERROR_INVALID_NUMBER, parsed.error.code)
+        self.assertEqual("35b", string[slice(*parsed.error.span)])
+
+    def test__try_parse__invalid_amount_also_in_other_value(self):
+        string = "-d 5x -c bank -a 5x -m bill"
+        parsed = self.parser.try_parse(string)
+        self.assertEqual((17, 19), parsed.error.span)
+
+    def test__try_parse__invalid_amount_quoted(self):
+        string = '-d phone -c bank -a "3 5" -m bill'
+        parsed = self.parser.try_parse(string)
+        self.assertEqual('"3 5"', string[slice(*parsed.error.span)])
+
+    def test__try_parse__missing_value(self):
+        parsed = self.parser.try_parse("-d phone -c bank -m bill")
+        self.assertFalse(parsed.ok)
+        self.assertEqual(result.ERROR_MISSING_VALUE, parsed.error.code)
+        self.assertIsNone(parsed.error.span)
+
 
 class TransactionDataPositionalParser(unittest.TestCase):
 
@@ -392,6 +666,19 @@ class TransactionDataPositionalParser(unittest.TestCase):
         self.assertEqual(amount, actual.amount)
         self.assertEqual(memo, actual.memo)
 
+    def test__parse_many__columns_and_errors(self):
+        strings = ["5.25 mis ca coffee", "5 mis ca", "5b mis ca bill",
+                   "12 ent cc movie night"]
+        columns, errors = self.parser.parse_many(iter(strings))
+        self.assertEqual([0, 3], list(columns.indexes))
+        self.assertEqual(["mis", "ent"], columns.debits)
+        self.assertEqual(["ca", "cc"], columns.credits)
+        self.assertEqual("d", columns.amounts.typecode)
+        self.assertEqual([5.25, 12.0], list(columns.amounts))
+        self.assertEqual(["coffee", "movie night"], columns.memos)
+        self.assertEqual([(1, "not enough arguments from (5 mis ca)"),
+                          (2, "amount (5b) is not a number")], errors)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+import unittest
+from powl import exception
+from powl import prefixtrie
+
+class PrefixTrieTest(unittest.TestCase):
+
+    def setUp(self):
+        self.trie = prefixtrie.PrefixTrie({
+            "a": "transaction",
+            "bodycomposition": "bodycomposition",
+            "note": "note",
+            "notify": "notify",
+            "transaction": "transaction",
+            "transfer": "transaction"
+        })
+
+    def test__candidates__ambiguous_prefix(self):
+        self.assertEqual(("note", "notify"), self.trie.candidates("not"))
+
+    def test__candidates__unknown_prefix(self):
+        self.assertEqual((), self.trie.candidates("write"))
+
+    def test__contains(self):
+        self.assertIn("b", self.trie)
+        self.assertNotIn("no", self.trie)
+        self.assertNotIn("write", self.trie)
+
+    def test__get__ambiguous_prefix(self):
+        self.assertIsNone(self.trie.get("no"))
+
+    def test__get__default(self):
+        self.assertEqual("default", self.trie.get("write", "default"))
+
+    def test__get__empty_key(self):
+        self.assertIsNone(self.trie.get(""))
+        self.assertEqual((), self.trie.candidates(""))
+
+    def test__get__exact_key_is_prefix_of_other_key(self):
+        trie = prefixtrie.PrefixTrie({"note": "note", "notes": "list"})
+        self.assertEqual("note", trie.get("note"))
+        self.assertEqual("list", trie.get("notes"))
+        self.assertIsNone(trie.get("not"))
+
+    def test__get__full_key(self):
+        self.assertEqual("bodycomposition", self.trie.get("bodycomposition"))
+
+    def test__get__key_longer_than_keys(self):
+        self.assertIsNone(self.trie.get("notes"))
+
+    def test__get__prefix(self):
+        self.assertEqual("bodycomposition", self.trie.get("b"))
+        self.assertEqual("note", self.trie.get("note"))
+
+    def test__get__prefix_of_keys_with_same_value(self):
+        """
+        Test with a prefix of different keys that map to one value.
+        """
+        self.assertEqual("transaction", self.trie.get("trans"))
+
+    def test__resolve__ambiguous_prefix(self):
+        expected_message = "key (no) is ambiguous between note, notify"
+        with self.assertRaises(KeyError) as context:
+            self.trie.resolve("no")
+        actual_message = exception.get_message(context.exception)
+        self.assertEqual(expected_message, actual_message)
+
+    def test__resolve__prefix(self):
+        self.assertEqual("notify", self.trie.resolve("noti"))
+
+    def test__resolve__empty_key(self):
+        with self.assertRaises(KeyError) as context:
+            self.trie.resolve("")
+        actual_message = exception.get_message(context.exception)
+        self.assertEqual("key () is unknown", actual_message)
+
+    def test__resolve__unknown_key(self):
+        expected_message = "key (write) is unknown"
+        with self.assertRaises(KeyError) as context:
+            self.trie.resolve("write")
+        actual_message = exception.get_message(context.exception)
+        self.assertEqual(expected_message, actual_message)
+
+
+if __name__ == '__main__':
+    unittest.main()
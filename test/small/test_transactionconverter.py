@@ -396,6 +396,47 @@ class TestQifConverter(unittest.TestCase):
         self.assertEqual(expected_message, actual_message)
 
 
+
+class TestQifConverterAccountKeys(unittest.TestCase):
+    """
+    Class for testing the account key prefixes of the QifConverter.
+    """
+
+    def setUp(self):
+        self._file = filesystem.MockFile("./", "cash.qif")
+        self._converter = transactionconverter.QifConverter(
+            log.MockLog(),
+            {"cash": self._file},
+            {"cash": "Cash"},
+            {"cash": "Assets:Cash"},
+            {"visa": "Liabilities:Visa"},
+            {"earnings": "Revenue:Earnings"},
+            {"entertainment": "Expenses:Entertainment",
+             "ent": "Expenses:Entertainment",
+             "food": "Expenses:Food"})
+
+    def test__convert__account_key_prefix(self):
+        date = time.localtime()
+        record, qif_file = self._converter.convert(date, "enter", "ca",
+                                                   "5.25", "movie")
+        self.assertIs(self._file, qif_file)
+        self.assertIn("T-5.25\n", record)
+        self.assertIn("LExpenses:Entertainment\n", record)
+
+    def test__convert__ambiguous_account_key_prefix(self):
+        with self.assertRaises(KeyError) as context:
+            self._converter.convert(time.localtime(), "e", "cash", "5.25",
+                                    "movie")
+        actual_message = exception.get_message(context.exception)
+        self.assertEqual("key (e) is ambiguous between earnings, ent, "
+                         "entertainment", actual_message)
+
+    def test__convert__exact_key_is_prefix_of_other_key(self):
+        record, qif_file = self._converter.convert(time.localtime(), "ent",
+                                                   "cash", "5.25", "movie")
+        self.assertIn("LExpenses:Entertainment\n", record)
+
+
 if __name__ == '__main__':
     unittest.main()
 